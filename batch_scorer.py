@@ -0,0 +1,230 @@
+# batch_scorer.py
+import os
+import asyncio
+import logging
+from typing import Any, Callable, List, Sequence, Tuple
+
+from rapidfuzz import process, fuzz
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from search_index import TitleFeatures
+
+logger = logging.getLogger("bot.batch_scorer")
+
+# Vectorized V7 mode (NumPy chahiye). Default off: search_benchmark.py mein scalar se tez sabit ho tab ENV se on karein.
+BATCH_SCORING_ENABLED = NUMPY_AVAILABLE and os.getenv("FUZZY_BATCH_SCORING", "False").lower() == 'true'
+# Micro-batching window: itne ms tak aane wali queries ek saath score hongi (0 = off, default)
+SEARCH_BATCH_WINDOW_MS = int(os.getenv("SEARCH_BATCH_WINDOW_MS", "0"))
+SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX", "16"))
+# rapidfuzz cdist threads (Free tier par 1 hi rakhein)
+CDIST_WORKERS = int(os.getenv("CDIST_WORKERS", "1"))
+
+PREFILTER_LIMIT = 800
+PREFILTER_CUTOFF = 35
+
+if not NUMPY_AVAILABLE:
+    logger.warning("NumPy nahi mila. Batch scoring disabled, scalar V7 engine chalega.")
+
+# (q_fuzzy, query_tokens, query_year)
+QuerySpec = Tuple[str, List[str], str | None]
+
+
+class FeatureBatch:
+    """Candidate TitleFeatures ko NumPy arrays mein pack karta hai (V7 bonuses ke liye)."""
+    __slots__ = ("clean", "padded", "tight", "initials", "length")
+
+    def __init__(self, features: Sequence[TitleFeatures]):
+        self.clean = np.array([f.clean for f in features], dtype=str)
+        self.padded = np.char.add(np.char.add(" ", self.clean), " ")
+        self.tight = np.array([f.tight for f in features], dtype=str)
+        self.initials = np.array([f.initials for f in features], dtype=str)
+        self.length = np.fromiter((f.length for f in features), dtype=np.int32, count=len(features))
+
+    def take(self, idx) -> "FeatureBatch":
+        sub = object.__new__(FeatureBatch)
+        for name in FeatureBatch.__slots__:
+            setattr(sub, name, getattr(self, name)[idx])
+        return sub
+
+
+def v7_title_scores(query_tokens: List[str], batch: FeatureBatch) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    get_smart_match_score_v7 ka vectorized version (year bonus ke bina, woh per-movie hai).
+    Returns: (scores, exact_mask). exact_mask wale titles ka final intent score 2000 hota hai.
+    """
+    n = len(batch.length)
+    score = np.zeros(n, dtype=np.int32)
+    q_tight = "".join(query_tokens).lower()
+    exact = batch.tight == q_tight
+
+    # LOGIC 2: Prefix
+    score += np.where(
+        np.char.startswith(batch.clean, query_tokens[0]), 150,
+        np.where(np.char.startswith(batch.tight, q_tight), 100, 0)
+    ).astype(np.int32)
+
+    # LOGIC 4: Whole word / substring hits + full query bonus
+    valid_tokens = [t for t in query_tokens if len(t) >= 2]
+    matched = np.zeros(n, dtype=np.int32)
+    for q_token in valid_tokens:
+        whole = np.char.find(batch.padded, f" {q_token} ") >= 0
+        sub = np.char.find(batch.clean, q_token) >= 0
+        score += np.where(whole, 60, np.where(sub, 30, 0)).astype(np.int32)
+        matched += whole | sub
+    score += np.where(matched == len(valid_tokens), 100, 0).astype(np.int32)
+
+    # LOGIC 5: Word order
+    last_idx = np.full(n, -1, dtype=np.int64)
+    for q_token in query_tokens:
+        curr_idx = np.char.find(batch.clean, q_token)
+        ahead = curr_idx > last_idx
+        score += 20 * ahead.astype(np.int32)
+        last_idx = np.where(ahead, curr_idx, last_idx)
+
+    # LOGIC 6: Acronym / initials
+    if len(query_tokens) == 1 and len(q_tight) > 2:
+        score += 250 * (batch.initials == q_tight).astype(np.int32)
+
+    # LOGIC 7 + 8: Character sequence + density
+    pos = np.full(n, -1, dtype=np.int64)
+    in_seq = np.ones(n, dtype=bool)
+    for char in q_tight:
+        found = np.char.find(batch.tight, char, pos + 1)
+        in_seq &= found >= 0
+        pos = np.where(found >= 0, found, pos)
+    density = (len(q_tight) / np.maximum(batch.length, 1) * 100).astype(np.int32)
+    score += np.where(in_seq, 100 + density, 0).astype(np.int32)
+
+    # LOGIC 9: Length penalty
+    if len(q_tight) < 4:
+        score -= 50 * (batch.length > 30).astype(np.int32)
+
+    # LOGIC 10: Roman numerals
+    if '2' in query_tokens: score += 50 * (np.char.find(batch.padded, " ii ") >= 0).astype(np.int32)
+    if '3' in query_tokens: score += 50 * (np.char.find(batch.padded, " iii ") >= 0).astype(np.int32)
+
+    return score, exact
+
+
+def score_queries(
+    specs: List[QuerySpec],
+    titles: List[str],
+    features: Sequence[TitleFeatures],
+    row_title_idx: "np.ndarray",
+    row_years: "np.ndarray",
+    candidates: Sequence[Sequence[int]],
+    forced: Sequence[Sequence[int]] | None = None,
+) -> List[Tuple["np.ndarray", "np.ndarray", "np.ndarray"]]:
+    """
+    Multi-query batch scoring. Har query sirf apne `candidates[i]` (trigram search space ke title indices)
+    par WRatio hoti hai; doosri queries ke shortlists ka cross-product kabhi score nahi hota.
+    `row_*` arrays har (title, movie) row ko describe karte hain (title order mein sorted; ek title ki kai movies).
+    `forced[i]`: query i ke title indices jo cutoff/top-800 ke bina bhi score hote hain (acronym hits).
+    Har query ke liye returns: (row indices, final hybrid scores, high_fuzzy mask).
+    """
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32), np.empty(0, dtype=bool))
+    # Title i ki rows = row_starts[i]:row_ends[i] (row_title_idx sorted hai)
+    title_ids = np.arange(len(titles))
+    row_starts = np.searchsorted(row_title_idx, title_ids, side='left')
+    row_ends = np.searchsorted(row_title_idx, title_ids, side='right')
+
+    results = []
+    for qi, (q_fuzzy, query_tokens, query_year) in enumerate(specs):
+        cand = np.asarray(candidates[qi], dtype=np.int64)
+        forced_idx = np.asarray(forced[qi] if forced else (), dtype=np.int64)
+        if not query_tokens or (len(cand) == 0 and len(forced_idx) == 0):
+            results.append(empty); continue
+
+        # Search space par ek-row cdist (process.extract jaisa kaam); cutoff se neeche = 0
+        fz_cand = process.cdist(
+            [q_fuzzy], [titles[i] for i in cand.tolist()],
+            scorer=fuzz.WRatio, score_cutoff=PREFILTER_CUTOFF, workers=CDIST_WORKERS
+        )[0] if len(cand) else np.empty(0, dtype=np.float32)
+
+        # Top-800 titles, process.extract ke order mein (score desc, tie par search space position):
+        # score ties ka order batch ki baaki queries par depend nahi karta
+        keep = np.flatnonzero(fz_cand >= PREFILTER_CUTOFF)
+        if len(keep) > PREFILTER_LIMIT:
+            keep = keep[np.argpartition(fz_cand[keep], -PREFILTER_LIMIT)[-PREFILTER_LIMIT:]]
+        keep = keep[np.lexsort((keep, -fz_cand[keep]))]
+        kept, kept_fz = cand[keep], fz_cand[keep]
+        # Acronym hits hamesha, end mein (search space mein na hon to alag se WRatio)
+        already = set(kept.tolist())
+        extra = [i for i in dict.fromkeys(forced_idx.tolist()) if i not in already]
+        if extra:
+            extra_fz = process.cdist(
+                [q_fuzzy], [titles[i] for i in extra],
+                scorer=fuzz.WRatio, score_cutoff=PREFILTER_CUTOFF, workers=CDIST_WORKERS
+            )[0]
+            kept = np.concatenate((kept, np.asarray(extra, dtype=np.int64)))
+            kept_fz = np.concatenate((kept_fz, extra_fz))
+        if len(kept) == 0:
+            results.append(empty); continue
+
+        title_scores, exact = v7_title_scores(query_tokens, FeatureBatch([features[i] for i in kept.tolist()]))
+
+        # Kept titles ki saari rows (CSR ranges) aur har row ka kept position
+        counts = row_ends[kept] - row_starts[kept]
+        row_pos = np.repeat(np.arange(len(kept)), counts)
+        rows = row_starts[kept][row_pos] + (np.arange(len(row_pos)) - np.repeat(np.cumsum(counts) - counts, counts))
+
+        intent = title_scores[row_pos]
+        if query_year:
+            intent = intent + 300 * (row_years[rows] == query_year).astype(np.int32)
+        intent = np.where(exact[row_pos], 2000, intent)
+
+        fz = kept_fz[row_pos]
+        high = fz >= 90
+        final = np.where(high, 900 + intent, fz + intent)
+        results.append((rows, final, high))
+    return results
+
+
+class SearchMicroBatcher:
+    """
+    Bursty traffic ke liye: chhoti window mein aayi queries ek executor call mein score hoti hain.
+    `run_batch(queries)` sync function hai jo har query ka result list return karta hai.
+    """
+    def __init__(self, run_batch: Callable[[List[str]], List[Any]], window_ms: int = SEARCH_BATCH_WINDOW_MS, max_batch: int = SEARCH_BATCH_MAX):
+        self._run_batch = run_batch
+        self._window = window_ms / 1000
+        self._max_batch = max_batch
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    async def submit(self, query: str, executor=None) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, future))
+        if len(self._pending) >= self._max_batch:
+            self._flush(loop, executor)
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._window, self._flush, loop, executor)
+        return await future
+
+    def _flush(self, loop: asyncio.AbstractEventLoop, executor):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if not pending: return
+
+        queries = [q for q, _ in pending]
+        exec_future = loop.run_in_executor(executor, self._run_batch, queries)
+
+        def _deliver(done: asyncio.Future):
+            try:
+                batch_results = done.result()
+            except Exception as e:
+                logger.error(f"Batch search failed ({len(queries)} queries): {e}")
+                batch_results = [[] for _ in queries]
+            for (_, fut), res in zip(pending, batch_results):
+                if not fut.done(): fut.set_result(res)
+
+        exec_future.add_done_callback(_deliver)
@@ -8,11 +8,13 @@ import io
 import signal
 import json
 import hashlib
+import html
 import random 
 import uuid # Naya: Unique IDs ke liye
+import time
 from datetime import datetime, timezone, timedelta
 from contextlib import asynccontextmanager
-from typing import List, Dict, Callable, Any
+from typing import List, Dict, Callable, Any, NamedTuple
 from functools import wraps, partial
 import concurrent.futures
 
@@ -33,13 +35,23 @@ async def safe_tg_call(coro, timeout=TG_OP_TIMEOUT, semaphore=None, bot=None):
     target_bot = bot or globals().get('bot')
     return await _base_safe_tg_call(coro, timeout=timeout, semaphore=semaphore, bot=target_bot)
 # --- SMART WRAPPER END ---
-from redis_cache import redis_cache, RedisCacheLayer
+from redis_cache import redis_cache, RedisCacheLayer, search_session_key, SEARCH_SESSION_TTL
 from queue_wrapper import priority_queue, PriorityQueueWrapper, QUEUE_CONCURRENCY, PRIORITY_ADMIN
 from smart_watchdog import SmartWatchdog, WATCHDOG_ENABLED 
 
 # --- NEW FEATURE IMPORTS ---
 from ad_manager import send_sponsor_ad
 from spam_protection import spam_guard # <--- NEW IMPORT
+from search_index import TrigramIndex, TitleFeatures, MovieCatalog, PrefixIndex, TokenCorrector, build_title_features
+from batch_scorer import BATCH_SCORING_ENABLED, SEARCH_BATCH_WINDOW_MS, SearchMicroBatcher, NUMPY_AVAILABLE
+from search_engine import clean_text_for_search, clean_text_for_fuzzy, get_smart_match_score_v7, fuzzy_search, fuzzy_search_batch, tfidf_search, parse_filename, score_external_hits, merge_tier_results
+from search_pool import search_pool
+from shadow_search import ShadowEvaluator, summarize_shadow_samples, format_shadow_report
+from tfidf_index import NgramTfidfIndex, TFIDF_SEARCH_ENABLED
+from near_dupes import NearDuplicateFinder
+from search_cache import SearchResultCache, SingleFlight, TierStats, QueryLog
+from index_snapshot import INDEX_SNAPSHOT_ENABLED, INDEX_SNAPSHOT_DELAY, dump_snapshot, write_snapshot, load_snapshot
+from shared_index import SHARED_INDEX_ENABLED, SHARED_INDEX_PATH, SHARED_INDEX_MAX_AGE, export_shared_index, attach_shared_index, acquire_loader_lock, release_loader_lock
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 # CRITICAL FIX: StateFilter use karna zaroori hai conflicts ke liye
@@ -64,7 +76,7 @@ except ImportError:
 
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.filters import Command, CommandStart, BaseFilter
-from aiogram.types import Update, InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile
+from aiogram.types import Update, InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile, InlineQueryResultArticle, InputTextMessageContent
 from aiogram.enums import ParseMode
 from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramRetryAfter
 from aiogram.client.default import DefaultBotProperties
@@ -73,7 +85,7 @@ from aiogram.fsm.storage.memory import MemoryStorage
 from fastapi import FastAPI, BackgroundTasks, Request, HTTPException
 
 # --- Database Imports ---
-from database import Database
+from database import Database, TOMBSTONE_TTL_SECONDS
 from neondb import NeonDB
 ADMIN_ACTIVE_TASKS = {} 
 # ============ LOGGING SETUP ============
@@ -162,6 +174,28 @@ try:
     ALTERNATE_BOTS_RAW = os.getenv("ALTERNATE_BOTS", "")
     ALTERNATE_BOTS = [b.strip() for b in ALTERNATE_BOTS_RAW.split(',') if b.strip()] if ALTERNATE_BOTS_RAW else []
 
+    # Catalog change ke baad sirf badle hue docs laayein (False = hamesha full reload)
+    FUZZY_DELTA_REFRESH = os.getenv("FUZZY_DELTA_REFRESH", "True").lower() == 'true'
+    # Catalog mutations Redis pub/sub par broadcast; har instance/worker apna index delta se sync rakhta hai
+    CATALOG_EVENTS_ENABLED = os.getenv("CATALOG_EVENTS_ENABLED", "True").lower() == 'true'
+
+    # Inline mode (@bot title): Telegram client/server side result cache (seconds) aur results count
+    INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))
+    INLINE_RESULTS_LIMIT = min(int(os.getenv("INLINE_RESULTS_LIMIT", "20")), 50) # Telegram max 50
+
+    # Tiered search: in-memory hits isse kam hon (ya cache cold ho) to DB full-text tier bhi chalta hai
+    SEARCH_TIER_MIN_HITS = int(os.getenv("SEARCH_TIER_MIN_HITS", "3"))
+    # Poore cascade ka latency budget (ms); DB tier jo isme na aaye use chhod dete hain (0 = DB tier off)
+    SEARCH_TIER_BUDGET_MS = int(os.getenv("SEARCH_TIER_BUDGET_MS", "1500"))
+    # Har itni queries par per-tier hit rate log hota hai
+    SEARCH_TIER_LOG_EVERY = int(os.getenv("SEARCH_TIER_LOG_EVERY", "200"))
+    # Query log (sampled counts) Redis mein itne seconds par flush hota hai
+    QUERY_LOG_FLUSH_SECONDS = int(os.getenv("QUERY_LOG_FLUSH_SECONDS", "30"))
+    # Catalog change / restart ke baad top itni queries ke results pehle se bana ke cache (0 = warmer off)
+    HOT_QUERY_WARM_COUNT = int(os.getenv("HOT_QUERY_WARM_COUNT", "200"))
+    # Warmer catalog change ke itne seconds baad chalta hai (burst of changes par ek hi baar)
+    HOT_QUERY_WARM_DELAY = int(os.getenv("HOT_QUERY_WARM_DELAY", "30"))
+
 except KeyError as e:
     logger.critical(f"--- MISSING ENVIRONMENT VARIABLE: {e} ---")
     logger.critical("Bot band ho raha hai. Kripya apni .env file / Render secrets check karein.")
@@ -347,9 +381,69 @@ watchdog: SmartWatchdog | None = None
 # --- END NEW ---
 AUTO_MESSAGE_ID_PLACEHOLDER = 9090909090
 
-# --- NAYA FUZZY CACHE (Dict[str, Dict] format) ---
-fuzzy_movie_cache: Dict[str, Dict] = {}
+# --- NAYA FUZZY CACHE (compact MovieCatalog: clean_title -> tuple of MovieRecord) ---
+fuzzy_movie_cache: MovieCatalog = MovieCatalog()
+# Candidate generation ke liye trigram index (fuzzy_movie_cache keys par)
+fuzzy_trigram_index: TrigramIndex = TrigramIndex()
+# V7 scorer ke liye precomputed per-title features (clean_title -> TitleFeatures)
+fuzzy_title_features: Dict[str, TitleFeatures] = {}
+# Inline mode type-ahead ke liye sorted prefix index (fuzzy_movie_cache keys par)
+fuzzy_prefix_index: PrefixIndex = PrefixIndex()
+# Typo correction ke liye title tokens ki SymSpell deletion dictionary
+fuzzy_token_corrector: TokenCorrector = TokenCorrector()
+# FUZZY_SEARCH_ENGINE=tfidf (ya shadow candidate) par trigram TF-IDF sparse matrix; warna None
+fuzzy_tfidf_index: NgramTfidfIndex | None = None
 FUZZY_CACHE_LOCK = asyncio.Lock()
+# Full rebuild ek time par ek hi (FUZZY_CACHE_LOCK sirf shuru/publish par liya jaata hai, writers block nahi hote)
+FUZZY_REBUILD_LOCK = asyncio.Lock()
+# Replaced shared file par search workers ka re-attach ek hi baar (kai workers ek saath load_failed bhejte hain)
+SEARCH_POOL_RELOAD_LOCK = asyncio.Lock()
+# Background rebuild ke dauran writers ke (changed, deleted) yahan bhi aate hain; None = koi rebuild nahi chal raha
+fuzzy_rebuild_log: List[tuple[List[Dict], List[str]]] | None = None
+# Catalog version: har catalog change (reload/add/remove) par bump hota hai
+catalog_version: int = 0
+# Normalized query -> search results (catalog version ke saath invalidate)
+search_result_cache = SearchResultCache()
+# Inline prefix -> top titles (same version-based invalidation)
+inline_prefix_cache = SearchResultCache()
+# Same normalized query ke concurrent live searches ek hi computation share karte hain
+search_single_flight = SingleFlight()
+# Search cascade (memory -> mongo/neon full-text) ke per-tier counters
+search_tier_stats = TierStats()
+# Sampled normalized-query counts (hot query warmer ke liye)
+query_log = QueryLog()
+query_log_flushed_at: float = time.monotonic()
+# Shadow mode: sampled live queries candidate engine par bhi (SHADOW_SEARCH_ENGINE), metrics Mongo mein
+shadow_evaluator = ShadowEvaluator()
+# Delta refresh watermark: in-memory cache is time tak ke Mongo changes dekh chuka hai (None = full reload zaroori)
+fuzzy_cache_watermark: datetime | None = None
+# Lock ke bahar chal rahe delta fetches: har ek ka set, writers jo imdb_ids is dauran chhoote hain (delta mein unhe skip)
+fuzzy_delta_windows: List[set] = []
+# Lock ke bahar chal rahe derived index builds (snapshot restore): writers ki chhui clean_title keys
+fuzzy_key_windows: List[set] = []
+
+# Debounced local index snapshot writer task
+index_snapshot_task: asyncio.Task | None = None
+# Debounced hot query warmer task
+hot_query_warm_task: asyncio.Task | None = None
+
+# Is process ki id: catalog events mein apne events ignore, aur search session keys ka scope (catalog_version per-process hai)
+# Outgoing seq aur har peer ka last seq (gap = missed event)
+INSTANCE_ID = uuid.uuid4().hex[:12]
+catalog_event_seq: int = 0
+CATALOG_EVENT_LOCK = asyncio.Lock()
+catalog_event_peers: Dict[str, int] = {}
+catalog_events_task: asyncio.Task | None = None
+catalog_reconcile_task: asyncio.Task | None = None
+
+def bump_catalog_version(persist: bool = True):
+    """Catalog badla: search result cache ki purani entries stale ho jaati hain (aur disk snapshot + hot query warm schedule hote hain)."""
+    global catalog_version
+    catalog_version += 1
+    if persist:
+        schedule_index_snapshot()
+    # Restart/snapshot restore (persist=False) par bhi cache khaali hai, isliye warm hamesha
+    schedule_hot_query_warm()
 
 # ============ GRACEFUL SHUTDOWN ============
 async def shutdown_procedure():
@@ -386,11 +480,25 @@ async def shutdown_procedure():
     try: await dp.storage.close()
     except Exception as e: logger.error(f"Dispatcher storage close karte waqt error: {e}")
         
+    # --- NEW: Stop Search Worker Processes ---
+    search_pool.stop()
+    await shadow_evaluator.flush()
+    shadow_evaluator.stop()
+    if index_snapshot_task and not index_snapshot_task.done():
+        index_snapshot_task.cancel()
+    if hot_query_warm_task and not hot_query_warm_task.done():
+        hot_query_warm_task.cancel()
+    if catalog_events_task and not catalog_events_task.done():
+        catalog_events_task.cancel()
+    # --- END NEW ---
+
     if executor:
         executor.shutdown(wait=True, cancel_futures=False)
         logger.info("ThreadPoolExecutor shutdown ho gaya.")
         
     # --- NEW: Close Redis Connection ---
+    # Pending query counts pehle flush (warna restart par last window ke counts kho jaate)
+    await flush_query_log()
     await redis_cache.close()
     # --- END NEW ---
         
@@ -576,25 +684,6 @@ def get_full_limit_keyboard() -> InlineKeyboardMarkup | None:
     buttons = [[InlineKeyboardButton(text=f"🚀 Use Fast Mirror: @{b}", url=f"https://t.me/{b}")] for b in ALTERNATE_BOTS]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
-# --- CLEANING LOGIC (Unchanged) ---
-def clean_text_for_search(text: str) -> str:
-    """Strict cleaning for Search Index (Used for Fuzzy Cache Keys and Exact Match Anchor)."""
-    if not text: return ""
-    text = text.lower()
-    # Separators ko space se badle (DB clean logic se synchronize)
-    text = re.sub(r"[._\-]+", " ", text) 
-    # FIX: Better regex to only remove S01/Season 1 constructs (Bug #15)
-    text = re.sub(r"\b(s|season)\s*\d{1,2}(?!\d)", " ", text)
-    # Sirf a-z, 0-9, aur space rakhein
-    text = re.sub(r"[^a-z0-9\s]+", "", text) 
-    # Extra spaces hatayein
-    text = re.sub(r"\s+", " ", text).strip() 
-    return text
-
-def clean_text_for_fuzzy(text: str) -> str:
-    # FIX: Unified cleaning logic using the main search cleaner (Bug #17)
-    return clean_text_for_search(text)
-
 def extract_movie_info(caption: str | None) -> Dict[str, str] | None:
     if not caption: return None
     info = {}; lines = caption.splitlines(); title = lines[0].strip() if lines else ""
@@ -609,32 +698,6 @@ def extract_movie_info(caption: str | None) -> Dict[str, str] | None:
     if year_match: info["year"] = year_match[-1]
     return info if "title" in info else None
 
-def parse_filename(filename: str) -> Dict[str, str | None]:
-    if not filename: return {"title": "Untitled", "year": None}
-    year = None
-    match_paren = re.search(r"\(((19[89]\d|20[0-3]\d))\)", filename)
-    if match_paren: year = match_paren.group(1)
-    else:
-        matches_bare = re.findall(r"\b((19[89]\d|20[0-3]\d))\b", filename)
-        if matches_bare: year = matches_bare[-1][0]
-    
-    title = os.path.splitext(filename)[0].strip()
-    if year: title = re.sub(rf"(\s*\(?{year}\)?\s*)$", "", title, flags=re.IGNORECASE).strip()
-    title = re.sub(r"\[.*?\]", "", title, flags=re.IGNORECASE)
-    title = re.sub(r"\(.*?\)", "", title, flags=re.IGNORECASE)
-    common_tags = r"\b(web-rip|org|hindi|dd 5.1|english|480p|720p|1080p|web-dl|hdrip|bluray|dual audio|esub|full hd)\b"
-    title = re.sub(common_tags, "", title, flags=re.IGNORECASE)
-    title = re.sub(r'[._]', ' ', title).strip()
-    title = re.sub(r"\s+", " ", title).strip()
-    
-    if not title:
-        title = os.path.splitext(filename)[0].strip()
-        title = re.sub(r"\[.*?\]", "", title, flags=re.IGNORECASE).strip()
-        title = re.sub(r"\(.*?\)", "", title, flags=re.IGNORECASE).strip()
-        title = re.sub(r'[._]', ' ', title).strip()
-        title = re.sub(r"\s+", " ", title).strip()
-        
-    return {"title": title or "Untitled", "year": year}
     # --- NEW: LIGHTWEIGHT QUALITY PARSER ---
 def get_quality_label(filename: str) -> str:
     """Extracts quality from filename for buttons."""
@@ -765,241 +828,528 @@ async def monitor_event_loop():
             logger.error(f"Event loop monitor error: {e}", exc_info=True); await asyncio.sleep(120)
 
 # ============ NAYA FUZZY CACHE FUNCTIONS (Unchanged) ============
-async def load_fuzzy_cache(db: Database):
-    """Mongo/Redis se movie titles fetch k k करके in-memory fuzzy cache banata hai।"""
-    global fuzzy_movie_cache
-    async with FUZZY_CACHE_LOCK:
-        logger.info("In-Memory Fuzzy Cache load ho raha hai (Redis > Mongo se)...")
+class FuzzyGeneration(NamedTuple):
+    """Search index ki ek generation: catalog + uske derived indexes (hamesha ek saath swap hote hain)."""
+    catalog: MovieCatalog
+    trigram_index: TrigramIndex
+    title_features: Dict[str, TitleFeatures]
+    prefix_index: PrefixIndex
+    token_corrector: TokenCorrector
+    tfidf_index: NgramTfidfIndex | None = None
+
+def _current_generation() -> FuzzyGeneration:
+    return FuzzyGeneration(fuzzy_movie_cache, fuzzy_trigram_index, fuzzy_title_features, fuzzy_prefix_index, fuzzy_token_corrector, fuzzy_tfidf_index)
+
+def _tfidf_wanted() -> bool:
+    """TF-IDF matrix sirf tab banta hai jab live engine ya shadow candidate use kare (RAM bachane ke liye)."""
+    return TFIDF_SEARCH_ENABLED or shadow_evaluator.engine == "tfidf"
+
+async def _build_tfidf_index(keys: List[str]) -> NgramTfidfIndex | None:
+    if not _tfidf_wanted(): return None
+    return await asyncio.get_running_loop().run_in_executor(executor, NgramTfidfIndex.build, keys)
+
+def _publish_generation(gen: FuzzyGeneration, watermark: datetime | None, persist: bool = True):
+    """
+    Nayi generation live karta hai. Beech mein koi await nahi, isliye koi coroutine aadha swap nahi dekhta;
+    executor/pool mein chal rahe searches apna purana snapshot (partial args) hi use karke khatam hote hain.
+    """
+    global fuzzy_movie_cache, fuzzy_trigram_index, fuzzy_title_features, fuzzy_prefix_index, fuzzy_token_corrector, fuzzy_tfidf_index, fuzzy_cache_watermark
+    fuzzy_movie_cache, fuzzy_trigram_index, fuzzy_title_features, fuzzy_prefix_index, fuzzy_token_corrector, fuzzy_tfidf_index = gen
+    fuzzy_cache_watermark = watermark
+    bump_catalog_version(persist=persist)
+
+async def _rebuild_fuzzy_generation(build: Callable[[], Any]) -> bool:
+    """
+    Double-buffered rebuild: build() nayi generation FUZZY_CACHE_LOCK ke bahar banata hai, search aur
+    indexing us dauran purani generation par chalte rehte hain. Writers ke changes fuzzy_rebuild_log mein bhi
+    jaate hain aur publish se pehle nayi generation par replay hote hain, phir ek hi swap.
+    build() -> (FuzzyGeneration, watermark) ya None. False = rebuild fail, purani generation live rehti hai.
+    """
+    global fuzzy_rebuild_log
+    async with FUZZY_REBUILD_LOCK:
+        # Log DB fetch se pehle shuru: fetch ke baad ke writes miss nahi hote (pehle wale dobara apply hona idempotent hai)
+        async with FUZZY_CACHE_LOCK:
+            fuzzy_rebuild_log = []
         try:
-            # get_all_movies_for_fuzzy_cache is an async method in database.py
-            movies_list = await safe_db_call(db.get_all_movies_for_fuzzy_cache(), timeout=300, default=[])
-            temp_cache = {}
-            
-            if movies_list:
-                for movie_dict in movies_list:
-                    orig_clean = movie_dict.get('clean_title', '')
-                    if orig_clean:
-                         # FIX: Store list of movies to prevent shadowing (Bug #6)
-                         if orig_clean not in temp_cache:
-                             temp_cache[orig_clean] = []
-                         temp_cache[orig_clean].append(movie_dict)
-                
-                fuzzy_movie_cache = temp_cache
-                logger.info(f"✅ In-Memory Fuzzy Cache {len(fuzzy_movie_cache):,} unique titles ke saath loaded.")
-            else:
-                logger.error("Fuzzy cache load nahi ho paya (Redis/Mongo se koi data nahi mila).")
-                fuzzy_movie_cache = {}
+            built = await build()
         except Exception as e:
-            logger.error(f"Fuzzy cache load karte waqt error: {e}", exc_info=True)
-            fuzzy_movie_cache = {}
+            logger.error(f"Fuzzy index rebuild error: {e}", exc_info=True)
+            built = None
 
-# ==================================================
-# +++++ V7 ULTRA INTENT ENGINE (Google-Like) +++++
-# ==================================================
+        async with FUZZY_CACHE_LOCK:
+            replay, fuzzy_rebuild_log = fuzzy_rebuild_log, None
+            if built is None: return False
+            gen, watermark = built
+            for changed, deleted in replay:
+                _apply_fuzzy_delta(changed, deleted, gen)
+            _publish_generation(gen, watermark)
+        if replay:
+            logger.info(f"🔁 Rebuild ke dauran aaye {len(replay)} writes nayi generation par replay hue.")
+        return True
 
-def get_smart_match_score_v7(query_tokens: List[str], target_clean: str, query_year: str = None, target_year: str = None) -> int:
+async def load_fuzzy_cache(db: Database, force: bool = False):
     """
-    V7 Ultra Engine:
-    10-Point Logic System for 'Google-Like' Accuracy without high CPU usage.
+    Mongo/Redis se movie titles fetch karke in-memory fuzzy cache banata hai (background rebuild + atomic swap).
+    SHARED_INDEX_ENABLED par shared mmap index attach hota hai (force = purani file ignore, rebuild).
     """
-    if not query_tokens or not target_clean: return 0
-    
-    score = 0
-    # Create Tight Strings (Spaces removed) for typo tolerance (e.g., 'ironman' == 'iron man')
-    query_str_tight = "".join(query_tokens).lower()
-    target_str_tight = re.sub(r'\s+', '', target_clean).lower()
-    target_tokens = target_clean.split()
-    
-    # --- LOGIC 1: EXACT TIGHT MATCH (Highest Priority) ---
-    if query_str_tight == target_str_tight:
-        return 2000 # Instant Winner
-        
-    # --- LOGIC 2: STARTS WITH (Prefix Bonus) ---
-    # Example: "Ava" matches "Avatar" better than "The Ava..."
-    if target_clean.startswith(query_tokens[0]):
-        score += 150
-    elif target_str_tight.startswith(query_str_tight):
-        score += 100
-
-    # --- LOGIC 3: YEAR BOOSTING (Critical for Accuracy) ---
-    # If user typed '2023' and movie is '2023', massive boost.
-    if query_year and target_year:
-        if query_year == target_year:
-            score += 300
-    
-    # --- LOGIC 4: WORD PRESENCE & WHOLE WORD MATCH ---
-    matched_words = 0
-    for q_token in query_tokens:
-        if len(q_token) < 2: continue 
-        # Check if token exists as a WHOLE word in target
-        if any(q_token == t_token for t_token in target_tokens):
-            score += 60 # Whole word bonus (High)
-            matched_words += 1
-        # Check if token exists as Substring
-        elif q_token in target_clean:
-            score += 30 # Substring bonus (Medium)
-            matched_words += 1
-            
-    # Full Query Match Bonus
-    if matched_words == len([t for t in query_tokens if len(t) >= 2]):
-        score += 100
+    async def _build():
+        # Multi-worker: ek loader build karta hai, baaki attach. Shared path fail ho to private load.
+        built = await _attach_shared_generation(db, force) if SHARED_INDEX_ENABLED else None
+        return built or await _build_private_generation(db)
+
+    if await _rebuild_fuzzy_generation(_build):
+        # Worker processes ko bhi nayi generation bhejein (background, lock hold nahi karte)
+        if search_pool.enabled:
+            asyncio.create_task(search_pool.load(fuzzy_movie_cache))
+    else:
+        logger.error(f"Fuzzy cache rebuild nahi ho paya, purani generation ({len(fuzzy_movie_cache):,} titles) hi chal rahi hai.")
+
+    # Redis snapshot purana ho sakta hai: watermark ke baad ke Mongo changes turant apply karein
+    if FUZZY_DELTA_REFRESH and fuzzy_cache_watermark and (datetime.now(timezone.utc) - fuzzy_cache_watermark) > timedelta(minutes=1):
+        if not await _delta_refresh_fuzzy_cache(db):
+            logger.warning("Snapshot catch-up delta fail hua, agle refresh par dobara try hoga.")
 
-    # --- LOGIC 5: WORD ORDER CORRECTNESS ---
-    # "Iron Man" (Correct) vs "Man Iron" (Incorrect)
+async def _search_pool_current_cache():
+    """
+    search_pool.cache_provider: workers ke liye current catalog. Shared file kisi aur instance ne replace kar di ho
+    to purana SharedCatalog attach nahi hota, isliye nayi generation attach karte hain (load_fuzzy_cache khud
+    pool ko load bhejta hai) aur None lautate hain. Kai workers ek saath fail hon to reload ek hi baar.
+    """
+    async with SEARCH_POOL_RELOAD_LOCK:
+        if hasattr(fuzzy_movie_cache, "is_current") and not fuzzy_movie_cache.is_current():
+            logger.warning("Shared index file replace ho chuki hai: search workers ke liye nayi generation attach kar rahe hain.")
+            await load_fuzzy_cache(db_primary)
+            return None
+    return fuzzy_movie_cache
+
+async def _build_private_generation(db: Database) -> tuple[FuzzyGeneration, datetime | None] | None:
+    """Is process ka apna catalog + indexes (lock ke bahar banta hai). None = data nahi mila."""
+    logger.info("In-Memory Fuzzy Cache load ho raha hai (Redis > Mongo se)...")
+    # get_all_movies_for_fuzzy_cache is an async method in database.py
+    movies_list = await safe_db_call(db.get_all_movies_for_fuzzy_cache(), timeout=300, default=[])
+    if not movies_list:
+        logger.error("Fuzzy cache load nahi ho paya (Redis/Mongo se koi data nahi mila).")
+        return None
+
+    # Catalog + trigram index CPU bound hain, event loop block na ho isliye executor mein banayein
+    # FIX: Har clean_title ke saath movies ka tuple (shadowing nahi hota, Bug #6)
+    loop = asyncio.get_running_loop()
+    temp_cache = await loop.run_in_executor(executor, MovieCatalog.build, movies_list)
+    del movies_list # Raw dicts ka RAM turant free
+    temp_keys = temp_cache.titles
+    temp_index = await loop.run_in_executor(executor, TrigramIndex.build, temp_keys)
+    temp_features = await loop.run_in_executor(executor, build_title_features, temp_keys)
+    temp_prefix = await loop.run_in_executor(executor, PrefixIndex.build, temp_keys)
+    temp_corrector = await loop.run_in_executor(executor, TokenCorrector.build, temp_keys)
+    temp_tfidf = await _build_tfidf_index(temp_keys)
+    logger.info(f"✅ In-Memory Fuzzy Cache {len(temp_cache):,} unique titles ke saath loaded ({len(temp_corrector):,} tokens).")
+    return FuzzyGeneration(temp_cache, temp_index, temp_features, temp_prefix, temp_corrector, temp_tfidf), db.fuzzy_snapshot_at
+
+async def _attach_shared_generation(db: Database, force: bool = False) -> tuple[FuzzyGeneration, datetime | None] | None:
+    """
+    Shared-memory index (shared_index.py) attach karta hai. File lock ke through ek hi worker
+    loader banta hai: woh Redis/Mongo se catalog laakar flat file likhta hai, baaki wait karke wahi file mmap karte hain.
+    None = shared index nahi mil paya (caller private load kare).
+    """
+    loop = asyncio.get_running_loop()
+    wait_started = time.time()
     try:
-        last_idx = -1
-        order_score = 0
-        for q_token in query_tokens:
-            curr_idx = target_clean.find(q_token)
-            if curr_idx > last_idx:
-                order_score += 20
-                last_idx = curr_idx
-        score += order_score
-    except: pass
-
-    # --- LOGIC 6: ACRONYM/INITIALS MATCH ---
-    # Handles "KGF" -> "K.G.F" or "DDLJ"
-    if len(query_tokens) == 1 and len(query_str_tight) > 2:
-        # Check if first letters of target match query
-        initials = "".join([t[0] for t in target_tokens if t])
-        if query_str_tight == initials:
-            score += 250
-
-    # --- LOGIC 7: SEQUENCE MATCH (Your Legacy Logic - Preserved) ---
-    # Checks character-by-character sequence
-    last_idx = -1
-    broken = False
-    for char in query_str_tight:
-        found_idx = target_str_tight.find(char, last_idx + 1)
-        if found_idx == -1:
-            broken = True
-            break
-        last_idx = found_idx
-    
-    if not broken:
-        score += 100 # Sequence found
-        
-        # --- LOGIC 8: DENSITY SCORE (Coverage) ---
-        # "Avengers" matches "The Avengers" (High Density) better than "Avengers Age of Ultron..." (Low Density)
-        density = len(query_str_tight) / len(target_str_tight)
-        score += int(density * 100) # Max 100 bonus
-
-    # --- LOGIC 9: AESTHETIC PENALTY ---
-    # Penalize if query is tiny and matches a huge title (prevent false positives)
-    if len(query_str_tight) < 4 and len(target_str_tight) > 30:
-        score -= 50
-        
-    # --- LOGIC 10: ROMAN NUMERAL INTELLIGENCE (Basic) ---
-    # If query has '2', boost titles with 'II'
-    if '2' in query_tokens and 'ii' in target_tokens: score += 50
-    if '3' in query_tokens and 'iii' in target_tokens: score += 50
-
-    return score
+        lock_fd = await loop.run_in_executor(executor, acquire_loader_lock, SHARED_INDEX_PATH)
+        try:
+            # Wait ke dauran kisi aur worker ne nayi file banayi ho to wahi; warna max age tak purani bhi chalegi
+            max_age = None if force else SHARED_INDEX_MAX_AGE
+            shared = await loop.run_in_executor(executor, partial(attach_shared_index, SHARED_INDEX_PATH, max_age, wait_started))
+            if shared is None:
+                logger.info("Shared index nahi mila / purana hai: yeh worker loader hai (Redis > Mongo se build).")
+                movies_list = await safe_db_call(db.get_all_movies_for_fuzzy_cache(), timeout=300, default=[])
+                if not movies_list:
+                    logger.error("Shared index build nahi hua (Redis/Mongo se koi data nahi mila).")
+                    return None
+                temp_cache = await loop.run_in_executor(executor, MovieCatalog.build, movies_list)
+                del movies_list
+                size = await loop.run_in_executor(executor, partial(export_shared_index, temp_cache, SHARED_INDEX_PATH, db.fuzzy_snapshot_at))
+                del temp_cache # Private copy ki zaroorat nahi, ab sab mmap se padhte hain
+                logger.info(f"💾 Shared index likha: {SHARED_INDEX_PATH} ({size / 1e6:.1f} MB).")
+                shared = await loop.run_in_executor(executor, partial(attach_shared_index, SHARED_INDEX_PATH, None, wait_started))
+                if shared is None: return None
+        finally:
+            release_loader_lock(lock_fd)
+    except Exception as e:
+        logger.error(f"Shared index attach/build error: {e}", exc_info=True)
+        return None
+
+    logger.info(f"✅ Shared index attached: {len(shared):,} titles ({time.time() - shared.created_at:.0f}s purana).")
+    # Token dictionary chhoti hai (unique tokens), har worker apni banata hai
+    shared_keys = list(shared.keys())
+    corrector = await loop.run_in_executor(executor, TokenCorrector.build, shared_keys)
+    tfidf = await _build_tfidf_index(shared_keys)
+    # Features poore map ki jagah bounded per-process cache mein (score hue titles hi)
+    return FuzzyGeneration(shared, shared.make_trigram_index(), shared.make_title_features(), shared.make_prefix_index(), corrector, tfidf), shared.watermark
+
+async def refresh_fuzzy_cache(db: Database, force_full: bool = False, broadcast: bool = True):
+    """
+    Catalog change ke baad cache update. Watermark ho to sirf delta (changed docs + tombstones)
+    Mongo se aata hai; warna (ya force_full / delta error par) poora load_fuzzy_cache.
+    broadcast=False: startup/reconcile (delta doosre instances ke paas pehle se hai, dobara publish nahi).
+    """
+    if force_full or not FUZZY_DELTA_REFRESH or fuzzy_cache_watermark is None:
+        await load_fuzzy_cache(db, force=force_full)
+        return
+    if not await _delta_refresh_fuzzy_cache(db, broadcast):
+        logger.warning("Delta refresh fail hua, full reload kar rahe hain.")
+        await load_fuzzy_cache(db)
 
-def python_fuzzy_search(query: str, limit: int = 10, **kwargs) -> List[Dict]:
+async def _delta_refresh_fuzzy_cache(db: Database, broadcast: bool = True) -> bool:
     """
-    V7 Ultra Search Handler:
-    Integrates Intent Engine V7 with RapidFuzz for Google-like precision.
+    Watermark ke baad ke changes apply karta hai. False = delta nahi mil paya.
+    Mongo fetch lock ke bahar (writers block nahi hote); fetch ke dauran jin imdb_ids ko writers ne chhua,
+    unka local state delta se naya hai, isliye woh delta se skip. Baaki rows dobara apply hona harmless (30s overlap).
     """
-    # 1. Thread Safety Snapshot
-    current_cache = kwargs.get('cache_snapshot') or fuzzy_movie_cache
-    if not current_cache:
-        return []
+    global fuzzy_cache_watermark
+    watermark = fuzzy_cache_watermark
+    if watermark is None: return False
+    touched: set = set()
+    fuzzy_delta_windows.append(touched)
+    try:
+        delta = await safe_db_call(db.get_fuzzy_cache_delta(watermark), timeout=120, default=None)
+    finally:
+        fuzzy_delta_windows.remove(touched)
+    if delta is None: return False
+    changed, deleted, new_watermark = delta
+
+    async with FUZZY_CACHE_LOCK:
+        if fuzzy_cache_watermark is None: return False
+        if touched:
+            changed = [m for m in changed if m['imdb_id'] not in touched]
+            deleted = [i for i in deleted if i not in touched]
+        _record_fuzzy_delta(changed, deleted)
+        # Beech mein full reload ne aage ka watermark set kiya ho to peeche nahi le jaate
+        if new_watermark is not None and new_watermark > fuzzy_cache_watermark:
+            fuzzy_cache_watermark = new_watermark
+        bump_catalog_version()
+    if broadcast: broadcast_catalog_delta(changed, deleted)
+    # Redis snapshot bhi sirf affected chunks mein update (poora blob dobara nahi)
+    if redis_cache.is_ready():
+        asyncio.create_task(redis_cache.update_fuzzy_titles(upserts=changed, deletes=deleted, watermark=new_watermark))
+    logger.info(f"⚡ Fuzzy cache delta refresh: {len(changed):,} changed, {len(deleted):,} deleted, {len(touched):,} skipped (total {len(fuzzy_movie_cache):,} titles).")
+    return True
 
+# --- NEW: Catalog Change Broadcast (Redis Pub/Sub) ---
+def broadcast_catalog_delta(changed: List[Dict], deleted: List[str]):
+    """Local mutation ke baad wahi delta baaki instances ko (non-blocking). Order seq + lock se bana rehta hai."""
+    if not CATALOG_EVENTS_ENABLED or not redis_cache.is_ready() or (not changed and not deleted): return
+    asyncio.create_task(_publish_catalog_delta(changed, deleted))
+
+async def _publish_catalog_delta(changed: List[Dict], deleted: List[str]):
+    global catalog_event_seq
+    async with CATALOG_EVENT_LOCK:
+        catalog_event_seq = await redis_cache.publish_catalog_delta(INSTANCE_ID, catalog_event_seq, changed, deleted)
+
+async def _on_catalog_event(event: Dict):
+    """Doosre instance ka delta is process ke live index par (Mongo read nahi). Seq gap = event chhoota, Mongo se reconcile."""
+    origin, seq = event.get("o"), event.get("s")
+    if not origin or origin == INSTANCE_ID or not isinstance(seq, int): return
+    last = catalog_event_peers.get(origin)
+    catalog_event_peers[origin] = seq
+    if last is not None and seq != last + 1:
+        logger.warning(f"📡 Catalog events gap ({origin}: {last} -> {seq}), Mongo se reconcile.")
+        schedule_catalog_reconcile()
+    changed = [{"imdb_id": u[0], "title": u[1], "year": u[2] or None, "clean_title": u[3]} for u in event.get("u") or ()]
+    deleted = event.get("d") or []
+    if not changed and not deleted: return
+    async with FUZZY_CACHE_LOCK:
+        # Rebuild chal raha ho to delta log mein bhi (nayi generation stale na ho)
+        _record_fuzzy_delta(changed, deleted)
+        bump_catalog_version()
+    logger.debug(f"📡 Catalog event {origin}#{seq}: {len(changed)} upserts, {len(deleted)} deletes.")
+
+def schedule_catalog_reconcile():
+    """Missed events (disconnect/gap) ke baad watermark se delta refresh. Ek time par ek hi."""
+    global catalog_reconcile_task
+    if catalog_reconcile_task and not catalog_reconcile_task.done(): return
+    catalog_reconcile_task = asyncio.create_task(refresh_fuzzy_cache(db_primary, broadcast=False))
+
+def start_catalog_events():
+    """Catalog events subscriber shuru (Redis ready hona chahiye). Pehla subscribe startup load ke saath hai; reconnect par reconcile."""
+    global catalog_events_task
+    if not CATALOG_EVENTS_ENABLED or not redis_cache.is_ready(): return
+    if catalog_events_task and not catalog_events_task.done(): return
+    subscribed_once = False
+
+    async def _on_subscribed():
+        nonlocal subscribed_once
+        if subscribed_once: schedule_catalog_reconcile()
+        subscribed_once = True
+        logger.info(f"📡 Catalog events subscribed (instance {INSTANCE_ID}).")
+
+    catalog_events_task = asyncio.create_task(redis_cache.listen_catalog_events(_on_catalog_event, _on_subscribed))
+
+# --- NEW: Local Disk Index Snapshot (Instant Warm Start) ---
+def schedule_index_snapshot():
+    """Catalog change ke baad (debounced) disk snapshot likhta hai. Ek time par ek hi pending write."""
+    global index_snapshot_task
+    # Shared index mode mein /dev/shm file hi warm start hai (per-worker pickle nahi)
+    if not INDEX_SNAPSHOT_ENABLED or SHARED_INDEX_ENABLED: return
+    if index_snapshot_task and not index_snapshot_task.done(): return
     try:
-        # --- INTELLIGENT QUERY PARSING ---
-        # Extract Year from Query if present (e.g., "Jawan 2023")
-        query_year = None
-        year_match = re.search(r"\b(19[7-9]\d|20[0-2]\d)\b", query)
-        if year_match:
-            query_year = year_match.group(1)
-        
-        q_fuzzy = clean_text_for_fuzzy(query) 
-        q_anchor = clean_text_for_search(query) 
-        
-        if not q_fuzzy or not q_anchor: return []
-        
-        query_tokens = [t for t in q_anchor.split() if t]
-        candidates = []
-        seen_imdb = set()
-        
-        # --- 1. EXACT MATCH ANCHOR (Confirmation) ---
-        anchor_keys = [q_anchor]
-        if q_anchor.startswith('the '): anchor_keys.append(q_anchor[4:]) 
-        else: anchor_keys.append('the ' + q_anchor) 
-
-        for key in set(anchor_keys):
-            if key in current_cache:
-                movies_list = current_cache[key]
-                if isinstance(movies_list, dict): movies_list = [movies_list]
-
-                for data in movies_list:
-                    if data['imdb_id'] not in seen_imdb:
-                         candidates.append({
-                            'imdb_id': data['imdb_id'],
-                            'title': data['title'],
-                            'year': data.get('year'),
-                            'score': 2000, # MAX SCORE
-                            'match_type': 'exact_anchor'
-                         })
-                         seen_imdb.add(data['imdb_id'])
-        
-        # --- 2. RAPIDFUZZ BROAD FETCH (Keeping 800 Limit as requested) ---
-        all_titles = list(current_cache.keys())
-        
-        # CPU Optimization: Only scan if exact match didn't fill the page
-        if len(candidates) < limit:
-            pre_filtered = process.extract(
-                q_fuzzy, 
-                all_titles, 
-                limit=800, # Keeping your request
-                scorer=fuzz.WRatio, 
-                score_cutoff=35 
-            )
-            
-            # --- 3. V7 ENGINE RE-RANKING ---
-            for clean_title_key, fuzz_score, _ in pre_filtered:
-                movies_list = current_cache.get(clean_title_key)
-                if not movies_list: continue
-                if isinstance(movies_list, dict): movies_list = [movies_list]
-
-                for data in movies_list:
-                    if data['imdb_id'] in seen_imdb: continue
-                    
-                    target_year = data.get('year')
-                    
-                    # CALL V7 ENGINE
-                    intent_score = get_smart_match_score_v7(query_tokens, clean_title_key, query_year, target_year)
-                    
-                    final_score = 0
-                    match_type = "fuzzy"
-                    
-                    # Hybrid Scoring Formula
-                    if fuzz_score >= 90:
-                        final_score = 900 + intent_score
-                        match_type = "high_fuzzy"
-                    else:
-                        # Base fuzz score + V7 Intelligence
-                        final_score = fuzz_score + intent_score
-                        match_type = "intent_v7"
-
-                    candidates.append({
-                        'imdb_id': data['imdb_id'],
-                        'title': data['title'],
-                        'year': target_year,
-                        'score': final_score,
-                        'match_type': match_type
-                    })
-                    seen_imdb.add(data['imdb_id'])
-
-        # 4. Final Sort
-        candidates.sort(key=lambda x: x['score'], reverse=True)
-        
-        return candidates[:limit]
-        
+        index_snapshot_task = asyncio.create_task(_write_index_snapshot_later())
+    except RuntimeError:
+        pass # Event loop nahi chal raha (e.g. import time)
+
+async def _write_index_snapshot_later():
+    await asyncio.sleep(INDEX_SNAPSHOT_DELAY)
+    try:
+        loop = asyncio.get_running_loop()
+        # Pickle lock ke bahar (writers block nahi hote). Har mutation version bump karti hai: pickle ke dauran
+        # version badla to payload torn ho sakta hai, dobara try; file tabhi likhi jaati hai jab payload consistent ho
+        for _ in range(3):
+            catalog, trigram_index = fuzzy_movie_cache, fuzzy_trigram_index
+            if not catalog: return
+            version, watermark = catalog_version, fuzzy_cache_watermark
+            try:
+                payload = await loop.run_in_executor(executor, dump_snapshot, catalog, trigram_index)
+            except RuntimeError:
+                continue # Dict/set pickle ke beech badla
+            if catalog_version == version: break
+        else:
+            # Catalog lagataar badal raha hai: agli window mein phir (task khatam hone ke baad schedule)
+            logger.info("💾 Index snapshot skip: catalog busy hai, baad mein dobara.")
+            loop.call_soon(schedule_index_snapshot)
+            return
+        size = await loop.run_in_executor(executor, write_snapshot, payload, len(catalog), watermark)
+        logger.info(f"💾 Index snapshot saved ({len(catalog):,} titles, {size / 1e6:.1f} MB).")
+    except Exception as e:
+        logger.error(f"Index snapshot save error: {e}", exc_info=True)
+
+# --- NEW: Query Log + Hot Query Warmer ---
+async def flush_query_log():
+    """Pending sampled counts Redis ke daily sorted set mein (ek pipeline). Redis na ho to sirf local totals rehte hain."""
+    global query_log_flushed_at
+    query_log_flushed_at = time.monotonic()
+    counts = query_log.drain()
+    if counts and redis_cache.is_ready():
+        await redis_cache.add_query_counts(counts)
+
+def log_search_query(result_key: str):
+    """Naye search (page 0) ki normalized query sample karo; interval poora ho to background flush."""
+    if not query_log.record(result_key): return
+    if time.monotonic() - query_log_flushed_at >= QUERY_LOG_FLUSH_SECONDS:
+        asyncio.create_task(flush_query_log())
+
+def schedule_hot_query_warm():
+    """Catalog change ke baad (debounced) top queries ke results pehle se compute karta hai. Ek time par ek hi pending warm."""
+    global hot_query_warm_task
+    if HOT_QUERY_WARM_COUNT <= 0: return
+    if hot_query_warm_task and not hot_query_warm_task.done(): return
+    try:
+        hot_query_warm_task = asyncio.create_task(_warm_hot_queries_later())
+    except RuntimeError:
+        pass # Event loop nahi chal raha (e.g. import time)
+
+async def _warm_hot_queries_later():
+    await asyncio.sleep(HOT_QUERY_WARM_DELAY)
+    try:
+        await warm_hot_queries(HOT_QUERY_WARM_COUNT)
     except Exception as e:
-        logger.error(f"python_fuzzy_search V7 mein error: {e}", exc_info=True)
-        return []
+        logger.error(f"Hot query warm error: {e}", exc_info=True)
+
+async def warm_hot_queries(count: int, chunk_size: int = 16) -> int:
+    """
+    Query log ke top `count` queries ke results current catalog version par bana ke LRU + shared session mein daalta hai.
+    Sirf in-memory tier: jin queries ke hits SEARCH_TIER_MIN_HITS se kam hain unhe live path (DB tier ke saath) par chhodte hain.
+    Beech mein catalog badla to ruk jaata hai (agla warm already scheduled hai). Returns: warmed queries.
+    """
+    if not fuzzy_movie_cache: return 0
+    await flush_query_log()
+    ranked = await redis_cache.top_queries(count) if redis_cache.is_ready() else None
+    queries = [q for q, _ in ranked] if ranked else query_log.top(count)
+    version = catalog_version
+    queries = [q for q in queries if not search_result_cache.has(q, version)]
+    if not queries: return 0
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    search_batch = partial(
+        python_fuzzy_search_batch, limit=100,
+        cache_snapshot=fuzzy_movie_cache, trigram_snapshot=fuzzy_trigram_index,
+        features_snapshot=fuzzy_title_features, corrector_snapshot=fuzzy_token_corrector, tfidf_snapshot=fuzzy_tfidf_index
+    )
+    warmed = 0
+    for i in range(0, len(queries), chunk_size):
+        chunk = queries[i:i + chunk_size]
+        # Chhote chunks: executor ek saath bahut der busy na rahe, live searches beech mein chalte rahein
+        batch_hits = await loop.run_in_executor(executor, search_batch, chunk)
+        if catalog_version != version: break
+        for query, hits in zip(chunk, batch_hits):
+            results = _rank_unique(hits)
+            if len(results) < SEARCH_TIER_MIN_HITS: continue
+            search_result_cache.put(query, version, results)
+            if redis_cache.is_ready():
+                session_key = search_session_key(query, version, INSTANCE_ID)
+                page_field = "p:0:0"
+                await redis_cache.save_search_session(session_key, results, {page_field: _encode_search_page(_render_search_page(results, 0, False, ""))})
+            warmed += 1
+    logger.info(f"🔥 Hot query warm: {warmed}/{len(queries)} queries ready (v{version}, {time.perf_counter() - started:.1f}s).")
+    return warmed
+
+async def restore_index_snapshot() -> bool:
+    """
+    Startup par disk snapshot se index turant load karta hai (search foran ready).
+    True = snapshot mila; caller ko phir background mein Mongo se reconcile (refresh) karna chahiye.
+    """
+    if not INDEX_SNAPSHOT_ENABLED or SHARED_INDEX_ENABLED: return False
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    snapshot = await loop.run_in_executor(executor, load_snapshot)
+    if not snapshot or not snapshot.catalog: return False
+
+    watermark = snapshot.watermark
+    # Tombstones TTL ke baad expire ho jaate hain: itna purana snapshot delta se reconcile nahi ho sakta
+    if watermark and (datetime.now(timezone.utc) - watermark).total_seconds() > TOMBSTONE_TTL_SECONDS:
+        watermark = None
+    async with FUZZY_CACHE_LOCK:
+        # Features missing hon to engine on-the-fly banata hai; poora map (aur prefix index) background mein
+        _publish_generation(FuzzyGeneration(snapshot.catalog, snapshot.trigram_index, {}, PrefixIndex(), TokenCorrector()), watermark, persist=False)
+    logger.info(f"⚡ Index snapshot se {len(fuzzy_movie_cache):,} titles {(time.perf_counter() - started) * 1000:.0f} ms mein load hue.")
+
+    async def _build_features(catalog: MovieCatalog):
+        global fuzzy_title_features, fuzzy_prefix_index, fuzzy_token_corrector, fuzzy_tfidf_index
+        # Keys ka snapshot le kar build lock ke bahar; is dauran writers jin keys ko chhoote hain woh
+        # window mein aati hain aur swap se pehle live catalog ke hisaab se replay hoti hain (rebuild log jaisa)
+        touched: set = set()
+        fuzzy_key_windows.append(touched)
+        try:
+            keys = list(catalog.keys())
+            features = await loop.run_in_executor(executor, build_title_features, keys)
+            prefix_index = await loop.run_in_executor(executor, PrefixIndex.build, keys)
+            token_corrector = await loop.run_in_executor(executor, TokenCorrector.build, keys)
+            tfidf_index = await _build_tfidf_index(keys)
+            built_keys = await loop.run_in_executor(executor, set, keys)
+        finally:
+            fuzzy_key_windows.remove(touched)
+        async with FUZZY_CACHE_LOCK:
+            if fuzzy_movie_cache is not catalog: return # Beech mein nayi generation aa gayi (apne indexes saath)
+            for key in touched:
+                # Sirf farq apply (TokenCorrector ref-counted hai, dobara add double count karta)
+                live, built = key in catalog, key in built_keys
+                if live and not built:
+                    features.setdefault(key, TitleFeatures(key))
+                    prefix_index.add(key)
+                    token_corrector.add(key)
+                    if tfidf_index is not None: tfidf_index.add(key)
+                elif built and not live:
+                    features.pop(key, None)
+                    prefix_index.discard(key)
+                    token_corrector.discard(key)
+                    if tfidf_index is not None: tfidf_index.discard(key)
+            fuzzy_title_features, fuzzy_prefix_index, fuzzy_token_corrector, fuzzy_tfidf_index = features, prefix_index, token_corrector, tfidf_index
+        if touched:
+            logger.info(f"🔁 Snapshot indexes build ke dauran badli {len(touched)} keys replay hui.")
+    asyncio.create_task(_build_features(snapshot.catalog))
+    if search_pool.enabled:
+        asyncio.create_task(search_pool.load(snapshot.catalog))
+    return True
+
+def _record_fuzzy_delta(changed: List[Dict], deleted: List[str]):
+    """
+    Saare writers (delta refresh, migration, auto-index, delete) ka entry point (FUZZY_CACHE_LOCK ke andar call karein):
+    live generation par apply, aur background rebuild chal raha ho to uske delta log mein bhi.
+    """
+    # Derived index build (snapshot restore) chal raha ho: delta se pehle wali keys bhi (delete/rename ki purani key)
+    keys_before = set()
+    if fuzzy_key_windows:
+        keys_before = {fuzzy_movie_cache.key_of(i) for i in [*deleted, *(m['imdb_id'] for m in changed)]} - {None}
+    _apply_fuzzy_delta(changed, deleted)
+    if fuzzy_rebuild_log is not None:
+        fuzzy_rebuild_log.append((changed, deleted))
+    for touched in fuzzy_delta_windows:
+        touched.update(m['imdb_id'] for m in changed)
+        touched.update(deleted)
+    for touched in fuzzy_key_windows:
+        touched.update(keys_before)
+        touched.update(m['clean_title'] for m in changed if m.get('clean_title'))
+
+def _apply_fuzzy_delta(changed: List[Dict], deleted: List[str], gen: FuzzyGeneration | None = None):
+    """
+    Changed/deleted imdb_ids ko catalog + indexes par apply karta hai. gen=None = live generation (+ worker pool),
+    warna abhi publish na hui nayi generation (rebuild replay; pool ko baad mein poora load milta hai).
+    """
+    if not changed and not deleted: return
+    live = gen is None
+    catalog, trigram_index, title_features, prefix_index, token_corrector, tfidf_index = gen or _current_generation()
+
+    def _sync_key(key: str):
+        """Key ki movies badli/hati: pool ko poora key dobara, key khaali ho gayi to derived indexes se bhi hatao."""
+        if live: search_pool.remove(key)
+        keep = catalog.get(key)
+        if keep:
+            if live:
+                for m in keep: search_pool.add(key, m.to_dict())
+        else:
+            trigram_index.discard(key)
+            title_features.pop(key, None)
+            prefix_index.discard(key)
+            token_corrector.discard(key)
+            if tfidf_index is not None: tfidf_index.discard(key)
+
+    # 1. Deletes: imdb_id -> key reverse map se seedha (poora catalog scan nahi)
+    for imdb_id in deleted:
+        key = catalog.remove(imdb_id)
+        if key is not None: _sync_key(key)
+
+    # 2. Naye/updated docs: upsert (title badla ho to imdb_id purane key se naye par move)
+    for movie_data in changed:
+        key = movie_data.get('clean_title')
+        if not key: continue
+        if key not in catalog: token_corrector.add(key)
+        old_key, _ = catalog.update(movie_data)
+        if old_key is not None: _sync_key(old_key)
+        trigram_index.add(key)
+        if key not in title_features:
+            title_features[key] = TitleFeatures(key)
+        prefix_index.add(key)
+        if tfidf_index is not None: tfidf_index.add(key)
+        if live and old_key != key: search_pool.add(key, movie_data)
+
+# ==================================================
+# +++++ V7 ULTRA INTENT ENGINE (Google-Like) +++++
+# ==================================================
+# Engine code search_engine.py mein hai (worker processes bhi use karte hain).
+# Yeh wrappers bot ke global in-memory index ko snapshot ke roop mein pass karte hain.
+
+def python_fuzzy_search(query: str, limit: int = 10, **kwargs) -> List[Dict]:
+    # Config switch: TF-IDF engine (matrix abhi ban raha ho to V7 fallback)
+    tfidf_index = kwargs.get('tfidf_snapshot') or fuzzy_tfidf_index
+    if TFIDF_SEARCH_ENABLED and tfidf_index is not None:
+        return tfidf_search(
+            query, limit,
+            kwargs.get('cache_snapshot') or fuzzy_movie_cache,
+            tfidf_index,
+            kwargs.get('features_snapshot') or fuzzy_title_features,
+            kwargs.get('corrector_snapshot') or fuzzy_token_corrector
+        )
+    return fuzzy_search(
+        query, limit,
+        kwargs.get('cache_snapshot') or fuzzy_movie_cache,
+        kwargs.get('trigram_snapshot') or fuzzy_trigram_index,
+        kwargs.get('features_snapshot') or fuzzy_title_features,
+        kwargs.get('corrector_snapshot') or fuzzy_token_corrector
+    )
+
+def python_fuzzy_search_batch(queries: List[str], limit: int = 10, **kwargs) -> List[List[Dict]]:
+    if TFIDF_SEARCH_ENABLED and (kwargs.get('tfidf_snapshot') or fuzzy_tfidf_index) is not None:
+        return [python_fuzzy_search(q, limit, **kwargs) for q in queries]
+    return fuzzy_search_batch(
+        queries, limit,
+        kwargs.get('cache_snapshot') or fuzzy_movie_cache,
+        kwargs.get('trigram_snapshot') or fuzzy_trigram_index,
+        kwargs.get('features_snapshot') or fuzzy_title_features,
+        kwargs.get('corrector_snapshot') or fuzzy_token_corrector
+    )
+
+# Group traffic burst: ek chhoti window ki saari queries ek hi batch call mein jaati hain
+search_micro_batcher = SearchMicroBatcher(partial(python_fuzzy_search_batch, limit=100))
+
 # ============ LIFESPAN MANAGEMENT (FastAPI) (F.I.X.E.D.) ============
 # --- REPLACEMENT CODE FOR LIFESPAN ---
 @asynccontextmanager
@@ -1011,6 +1361,13 @@ async def lifespan(app: FastAPI):
     loop = asyncio.get_running_loop(); loop.set_default_executor(executor)
     logger.info("ThreadPoolExecutor initialize ho gaya.")
 
+    # --- NEW: Optional Search Process Pool (SEARCH_PROCESS_WORKERS > 0) ---
+    search_pool.cache_provider = _search_pool_current_cache
+    search_pool.start()
+    shadow_evaluator.sink = db_primary.add_shadow_samples
+    if shadow_evaluator.enabled():
+        logger.info(f"🕶️ Shadow search on: '{shadow_evaluator.engine}' ({shadow_evaluator.sample_rate:.0%} queries).")
+
     # --- NEW: Redis Init (Free-Tier Optimization) ---
     await redis_cache.init_cache()
     
@@ -1038,8 +1395,14 @@ async def lifespan(app: FastAPI):
         logger.warning(f"Backup Database Init Error: {e}")
 
     # --- CRITICAL FIX: Background Cache Loading (Startup Timeout Fix) ---
-    # Ye line ab wait nahi karegi, background me chalegi
-    asyncio.create_task(load_fuzzy_cache(db_primary))
+    # Disk snapshot mila to search turant ready; Mongo se reconcile background mein (delta ya full)
+    if await restore_index_snapshot():
+        asyncio.create_task(refresh_fuzzy_cache(db_primary, broadcast=False))
+    else:
+        # Ye line ab wait nahi karegi, background me chalegi
+        asyncio.create_task(load_fuzzy_cache(db_primary))
+    # Load ke dauran aaye events rebuild ke delta log se nayi generation tak pahunchte hain
+    start_catalog_events()
 
     # --- NEW: Start Priority Queue Workers ---
     db_objects_for_queue = {
@@ -1176,6 +1539,16 @@ async def health_check():
         "cache_redis_connected": redis_ok, # Redis status
         "search_logic": "Hybrid (Smart Tokenization + Word Presence)",
         "fuzzy_cache_size": len(fuzzy_movie_cache),
+        "catalog_version": catalog_version,
+        "search_result_cache": search_result_cache.stats(),
+        "inline_prefix_cache": inline_prefix_cache.stats(),
+        "search_single_flight": search_single_flight.stats(),
+        "search_tiers": search_tier_stats.stats(),
+        "search_engine": "tfidf" if TFIDF_SEARCH_ENABLED and fuzzy_tfidf_index is not None else "v7",
+        "query_log": query_log.stats(),
+        "shadow_search": shadow_evaluator.stats(),
+        "catalog_events": {"instance": INSTANCE_ID, "subscribed": bool(catalog_events_task and not catalog_events_task.done()), "published_seq": catalog_event_seq, "peers": len(catalog_event_peers)},
+        "shared_index": {"path": fuzzy_movie_cache.path, "age_seconds": int(time.time() - fuzzy_movie_cache.created_at), "overlay": fuzzy_movie_cache.overlay_size()} if hasattr(fuzzy_movie_cache, "overlay_size") else None,
         "queue_size": priority_queue._queue.qsize(), # Queue size
         "uptime": get_uptime(),
         "timestamp": datetime.now(timezone.utc).isoformat()
@@ -1596,57 +1969,101 @@ async def banned_search_movie_handler_stub(message: types.Message): pass
 # ==================================================
 
 # --- REPLACEMENT CODE FOR SEARCH PROCESSING ---
-async def process_search_results(
-    query: str, 
-    user_id: int, 
-    redis_cache: RedisCacheLayer, 
-    page: int = 0, 
-    is_group: bool = False,
-    bot_username: str = ""
-) -> tuple[str, InlineKeyboardMarkup | None, str | None]:
-    """
-    💎 PREMIUM SEARCH ENGINE V8
-    Returns: (Premium Text, Buttons, Smart Banner URL)
-    """
-    limit_per_page = 5 # Compact UI
-    cache_key = f"search_res:{user_id}"
-    final_results = []
-    
-    # 1. Cache Fetch
-    if redis_cache.is_ready():
-        cached_data = await redis_cache.get(cache_key)
-        if cached_data and page > 0:
-            try: final_results = json.loads(cached_data)
-            except: pass
-    
-    # 2. Live Search (If no cache)
-    if not final_results:
-        if not fuzzy_movie_cache: return "⚠️ **System warming up...**", None, None
-        
+async def _run_fuzzy_search(query: str) -> List[Dict]:
+    """Live fuzzy search (pool > micro-batch > executor). Deduped + relevance sorted results."""
+    # TF-IDF engine: ek mat-vec (NumPy GIL chhodta hai), pool/micro-batch ki zaroorat nahi, seedha executor
+    use_tfidf = TFIDF_SEARCH_ENABLED and fuzzy_tfidf_index is not None
+    # Process pool (GIL se bahar). None = pool off/busy, in-process fallback
+    fuzzy_hits_raw = await search_pool.search(query, 100) if search_pool.is_ready() and not use_tfidf else None
+    if fuzzy_hits_raw is None and BATCH_SCORING_ENABLED and SEARCH_BATCH_WINDOW_MS > 0 and not use_tfidf:
+        fuzzy_hits_raw = await search_micro_batcher.submit(query, executor)
+    elif fuzzy_hits_raw is None:
         loop = asyncio.get_running_loop()
         fuzzy_hits_raw = await loop.run_in_executor(
             executor, 
-            partial(python_fuzzy_search, cache_snapshot=fuzzy_movie_cache), 
+            partial(python_fuzzy_search, cache_snapshot=fuzzy_movie_cache, trigram_snapshot=fuzzy_trigram_index, features_snapshot=fuzzy_title_features, corrector_snapshot=fuzzy_token_corrector, tfidf_snapshot=fuzzy_tfidf_index), 
             query, 100
         )
-        
-        # Smart Deduplication (Ek movie ID ek baar)
-        seen_imdb = set()
-        for movie in fuzzy_hits_raw:
-            if movie['imdb_id'] not in seen_imdb:
-                final_results.append(movie)
-                seen_imdb.add(movie['imdb_id'])
-        
-        # Sort by Relevance
-        final_results.sort(key=lambda x: x.get('score', 0), reverse=True)
-        
-        # Save to Cache
-        if redis_cache.is_ready() and final_results:
-            await redis_cache.set(cache_key, json.dumps(final_results), ttl=600)
+    
+    return _rank_unique(fuzzy_hits_raw)
 
-    if not final_results: return None, None, None
+def _rank_unique(fuzzy_hits_raw: List[Dict]) -> List[Dict]:
+    # Smart Deduplication (Ek movie ID ek baar)
+    results = []
+    seen_imdb = set()
+    for movie in fuzzy_hits_raw:
+        if movie['imdb_id'] not in seen_imdb:
+            results.append(movie)
+            seen_imdb.add(movie['imdb_id'])
+    
+    # Sort by Relevance
+    results.sort(key=lambda x: x.get('score', 0), reverse=True)
+    return results
 
-    # 3. Pagination Slicing
+async def _run_db_tiers(query: str, db_primary: Database | None, db_neon: NeonDB | None, timeout: float) -> tuple[List[tuple[str, List[Dict]]], bool]:
+    """
+    Mongo $text aur Neon tsvector parallel, ek hi time box mein. Jo tier budget mein na aaye wo cancel.
+    Returns: ([(tier, scored hits)], complete). complete=False = kam se kam ek tier timeout hua.
+    """
+    tasks = {}
+    if db_primary is not None: tasks["mongo"] = asyncio.create_task(db_primary.mongo_primary_search(query, 10))
+    if db_neon is not None: tasks["neon"] = asyncio.create_task(db_neon.search_titles(query, 10))
+    if not tasks: return [], True
+
+    done, pending = await asyncio.wait(tasks.values(), timeout=timeout)
+    for task in pending: task.cancel()
+
+    tiers, complete = [], True
+    for name, task in tasks.items():
+        if task in pending:
+            search_tier_stats.record_tier(name, timed_out=True)
+            complete = False
+            continue
+        if task.exception() is not None:
+            logger.warning(f"Search tier '{name}' fail hua: {task.exception()}")
+            search_tier_stats.record_tier(name, failed=True)
+            continue
+        hits = score_external_hits(query, task.result() or [], name)
+        search_tier_stats.record_tier(name, len(hits))
+        tiers.append((name, hits))
+    return tiers, complete
+
+async def _run_tiered_search(query: str, db_primary: Database | None = None, db_neon: NeonDB | None = None) -> tuple[List[Dict], bool]:
+    """
+    Search cascade: in-memory index pehle; kam/zero hits ya cold cache par time-boxed DB full-text tier;
+    phir sab tiers ek ranking mein merge (scores same scale par, search_engine.score_external_hits).
+    Returns: (results, complete). complete=False ho to result cache mat karo (DB tier adhoora tha).
+    """
+    started = time.perf_counter()
+    tiers: List[tuple[str, List[Dict]]] = []
+    if fuzzy_movie_cache:
+        memory_hits = await _run_fuzzy_search(query)
+        search_tier_stats.record_tier("memory", len(memory_hits))
+        tiers.append(("memory", memory_hits))
+    else:
+        memory_hits = []
+
+    complete = True
+    if len(memory_hits) < SEARCH_TIER_MIN_HITS and SEARCH_TIER_BUDGET_MS > 0:
+        # Budget poore cascade ka hai; memory tier ne jo time liya wo DB tier se katega (min 50ms)
+        remaining = max(SEARCH_TIER_BUDGET_MS / 1000 - (time.perf_counter() - started), 0.05)
+        db_tiers, complete = await _run_db_tiers(query, db_primary, db_neon, remaining)
+        tiers.extend(db_tiers)
+
+    results = merge_tier_results([hits for _, hits in tiers], 100) if len(tiers) > 1 else (tiers[0][1] if tiers else [])
+    top_tier = None
+    if results:
+        top_id = results[0]['imdb_id']
+        top_tier = next((name for name, hits in tiers if any(m['imdb_id'] == top_id for m in hits)), None)
+    search_tier_stats.record_query(top_tier)
+    if SEARCH_TIER_LOG_EVERY > 0 and search_tier_stats.queries % SEARCH_TIER_LOG_EVERY == 0:
+        logger.info(f"📊 Search tiers: {search_tier_stats.summary()}")
+    return results, complete
+
+def _render_search_page(final_results: List[Dict], page: int, is_group: bool, bot_username: str) -> tuple[str, InlineKeyboardMarkup | None, str | None]:
+    """Ranked results ka ek page (text, buttons, banner). Shared session mein cache hota hai, har user ke liye dobara nahi banta."""
+    limit_per_page = 5 # Compact UI
+    # Pagination Slicing
     total_results = len(final_results)
     start_idx = page * limit_per_page
     end_idx = start_idx + limit_per_page
@@ -1719,6 +2136,102 @@ async def process_search_results(
     if nav_row: buttons.append(nav_row)
 
     return text, InlineKeyboardMarkup(inline_keyboard=buttons), poster_url
+
+def _encode_search_page(rendered: tuple[str, InlineKeyboardMarkup | None, str | None]) -> str:
+    text, markup, poster_url = rendered
+    return json.dumps({"t": text, "k": markup.model_dump(mode="json", exclude_none=True) if markup else None, "p": poster_url})
+
+def _decode_search_page(payload: str) -> tuple[str, InlineKeyboardMarkup | None, str | None]:
+    data = json.loads(payload)
+    return data["t"], InlineKeyboardMarkup.model_validate(data["k"]) if data.get("k") else None, data.get("p")
+
+async def load_search_page(
+    user_id: int,
+    redis_cache: RedisCacheLayer,
+    page: int,
+    is_group: bool = False,
+    bot_username: str = ""
+) -> tuple[str | None, InlineKeyboardMarkup | None, str | None]:
+    """
+    Pagination (page 0 par "Back" bhi): `search_ptr:{user_id}` -> session -> pre-rendered page (ya rows se ek baar render).
+    Pointer/session na ho to (None, None, None) = page expired; kabhi live search nahi chalta.
+    """
+    if not redis_cache.is_ready(): return None, None, None
+    session_key = await redis_cache.get(f"search_ptr:{user_id}")
+    if not session_key: return None, None, None
+    page_field = f"p:{page}:{1 if is_group else 0}"
+    cached_page = await redis_cache.get_search_session_page(session_key, page_field)
+    if cached_page: return _decode_search_page(cached_page)
+    final_results = await redis_cache.load_search_session_rows(session_key)
+    if not final_results: return None, None, None
+    rendered = _render_search_page(final_results, page, is_group, bot_username)
+    if rendered[1] is not None:
+        await redis_cache.put_search_session_page(session_key, page_field, _encode_search_page(rendered))
+    return rendered
+
+async def process_search_results(
+    query: str, 
+    user_id: int, 
+    redis_cache: RedisCacheLayer, 
+    page: int = 0, 
+    is_group: bool = False,
+    bot_username: str = "",
+    db_primary: Database | None = None,
+    db_neon: NeonDB | None = None
+) -> tuple[str, InlineKeyboardMarkup | None, str | None]:
+    """
+    💎 PREMIUM SEARCH ENGINE V8
+    Returns: (Premium Text, Buttons, Smart Banner URL)
+    Results ek shared session (normalized query + is process ka catalog version) mein rehte hain; user ke paas sirf
+    `search_ptr:{user_id}` pointer. Aage ke pages load_search_page() se (pointer par).
+    """
+    pointer_key = f"search_ptr:{user_id}"
+    page_field = f"p:{page}:{1 if is_group else 0}"
+
+    # 1. Naya search: same query + version ka page kisi aur user ke liye pehle hi ban chuka ho to wahi
+    result_key = clean_text_for_search(query)
+    log_search_query(result_key)
+    if fuzzy_movie_cache:
+        gen = _current_generation()
+        shadow_evaluator.submit(result_key, (gen.catalog, gen.trigram_index, gen.title_features, gen.token_corrector, gen.tfidf_index))
+    version = catalog_version
+    session_key = search_session_key(result_key, version, INSTANCE_ID)
+    if redis_cache.is_ready():
+        cached_page = await redis_cache.get_search_session_page(session_key, page_field)
+        if cached_page:
+            await redis_cache.set(pointer_key, session_key, ttl=SEARCH_SESSION_TTL)
+            return _decode_search_page(cached_page)
+
+    # 2. Live Search
+    # Cold cache par bhi DB tier jawab de sakta hai; koi tier hi na ho tabhi "warming up"
+    if not fuzzy_movie_cache and db_primary is None and db_neon is None:
+        return "⚠️ **System warming up...**", None, None
+
+    # In-process LRU: same normalized query + same catalog version = dobara compute nahi
+    cached_hits = search_result_cache.get(result_key, version)
+    if cached_hits is not None:
+        final_results, complete = list(cached_hits), True
+    else:
+        # Thundering herd (nayi release par group mein sab same title): N requests, ek scan
+        async def _live_search():
+            hits, complete = await _run_tiered_search(query, db_primary, db_neon)
+            if complete: search_result_cache.put(result_key, version, hits)
+            return hits, complete
+        hits, complete = await search_single_flight.do((result_key, version), _live_search)
+        final_results = list(hits)
+
+    if not final_results:
+        if not fuzzy_movie_cache: return "⚠️ **System warming up...**", None, None
+        return None, None, None
+
+    rendered = _render_search_page(final_results, page, is_group, bot_username)
+    # 3. Session (rows + yeh page) aur user ka pointer. Adhoore results (DB tier timeout) shared key par nahi:
+    # sirf isi user ki pagination ke liye alag key, baaki users ka search dobara live chalega
+    if redis_cache.is_ready():
+        if not complete: session_key = f"{session_key}:u{user_id}"
+        await redis_cache.save_search_session(session_key, final_results, {page_field: _encode_search_page(rendered)})
+        await redis_cache.set(pointer_key, session_key, ttl=SEARCH_SESSION_TTL)
+    return rendered
       
 # --- 1. PRIVATE SEARCH (AUTO-DELETE: 4 MIN) ---
 @dp.message(
@@ -1728,7 +2241,7 @@ async def process_search_results(
     (F.chat.type == "private")
 )
 @handler_timeout(20)
-async def search_movie_handler_private(message: types.Message, bot: Bot, db_primary: Database, redis_cache: RedisCacheLayer):
+async def search_movie_handler_private(message: types.Message, bot: Bot, db_primary: Database, db_neon: NeonDB, redis_cache: RedisCacheLayer):
     user = message.from_user
     if not user: return
 
@@ -1751,7 +2264,7 @@ async def search_movie_handler_private(message: types.Message, bot: Bot, db_prim
     if redis_cache.is_ready(): await redis_cache.set(f"last_query:{user.id}", query, ttl=600)
 
     # C. ENGINE CALL
-    text, markup, poster_url = await process_search_results(query, user.id, redis_cache, page=0, is_group=False)
+    text, markup, poster_url = await process_search_results(query, user.id, redis_cache, page=0, is_group=False, db_primary=db_primary, db_neon=db_neon)
     
     # Helper for Auto-Delete (4 Minutes = 240s)
     async def schedule_result_delete(msg_id):
@@ -1795,7 +2308,7 @@ async def search_movie_handler_private(message: types.Message, bot: Bot, db_prim
     ~F.text.startswith("/"),
     F.chat.type.in_({"group", "supergroup"})
 )
-async def search_movie_handler_group(message: types.Message, bot: Bot, db_primary: Database, redis_cache: RedisCacheLayer):
+async def search_movie_handler_group(message: types.Message, bot: Bot, db_primary: Database, db_neon: NeonDB, redis_cache: RedisCacheLayer):
     # A. Auth & Checks
     chat_id = str(message.chat.id)
     chat_user = message.chat.username.lower() if message.chat.username else ""
@@ -1827,7 +2340,7 @@ async def search_movie_handler_group(message: types.Message, bot: Bot, db_primar
     if len(query) < 2: return 
 
     bot_info = await bot.get_me()
-    text, markup, poster_url = await process_search_results(query, user.id, redis_cache, page=0, is_group=True, bot_username=bot_info.username)
+    text, markup, poster_url = await process_search_results(query, user.id, redis_cache, page=0, is_group=True, bot_username=bot_info.username, db_primary=db_primary, db_neon=db_neon)
 
     if not text: return
 
@@ -1846,6 +2359,48 @@ async def search_movie_handler_group(message: types.Message, bot: Bot, db_primar
     if res_msg:
         asyncio.create_task(auto_del([message.message_id, res_msg.message_id], delay=180))
 
+# --- NEW: INLINE MODE (@bot title) TYPE-AHEAD ---
+def _inline_prefix_hits(prefix: str) -> List[Dict]:
+    """Prefix index se top movies (rapidfuzz path nahi, sirf bisect scan)."""
+    hits = []
+    for title in fuzzy_prefix_index.search(prefix, limit=INLINE_RESULTS_LIMIT):
+        for movie in fuzzy_movie_cache.get(title) or ():
+            hits.append({'imdb_id': movie['imdb_id'], 'title': movie['title'], 'year': movie.get('year')})
+            if len(hits) >= INLINE_RESULTS_LIMIT: return hits
+    return hits
+
+@dp.inline_query()
+async def inline_search_handler(inline_query: types.InlineQuery, bot: Bot):
+    query = clean_text_for_search(inline_query.query)
+    if len(query) < 2:
+        await safe_tg_call(inline_query.answer([], cache_time=INLINE_CACHE_TIME, is_personal=False))
+        return
+
+    # Server-side prefix cache: group type-ahead mein same prefixes baar baar aate hain
+    version = catalog_version
+    hits = inline_prefix_cache.get(query, version)
+    if hits is None:
+        hits = _inline_prefix_hits(query)
+        inline_prefix_cache.put(query, version, hits)
+
+    bot_username = (await bot.me()).username
+    results = []
+    for movie in hits:
+        label = f"{movie['title']} ({movie['year']})" if movie.get('year') else movie['title']
+        results.append(InlineQueryResultArticle(
+            id=movie['imdb_id'][:64],
+            title=f"🎬 {label}",
+            description="📥 Tap karein, download link chat mein chala jayega",
+            input_message_content=InputTextMessageContent(
+                message_text=f"🍿 <b>{html.escape(label)}</b>\n👇 Download ke liye neeche button dabayein."
+            ),
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+                InlineKeyboardButton(text="📥 Get Movie", url=f"https://t.me/{bot_username}?start=get_{movie['imdb_id']}")
+            ]])
+        ))
+    await safe_tg_call(inline_query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=False))
+# --- END NEW ---
+
 # --- FIX: Handler for 'MORE RESULTS' button (Visual Separator) ---
 @dp.callback_query(F.data == "ignore")
 async def ignore_callback(callback: types.CallbackQuery):
@@ -1867,9 +2422,8 @@ async def pagination_callback(callback: types.CallbackQuery, bot: Bot, redis_cac
     user_id = callback.from_user.id
     bot_info = await bot.get_me()
     
-    # Fetch results from Cache (Query is implied from cache)
-        # Fetch results (Unpack 3 values)
-    text, markup, _ = await process_search_results("ignored", user_id, redis_cache, page=page, is_group=is_group, bot_username=bot_info.username)
+    # Har page (page 0 ka "Back" bhi) user ke session pointer se; pointer expire = "Page expired"
+    text, markup, _ = await load_search_page(user_id, redis_cache, page, is_group=is_group, bot_username=bot_info.username)
 
     if text:
         try:
@@ -2108,22 +2662,24 @@ async def migration_handler(message: types.Message, bot: Bot, db_primary: Databa
     db2_status = get_status(db2_res)
     neon_status = "✅ Synced" if neon_res else "❌ FAILED"
     
-    if db1_res is True:
-        # Fuzzy Cache ko update karein
+    if db1_res is True or db1_res == "updated":
+        # Fuzzy Cache ko update karein (upsert: same title ki doosri movies rehti hain, title badla ho to move)
+        movie_data = {
+            "imdb_id": imdb_id,
+            "title": title,
+            "year": year,
+            "clean_title": clean_title_val
+        }
         async with FUZZY_CACHE_LOCK:
-            if clean_title_val not in fuzzy_movie_cache:
-                movie_data = {
-                    "imdb_id": imdb_id,
-                    "title": title,
-                    "year": year,
-                    "clean_title": clean_title_val
-                }
-                fuzzy_movie_cache[clean_title_val] = movie_data
-                # --- NEW: Update Redis Cache asynchronously (future-proofing) ---
-                if redis_cache.is_ready():
-                    # Non-blocking background task (Rule 3)
-                    asyncio.create_task(redis_cache.set(f"movie_title_{clean_title_val}", json.dumps(movie_data), ttl=86400))
-                # --- END NEW ---
+            # Live index + (rebuild chal raha ho to) uska delta log
+            _record_fuzzy_delta([movie_data], [])
+            bump_catalog_version()
+        broadcast_catalog_delta([movie_data], [])
+        # --- NEW: Update Redis Cache asynchronously (sirf is title ka chunk) ---
+        if redis_cache.is_ready():
+            # Non-blocking background task (Rule 3)
+            asyncio.create_task(redis_cache.update_fuzzy_titles(upserts=[movie_data]))
+        # --- END NEW ---
 
     # UI Enhancement: Migration result format
     result_text = (
@@ -2209,22 +2765,21 @@ async def auto_index_handler(message: types.Message, db_primary: Database, db_fa
         # Result check: Agar "duplicate" ya "updated" hai to log karo
         if res == "duplicate":
             logger.info(f"{log_prefix} Skipped (Duplicate File).")
-        elif res == "updated":
-            logger.info(f"{log_prefix} Updated Existing Entry.")
-        elif res is True: 
-            # Sirf nayi movie ke liye cache update karo
+        elif res is True or res == "updated":
+            # Nayi movie ya badla hua title/year: cache mein upsert (imdb_id -> entry map se O(1))
+            movie_data = {
+                "imdb_id": imdb_id,
+                "title": title,
+                "year": year,
+                "clean_title": clean_title_val
+            }
             async with FUZZY_CACHE_LOCK:
-                if clean_title_val not in fuzzy_movie_cache:
-                    movie_data = {
-                        "imdb_id": imdb_id,
-                        "title": title,
-                        "year": year,
-                        "clean_title": clean_title_val
-                    }
-                    fuzzy_movie_cache[clean_title_val] = movie_data
-                    if redis_cache.is_ready():
-                         asyncio.create_task(redis_cache.set(f"movie_title_{clean_title_val}", json.dumps(movie_data), ttl=86400))
-            logger.info(f"{log_prefix} New Movie Added & Cached.")
+                _record_fuzzy_delta([movie_data], [])
+                bump_catalog_version()
+            broadcast_catalog_delta([movie_data], [])
+            if redis_cache.is_ready():
+                 asyncio.create_task(redis_cache.update_fuzzy_titles(upserts=[movie_data]))
+            logger.info(f"{log_prefix} {'New Movie Added' if res is True else 'Updated Existing Entry'} & Cached.")
     
     asyncio.create_task(run_tasks())
 @dp.message(Command("stats"), AdminFilter())
@@ -2265,6 +2820,7 @@ async def generate_admin_dashboard(db_primary: Database, db_fallback: Database,
     )
 
     redis_ok = redis_cache.is_ready()
+    result_cache = search_result_cache.stats()
 
     # 5. Icons & Formatting
     def status_icon(is_ok): return "🟢 Online" if is_ok else "🔴 Offline"
@@ -2306,6 +2862,7 @@ async def generate_admin_dashboard(db_primary: Database, db_fallback: Database,
         f"• *Queue Load:* {priority_queue._queue.qsize()} tasks\n"
         f"• *Search Engine:* {search_status}\n"
         f"• *Memory Cache:* {len(fuzzy_movie_cache):,} titles\n"
+        f"• *Result Cache:* {result_cache['hit_ratio']:.0%} hits | {result_cache['size']:,}/{result_cache['max_size']:,} | {result_cache['evictions']:,} evicted\n"
         f"• *Uptime:* {get_uptime()}\n"
         f"━━━━━━━━━━━━━━━━━━━━━━━━"
     )
@@ -2386,7 +2943,9 @@ async def show_admin_panel(message: types.Message, is_edit: bool = False):
         
         "🔧 **MAINTENANCE & REPAIR**\n"
         "• <code>/check_db</code> - Diagnostics\n"
-        "• <code>/reload_fuzzy_cache</code> - Refresh Search Index\n"
+        "• <code>/reload_fuzzy_cache [full]</code> - Refresh Search Index (delta / full)\n"
+        "• <code>/shadow_report [hours] [engine]</code> - Shadow Engine vs Production\n"
+        "• <code>/near_duplicates [collapse N]</code> - Near-Duplicate Uploads (MinHash report / collapse)\n"
         "• <code>/cleanup_titles</code> - Remove @usernames/links from titles\n"
         "• <code>/rebuild_clean_titles_m1</code> - Fix M1 Index\n"
         "• <code>/rebuild_clean_titles_m2</code> - Fix M2 Index\n"
@@ -2548,6 +3107,10 @@ async def sync_neon_freeze_fix(message: types.Message, db_primary: Database, db_
 async def rem_dupes_freeze_fix(message: types.Message, db_primary: Database, db_neon: NeonDB):
     await run_in_background(remove_library_duplicates_command, message, db_primary=db_primary, db_neon=db_neon)
 
+@dp.message(Command("near_duplicates"), AdminFilter())
+async def near_dupes_freeze_fix(message: types.Message, db_primary: Database, db_fallback: Database, db_neon: NeonDB):
+    await run_in_background(near_duplicates_command, message, db_primary=db_primary, db_fallback=db_fallback, db_neon=db_neon)
+
 # =======================================================
 # +++++ ORIGINAL BOT HANDLERS PRESERVED +++++
 # =======================================================
@@ -2844,7 +3407,7 @@ async def import_json_command(message: types.Message, db_primary: Database, db_f
             
     # UI Enhancement: Final import status
     await safe_tg_call(msg.edit_text(f"✅ **IMPORT SUCCESSFUL**\n\n**Processed:** {total-s-f:,}\n**Skipped:** {s:,}\n**Failed:** {f:,}"))
-    await load_fuzzy_cache(db_primary)
+    await refresh_fuzzy_cache(db_primary)
     await safe_tg_call(message.answer("🧠 **Search Index Updated**"))
 
 
@@ -2866,14 +3429,12 @@ async def remove_dead_movie_command(message: types.Message, db_primary: Database
     
     if db1_del:
         async with FUZZY_CACHE_LOCK:
-            global fuzzy_movie_cache
-            key_to_delete = None
-            for key, movie_dict in fuzzy_movie_cache.items():
-                if movie_dict['imdb_id'] == imdb_id:
-                    key_to_delete = key
-                    break
-            if key_to_delete and key_to_delete in fuzzy_movie_cache:
-                del fuzzy_movie_cache[key_to_delete]
+            # Sirf yahi imdb_id hatayein (same clean_title wali doosri movies rehti hain)
+            _record_fuzzy_delta([], [imdb_id])
+            bump_catalog_version()
+        broadcast_catalog_delta([], [imdb_id])
+        if redis_cache.is_ready():
+            asyncio.create_task(redis_cache.update_fuzzy_titles(deletes=[imdb_id]))
     
     db1_stat = "✅ M1" if db1_del else "❌ M1"
     db2_stat = "✅ M2" if db2_del else "❌ M2"
@@ -2891,7 +3452,7 @@ async def cleanup_mongo_1_command(message: types.Message, db_primary: Database):
     deleted_count, duplicates_found = await safe_db_call(db_primary.cleanup_mongo_duplicates(batch_limit=100), default=(0,0))
     if deleted_count > 0:
         await safe_tg_call(msg.edit_text(f"✅ **M1 Cleaned**\nDeleted: {deleted_count}\nRemaining: {max(0, duplicates_found - deleted_count)}"))
-        await load_fuzzy_cache(db_primary)
+        await refresh_fuzzy_cache(db_primary)
     else:
         await safe_tg_call(msg.edit_text("✅ **M1 Clean**: No duplicates found."))
 
@@ -2945,6 +3506,100 @@ async def remove_library_duplicates_command(message: types.Message, status_msg:
         f"⚠️ Remaining: {max(0, total_duplicates - deleted_count)}\n\n"
         f"ℹ️ Run again to continue cleaning."
     ))
+async def near_duplicates_command(message: types.Message, status_msg: types.Message, db_primary: Database, db_fallback: Database, db_neon: NeonDB):
+    # /near_duplicates = sirf report; /near_duplicates collapse [N] = report + max N dupes hatao (default 200)
+    args = message.text.split()[1:]
+    collapse = bool(args) and args[0].lower() == "collapse"
+    limit = int(args[1]) if collapse and len(args) > 1 and args[1].isdigit() else 200
+    if not NUMPY_AVAILABLE:
+        await safe_tg_call(status_msg.edit_text("❌ **NumPy Missing**: Near-duplicate scan ke liye numpy install karein.")); return
+    await safe_tg_call(status_msg.edit_text("🧬 **Near-Duplicate Scan**: Catalog stream ho raha hai (MinHash/LSH)..."))
+
+    loop = asyncio.get_running_loop()
+    finder = NearDuplicateFinder()
+    clusters: List[Dict] = []
+    started = last_update = time.monotonic()
+    try:
+        # Year-wise partitions: ek partition poori hote hi executor mein cluster, RAM mein sirf wahi rehti hai
+        async for doc in db_primary.iter_movies_for_dedupe():
+            partition = finder.add(doc)
+            if partition:
+                clusters.extend(await loop.run_in_executor(executor, finder.cluster, partition))
+            if time.monotonic() - last_update > 15:
+                last_update = time.monotonic()
+                await safe_tg_call(status_msg.edit_text(f"🧬 **Near-Duplicate Scan**\nScanned: {finder.scanned:,}\nClusters: {len(clusters):,}"))
+        partition = finder.finish()
+        if partition:
+            clusters.extend(await loop.run_in_executor(executor, finder.cluster, partition))
+    except Exception as e:
+        logger.error(f"Near-duplicate scan error: {e}", exc_info=True)
+        await safe_tg_call(status_msg.edit_text(f"❌ **Scan Failed**: {e}")); return
+
+    total_dupes = sum(len(c["dupes"]) for c in clusters)
+    logger.info(f"🧬 Near-duplicate scan: {finder.scanned:,} docs, {len(clusters):,} clusters, {total_dupes:,} dupes ({time.monotonic() - started:.0f}s).")
+    if not clusters:
+        await safe_tg_call(status_msg.edit_text(f"✅ **Library Lean**: {finder.scanned:,} titles, koi near-duplicate nahi mila."))
+        return
+
+    # Poori cluster report file mein (message mein sirf summary)
+    clusters.sort(key=lambda c: len(c["dupes"]), reverse=True)
+    report_bytes = await loop.run_in_executor(executor, lambda: json.dumps(clusters, indent=2, default=str).encode('utf-8'))
+    file_name = f"near_duplicates_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.json"
+    preview = "\n".join(f"• {html.escape(str(c['keep']['title']))} ({c['year'] or '—'}) +{len(c['dupes'])}" for c in clusters[:10])
+    await safe_tg_call(
+        message.answer_document(
+            BufferedInputFile(report_bytes, filename=file_name),
+            caption=f"🧬 **Near-Duplicate Report**\nClusters: {len(clusters):,} | Dupes: {total_dupes:,}\n\n{preview}"[:1024]
+        ),
+        semaphore=TELEGRAM_COPY_SEMAPHORE
+    )
+
+    if not collapse:
+        await safe_tg_call(status_msg.edit_text(
+            f"✅ **Scan Done**: {finder.scanned:,} titles\n"
+            f"🧬 Clusters: {len(clusters):,} | Dupes: {total_dupes:,}\n\n"
+            f"ℹ️ Hatane ke liye: <code>/near_duplicates collapse {min(total_dupes, 200)}</code>"
+        ))
+        return
+
+    # Collapse: har cluster ka 'keep' rehta hai; dupes teeno DBs + search index (aur baaki instances) se hatte hain
+    to_remove = [(d["imdb_id"], c["keep"]["imdb_id"]) for c in clusters for d in c["dupes"]][:limit]
+    removed: List[str] = []  # M1 se hata (catalog/search index M1 follow karta hai)
+    partial_fails: List[str] = []  # Kisi store mein delete confirm nahi (missing ya error): stores diverge ho sakte hain
+    for i, (imdb_id, keep_id) in enumerate(to_remove, 1):
+        results = await asyncio.gather(
+            safe_db_call(db_primary.remove_movie_by_imdb(imdb_id)),
+            safe_db_call(db_fallback.remove_movie_by_imdb(imdb_id)),
+            safe_db_call(db_neon.remove_movie_by_imdb(imdb_id)),
+        )
+        status = " ".join(f"{'✅' if ok else '❌'}{name}" for name, ok in zip(("M1", "M2", "Neon"), results))
+        # Delete undo nahi hota: har collapse ka record (dupe -> kis id mein merge hua)
+        logger.info(f"🧬 Near-duplicate collapse: {imdb_id} -> {keep_id} ({status})")
+        if results[0]: removed.append(imdb_id)
+        if not all(results):
+            partial_fails.append(f"{imdb_id} ({status})")
+            logger.warning(f"⚠️ Near-duplicate collapse partial: {imdb_id} -> {keep_id} ({status})")
+        if time.monotonic() - last_update > 15:
+            last_update = time.monotonic()
+            await safe_tg_call(status_msg.edit_text(f"🗑️ **Collapsing**: {i:,}/{len(to_remove):,}"))
+    if removed:
+        async with FUZZY_CACHE_LOCK:
+            _record_fuzzy_delta([], removed)
+            bump_catalog_version()
+        broadcast_catalog_delta([], removed)
+        if redis_cache.is_ready():
+            asyncio.create_task(redis_cache.update_fuzzy_titles(deletes=removed))
+
+    await safe_tg_call(status_msg.edit_text(
+        f"{'⚠️' if partial_fails else '✅'} **Collapse Report**\n"
+        f"━━━━━━━━━━━━━━━━━━\n"
+        f"🧬 Clusters: {len(clusters):,}\n"
+        f"🗑️ Removed: {len(removed):,}\n"
+        f"⚠️ Remaining: {max(0, total_dupes - len(removed)):,}\n"
+        + (f"❗ Partial (stores mismatch): {len(partial_fails):,}\n" + "\n".join(f"• <code>{p}</code>" for p in partial_fails[:10]) + "\n" if partial_fails else "")
+        + f"\nℹ️ Run again to continue cleaning."
+    ))
+
 @dp.message(Command("sync_mongo_1_to_neon"), AdminFilter())
 @handler_timeout(1800)
 async def sync_mongo_1_to_neon_command(message: types.Message, status_msg: types.Message, db_primary: Database, db_neon: NeonDB):
@@ -3025,7 +3680,7 @@ async def rebuild_clean_titles_m1_command(message: types.Message, db_primary: Da
     await safe_db_call(db_primary.create_mongo_text_index())
     await safe_tg_call(msg.edit_text(f"✅ **Rebuild Done**\nFixed: {updated:,} / {total:,}"))
     
-    await load_fuzzy_cache(db_primary)
+    await refresh_fuzzy_cache(db_primary)
     await safe_tg_call(message.answer("🧠 **Cache Reloaded**"))
 
 @dp.message(Command("force_rebuild_m1"), AdminFilter())
@@ -3080,7 +3735,8 @@ async def force_rebuild_m1_command(message: types.Message, status_msg: types.Mes
     )
     
     await safe_tg_call(status_msg.edit_text(final_text))
-    await load_fuzzy_cache(db_primary)
+    # Force rebuild har doc touch karta hai, delta se koi fayda nahi
+    await refresh_fuzzy_cache(db_primary, force_full=True)
 
 
 @dp.message(Command("rebuild_clean_titles_m2"), AdminFilter())
@@ -3108,7 +3764,7 @@ async def cleanup_titles_command(message: types.Message, db_primary: Database, d
     updated_m2, total_m2 = await safe_db_call(db_fallback.cleanup_movie_titles(), timeout=240, default=(0,0))
 
     if updated_m1 > 0 or updated_m2 > 0:
-        await load_fuzzy_cache(db_primary) # M1 se Cache reload karein
+        await refresh_fuzzy_cache(db_primary) # M1 se Cache refresh (delta) karein
         
         await safe_tg_call(msg.edit_text(
             f"✅ **Title Cleanup Complete**\n"
@@ -3149,12 +3805,32 @@ async def rebuild_neon_vectors_command(message: types.Message, db_neon: NeonDB):
         await safe_tg_call(msg.edit_text("❌ **Failed**: Error during rebuild."))
 
 
+@dp.message(Command("shadow_report"), AdminFilter())
+@handler_timeout(30)
+async def shadow_report_command(message: types.Message, db_primary: Database):
+    # /shadow_report [hours] [engine] = production vs candidate engine comparison
+    args = message.text.split()[1:]
+    hours = int(args[0]) if args and args[0].isdigit() else 24
+    engine = next((a.lower() for a in args if not a.isdigit()), None)
+    await shadow_evaluator.flush()
+    samples = await safe_db_call(db_primary.get_shadow_samples(hours, engine), timeout=20, default=[])
+    report = format_shadow_report(summarize_shadow_samples(samples), hours)
+    if shadow_evaluator.enabled():
+        stats = shadow_evaluator.stats()
+        report += f"\n\n📡 Live: <code>{stats['engine']}</code> @ {stats['sample_rate']:.0%}, dropped {stats['dropped']:,}, failed {stats['failed']:,}"
+    else:
+        report += "\n\n💤 Shadow mode abhi off hai (SHADOW_SEARCH_ENGINE set karein)."
+    await safe_tg_call(message.answer(report), semaphore=TELEGRAM_COPY_SEMAPHORE)
+
+
 @dp.message(Command("reload_fuzzy_cache"), AdminFilter())
 @handler_timeout(300)
 async def reload_fuzzy_cache_command(message: types.Message, db_primary: Database):
-    msg = await safe_tg_call(message.answer("🧠 **Reloading Cache**..."), semaphore=TELEGRAM_COPY_SEMAPHORE)
+    # /reload_fuzzy_cache full = poora reload (Redis/Mongo), warna delta refresh
+    force_full = len(message.text.split()) > 1 and message.text.split()[1].lower() == "full"
+    msg = await safe_tg_call(message.answer("🧠 **Reloading Cache**..." if force_full else "🧠 **Refreshing Cache (delta)**..."), semaphore=TELEGRAM_COPY_SEMAPHORE)
     if not msg: return
-    await load_fuzzy_cache(db_primary)
+    await refresh_fuzzy_cache(db_primary, force_full=force_full)
     await safe_tg_call(message.answer(f"✅ **Reloaded**\nSize: {len(fuzzy_movie_cache):,} titles."))
 
 
@@ -3173,7 +3849,7 @@ async def check_db_command(message: types.Message, db_primary: Database, db_neon
     if fuzzy_movie_cache:
         try:
             first_key = next(iter(fuzzy_movie_cache))
-            sample = fuzzy_movie_cache[first_key]
+            sample = fuzzy_movie_cache[first_key][0]
             fuzzy_cache_check = {"title": sample.get('title'), "clean_title": sample.get('clean_title')}
         except StopIteration:
             pass
@@ -3249,7 +3925,11 @@ async def main_polling():
             raise RuntimeError("Database 1 connection failed on startup.")
             
         await db_neon.init_db()
-        await load_fuzzy_cache(db_primary) 
+        if await restore_index_snapshot():
+            asyncio.create_task(refresh_fuzzy_cache(db_primary, broadcast=False))
+        else:
+            await load_fuzzy_cache(db_primary) 
+        start_catalog_events()
     except Exception as init_err:
         logger.critical(f"Local main() mein DB init fail: {init_err}", exc_info=True); return
 
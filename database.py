@@ -23,6 +23,13 @@ except ImportError:
 
 logger = logging.getLogger("bot.database")
 
+# Deleted movies ke tombstones kitne din rakhein (delta refresh is window ke andar hi safe hai)
+TOMBSTONE_TTL_SECONDS = int(os.getenv("TOMBSTONE_TTL_DAYS", "7")) * 86400
+# Shadow search comparisons (shadow_search.py) itne din baad auto-expire
+SHADOW_METRICS_TTL_SECONDS = int(os.getenv("SHADOW_METRICS_TTL_DAYS", "14")) * 86400
+# Clock skew / in-flight writes ke liye watermark thoda peeche se query hota hai
+DELTA_WATERMARK_OVERLAP = timedelta(seconds=30)
+
 # Helper function (FUZZY SEARCH ke saath SYNCHRONIZED kiya gaya)
 def clean_text_for_search(text: str) -> str:
     """Cleans text for search indexing (Synchronized with bot.py's safer version)."""
@@ -64,6 +71,9 @@ class Database:
         self.shortlink_tokens = None
         self.settings = None 
         self.analytics = None
+        self.tombstones = None # NEW: Deleted movies log (fuzzy cache delta refresh)
+        # Fuzzy cache snapshot kis time tak ka hai (delta refresh watermark)
+        self.fuzzy_snapshot_at: datetime | None = None
 
     async def _connect(self):
         """Internal method to establish connection and select collections।"""
@@ -104,6 +114,8 @@ class Database:
             self.shortlink_tokens = self.db["shortlink_tokens"]
             self.settings = self.db["settings"]
             self.analytics = self.db["analytics"]
+            self.tombstones = self.db["movie_tombstones"]
+            self.search_shadow = self.db["search_shadow_metrics"]
             
             logger.info(f"Connected to MongoDB Atlas, selected database: {self.db.name}")
             return True
@@ -167,6 +179,10 @@ class Database:
             await self.movies.create_index("file_unique_id")
             await self.movies.create_index("clean_title") # Simple index
             await self.movies.create_index("added_date")
+            await self.movies.create_index("updated_at") # Delta refresh watermark
+            await self.movies.create_index([("year", 1), ("clean_title", 1)]) # Near-duplicate scan (year-wise stream)
+            await self.tombstones.create_index("imdb_id", unique=True)
+            await self.tombstones.create_index("deleted_at", expireAfterSeconds=TOMBSTONE_TTL_SECONDS)
 
             # NAYA: Lock index
             # Ensure unique locks and TTL for auto-cleanup if a worker dies
@@ -181,6 +197,8 @@ class Database:
             await self.shortlink_tokens.create_index("token", unique=True)
             await self.shortlink_tokens.create_index("expiry", expireAfterSeconds=0) # Auto expire tokens
             await self.analytics.create_index("type")
+            await self.search_shadow.create_index([("engine", 1), ("ts", -1)])
+            await self.search_shadow.create_index("ts", expireAfterSeconds=SHADOW_METRICS_TTL_SECONDS)
 
             # Text search ke liye special index
             await self.create_mongo_text_index()
@@ -294,6 +312,28 @@ class Database:
         except Exception as e:
             logger.error(f"Analytics Error: {e}")
 
+    # --- Shadow Search Metrics ---
+    async def add_shadow_samples(self, samples: List[Dict]) -> int:
+        """Shadow comparisons ka batch insert (best-effort, fail par sirf log)."""
+        if not samples: return 0
+        try:
+            result = await self.search_shadow.insert_many(samples, ordered=False)
+            return len(result.inserted_ids)
+        except Exception as e:
+            logger.error(f"Shadow metrics insert error: {e}")
+            return 0
+
+    async def get_shadow_samples(self, hours: int = 24, engine: str | None = None, limit: int = 20000) -> List[Dict]:
+        """Pichhle `hours` ke shadow samples (report ke liye sirf numeric fields, latest pehle)."""
+        query: Dict[str, Any] = {"ts": {"$gte": datetime.now(timezone.utc) - timedelta(hours=hours)}}
+        if engine: query["engine"] = engine
+        projection = {"_id": 0, "engine": 1, "prod_ms": 1, "cand_ms": 1, "prod_cpu_ms": 1, "cand_cpu_ms": 1, "overlap5": 1, "top1_match": 1}
+        try:
+            return await self.search_shadow.find(query, projection).sort("ts", -1).limit(limit).to_list(length=limit)
+        except Exception as e:
+            logger.error(f"Shadow metrics read error: {e}")
+            return []
+
     # --- NAYE FUNCTIONS: Cross-Process Lock ---
     async def check_if_lock_exists(self, lock_name: str) -> bool:
         """FIX for AttributeError: Checks if a non-expired lock exists। (Used for Webhook setup skip)"""
@@ -625,6 +665,7 @@ class Database:
 
     async def add_movie(self, imdb_id: str, title: str, year: str | None, file_id: str, message_id: int, channel_id: int, clean_title: str, file_unique_id: str) -> Literal[True, "updated", "duplicate", False]:
         if not await self.is_ready(): await self._connect()
+        now = datetime.now(timezone.utc)
         movie_doc = {
             "imdb_id": imdb_id,
             "title": title,
@@ -634,7 +675,8 @@ class Database:
             "file_unique_id": file_unique_id,
             "channel_id": channel_id,
             "message_id": message_id,
-            "added_date": datetime.now(timezone.utc)
+            "added_date": now,
+            "updated_at": now
         }
         try:
             result = await self.movies.update_one(
@@ -662,17 +704,33 @@ class Database:
         if not await self.is_ready(): await self._connect()
         try:
             result = await self.movies.delete_many({"imdb_id": imdb_id})
+            if result.deleted_count > 0:
+                await self._record_tombstones([imdb_id])
             return result.deleted_count > 0
         except Exception as e:
             logger.error(f"remove_movie_by_imdb error for {imdb_id}: {e}", exc_info=False)
             await self._handle_db_error(e)
             return False
 
+    async def _record_tombstones(self, imdb_ids: List[str]):
+        """Deleted imdb_ids ko tombstone collection mein likhta hai (fuzzy cache delta refresh ke liye)."""
+        if not imdb_ids or self.tombstones is None: return
+        now = datetime.now(timezone.utc)
+        try:
+            await self.tombstones.bulk_write(
+                [pymongo.UpdateOne({"imdb_id": i}, {"$set": {"deleted_at": now}}, upsert=True) for i in imdb_ids],
+                ordered=False
+            )
+        except Exception as e:
+            logger.error(f"Tombstone write error ({len(imdb_ids)} ids): {e}", exc_info=False)
+
     async def remove_json_imports(self) -> int:
         if not await self.is_ready(): await self._connect()
         try:
             filter_query = {"imdb_id": {"$regex": "^json_"}}
+            removed_ids = await self.movies.distinct("imdb_id", filter_query)
             result = await self.movies.delete_many(filter_query)
+            await self._record_tombstones(removed_ids)
             logger.info(f"Removed {result.deleted_count} entries from JSON imports।")
             return result.deleted_count
         except Exception as e:
@@ -694,6 +752,7 @@ class Database:
         
         duplicates_found_pass = 0
         ids_to_delete = []
+        touched_imdb = []
         
         try:
             # FIX: Prevent OOM on large datasets by allowing disk usage
@@ -708,6 +767,7 @@ class Database:
                 
                 # Keep the latest one (index 0), delete the rest
                 ids_to_delete.extend([doc['_id'] for doc in sorted_docs[1:]])
+                touched_imdb.append(group['_id'])
                 
                 if len(ids_to_delete) >= batch_limit:
                     break
@@ -718,6 +778,11 @@ class Database:
             ids_to_delete = ids_to_delete[:batch_limit]
             
             result = await self.movies.delete_many({"_id": {"$in": ids_to_delete}})
+            # Bache hue docs ko touch karein taaki delta refresh unka title dobara le
+            await self.movies.update_many(
+                {"imdb_id": {"$in": touched_imdb}},
+                {"$set": {"updated_at": datetime.now(timezone.utc)}}
+            )
             
             deleted_count = result.deleted_count
             logger.info(f"Successfully deleted {deleted_count} Mongo duplicates (by imdb_id)।")
@@ -729,6 +794,14 @@ class Database:
             await self._handle_db_error(e)
             return (0, 0)
 
+    async def iter_movies_for_dedupe(self, batch_size: int = 2000):
+        """Near-duplicate scan ke liye (year, clean_title) order mein stream; poora catalog RAM mein nahi aata."""
+        if not await self.is_ready(): await self._connect()
+        projection = {"_id": 0, "imdb_id": 1, "title": 1, "year": 1, "clean_title": 1, "added_date": 1}
+        cursor = self.movies.find({}, projection).sort([("year", 1), ("clean_title", 1)]).batch_size(batch_size)
+        async for doc in cursor:
+            yield doc
+
     async def rebuild_clean_titles(self, clean_title_func) -> Tuple[int, int]:
         if not await self.is_ready(): await self._connect()
         updated_count, total_count = 0, 0
@@ -748,7 +821,7 @@ class Database:
                     bulk_ops.append(
                         pymongo.UpdateOne(
                             {"_id": movie["_id"]},
-                            {"$set": {"clean_title": new_clean_title}}
+                            {"$set": {"clean_title": new_clean_title, "updated_at": datetime.now(timezone.utc)}}
                         )
                     )
             if bulk_ops:
@@ -799,7 +872,8 @@ class Database:
                             {"_id": movie["_id"]},
                             {"$set": {
                                 "title": cleaned_title,
-                                "clean_title": new_clean_title
+                                "clean_title": new_clean_title,
+                                "updated_at": datetime.now(timezone.utc)
                             }}
                         )
                     )
@@ -880,16 +954,19 @@ class Database:
         """
         # --- HOOK 3: Pehle Redis se load karne ki koshish karein ---
         if redis_cache.is_ready():
-            cached_data_dict = await redis_cache.load_fuzzy_cache()
-            if cached_data_dict:
-                # Redis se dictionary aayegi
-                return list(cached_data_dict.values())
+            cached = await redis_cache.load_fuzzy_cache()
+            if cached and cached[0]:
+                # Redis se (movies, snapshot watermark) aata hai
+                movies, self.fuzzy_snapshot_at = cached
+                return movies
         # --- END HOOK 3 (FALLBACK to MongoDB) ---
         
         if not await self.is_ready(): 
             return []
         
         try:
+            # Watermark query se PEHLE lete hain; beech mein hue writes agle delta mein aa jayenge
+            snapshot_at = datetime.now(timezone.utc)
             # FIX: Memory Optimized Fetch (No Aggregation)
             # Hum sirf raw data layenge aur Python mein dedup karenge (Faster for Free Tier)
             cursor = self.movies.find(
@@ -917,12 +994,12 @@ class Database:
                 }
             
             movies = list(movies_dict.values())
+            self.fuzzy_snapshot_at = snapshot_at
 
             # --- HOOK 4: Agar Mongo se load hua, toh Redis mein save karein ---
             if movies and redis_cache.is_ready():
-                # Dictionary banana jiske keys 'clean_title' hon
-                cache_dict = {m['clean_title']: m for m in movies if m.get('clean_title')}
-                asyncio.create_task(redis_cache.save_fuzzy_cache(cache_dict))
+                # Har movie apni row (same clean_title wali movies ab overwrite nahi hoti)
+                asyncio.create_task(redis_cache.save_fuzzy_cache([m for m in movies if m.get('clean_title')], watermark=snapshot_at))
             # --- END HOOK 4 ---
 
             return movies
@@ -930,6 +1007,37 @@ class Database:
             logger.error(f"get_all_movies_for_fuzzy_cache error: {e}", exc_info=True)
             return []
 
+    async def get_fuzzy_cache_delta(self, since: datetime) -> Tuple[List[Dict], List[str], datetime] | None:
+        """
+        Delta refresh: `since` ke baad badle movies + deleted imdb_ids (tombstones).
+        Returns (changed_movies, deleted_imdb_ids, new_watermark), error par None (caller full reload kare).
+        """
+        if not await self.is_ready(): return None
+        try:
+            new_watermark = datetime.now(timezone.utc)
+            query_from = since - DELTA_WATERMARK_OVERLAP
+            cursor = self.movies.find(
+                {"updated_at": {"$gte": query_from}},
+                {"imdb_id": 1, "title": 1, "year": 1, "clean_title": 1, "_id": 0}
+            )
+            changed = {}
+            async for m in cursor:
+                clean_title = m.get("clean_title") or clean_text_for_search(m.get("title", ""))
+                changed[m["imdb_id"]] = {
+                    'imdb_id': m["imdb_id"],
+                    'title': m.get("title", "N/A"),
+                    'year': m.get("year"),
+                    'clean_title': clean_title
+                }
+            deleted = await self.tombstones.distinct("imdb_id", {"deleted_at": {"$gte": query_from}})
+            # Jo wapas add ho gaya (re-index) woh deleted nahi maana jayega
+            deleted = [i for i in deleted if i not in changed]
+            return list(changed.values()), deleted, new_watermark
+        except Exception as e:
+            logger.error(f"get_fuzzy_cache_delta error: {e}", exc_info=True)
+            await self._handle_db_error(e)
+            return None
+
     # --- NAYA DIAGNOSTIC FUNCTION ---
     async def check_mongo_clean_title(self) -> Dict | None:
         """Checks if clean_title exists in Mongo।"""
@@ -994,7 +1102,7 @@ class Database:
                         cleaned_title_for_db = remove_junk_from_title(raw_title) 
                         new_clean_title = clean_title_func(cleaned_title_for_db)
                         
-                        update_fields = {"clean_title": new_clean_title}
+                        update_fields = {"clean_title": new_clean_title, "updated_at": datetime.now(timezone.utc)}
                         
                         # Check if raw title had junk that was cleaned
                         if cleaned_title_for_db != raw_title:
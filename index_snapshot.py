@@ -0,0 +1,96 @@
+# index_snapshot.py
+import os
+import mmap
+import time
+import pickle
+import struct
+import logging
+import tempfile
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from search_index import MovieCatalog, TrigramIndex
+
+logger = logging.getLogger("bot.index_snapshot")
+
+# Local disk snapshot: restart/scale-out par search turant ready (Mongo/Redis load ka wait nahi)
+INDEX_SNAPSHOT_ENABLED = os.getenv("INDEX_SNAPSHOT_ENABLED", "True").lower() == 'true'
+INDEX_SNAPSHOT_PATH = os.getenv("INDEX_SNAPSHOT_PATH", os.path.join(tempfile.gettempdir(), "search_index.snap"))
+# Catalog change ke baad itne seconds tak aur changes ka wait, phir ek hi baar likhte hain
+INDEX_SNAPSHOT_DELAY = int(os.getenv("INDEX_SNAPSHOT_DELAY", "60"))
+
+# File layout: MAGIC | header length (u32) | header (pickle) | payload (pickle)
+# Format version badalne par purani files ignore ho jaati hain (full load hota hai)
+SNAPSHOT_MAGIC = b"MBIDXSNP"
+SNAPSHOT_FORMAT_VERSION = 4
+_LEN = struct.Struct("<I")
+
+
+class IndexSnapshot(NamedTuple):
+    catalog: MovieCatalog
+    trigram_index: TrigramIndex
+    watermark: Optional[datetime]
+    created_at: float
+
+
+def dump_snapshot(catalog: MovieCatalog, trigram_index: TrigramIndex) -> bytes:
+    """
+    Catalog arrays + trigram postings ka payload (CPU bound, executor mein). Beech mein mutation ho to
+    payload torn ho sakta hai (ya RuntimeError): caller catalog version pehle/baad compare karke hi likhe.
+    """
+    return pickle.dumps((catalog, trigram_index), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def write_snapshot(payload: bytes, titles: int, watermark: Optional[datetime], path: str = INDEX_SNAPSHOT_PATH) -> int:
+    """dump_snapshot payload ko versioned binary file mein likhta hai (atomic rename). Returns: bytes written."""
+    header = pickle.dumps({
+        "format": SNAPSHOT_FORMAT_VERSION,
+        "created_at": time.time(),
+        "watermark": watermark,
+        "titles": titles,
+        "payload_size": len(payload),
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(_LEN.pack(len(header)))
+        f.write(header)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(SNAPSHOT_MAGIC) + _LEN.size + len(header) + len(payload)
+
+
+def save_snapshot(catalog: MovieCatalog, trigram_index: TrigramIndex, watermark: Optional[datetime], path: str = INDEX_SNAPSHOT_PATH) -> int:
+    """dump + write ek saath (catalog us dauran mutate na ho raha ho tab)."""
+    return write_snapshot(dump_snapshot(catalog, trigram_index), len(catalog), watermark, path)
+
+
+def load_snapshot(path: str = INDEX_SNAPSHOT_PATH) -> Optional[IndexSnapshot]:
+    """Snapshot file ko mmap karke load karta hai. File na ho / version alag ho / corrupt ho to None."""
+    if not os.path.exists(path): return None
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                logger.warning(f"Index snapshot {path} ka format pehchana nahi gaya, ignore kar rahe hain.")
+                return None
+            pos = len(SNAPSHOT_MAGIC)
+            (header_len,) = _LEN.unpack_from(mm, pos)
+            pos += _LEN.size
+            header = pickle.loads(mm[pos:pos + header_len])
+            pos += header_len
+            if header.get("format") != SNAPSHOT_FORMAT_VERSION:
+                logger.info(f"Index snapshot version {header.get('format')} purana hai (current {SNAPSHOT_FORMAT_VERSION}).")
+                return None
+            if len(mm) - pos != header["payload_size"]:
+                logger.warning("Index snapshot adhoori hai (size mismatch), ignore kar rahe hain.")
+                return None
+            # Payload seedha mmap buffer se unpickle hota hai (alag bytes copy nahi)
+            with memoryview(mm)[pos:] as payload_view:
+                catalog, trigram_index = pickle.loads(payload_view)
+        return IndexSnapshot(catalog, trigram_index, header.get("watermark"), header["created_at"])
+    except Exception as e:
+        logger.error(f"Index snapshot load error ({path}): {e}", exc_info=True)
+        return None
@@ -0,0 +1,181 @@
+# near_dupes.py
+# Near-duplicate detection: normalized title + year par MinHash signatures, LSH banding se candidate pairs,
+# union-find se clusters. Catalog (year, clean_title) order mein stream hota hai; RAM mein sirf ek partition.
+import os
+import re
+import zlib
+import logging
+from typing import Dict, List, Optional
+
+from batch_scorer import np, NUMPY_AVAILABLE
+from search_engine import clean_text_for_search
+
+logger = logging.getLogger("bot.near_dupes")
+
+# Signature size aur LSH bands (rows per band = NUM_PERM / BANDS). 64/16 = 4 rows: ~0.5 Jaccard se upar wale pairs candidate
+DEDUPE_NUM_PERM = int(os.getenv("DEDUPE_NUM_PERM", "64"))
+DEDUPE_BANDS = int(os.getenv("DEDUPE_BANDS", "16"))
+# Candidate pair tabhi duplicate jab estimated Jaccard (signature agreement) itna ho
+DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.8"))
+# Ek partition (same year) isse badi ho to clean_title order mein tukde (sirf boundary par pairs chhoot sakte hain)
+DEDUPE_MAX_PARTITION = int(os.getenv("DEDUPE_MAX_PARTITION", "50000"))
+# Character shingle size
+DEDUPE_SHINGLE = 4
+# Signatures itne docs ke chunks mein (hash matrix ka size bounded)
+_SIG_CHUNK = 2000
+_PRIME = (1 << 31) - 1
+
+# Release names ke tags: same movie ke alag uploads mein yahi badalte hain (episode tags S01E02 jaan-boojh kar nahi)
+RELEASE_TOKENS = frozenset((
+    "4k uhd hd fhd sd hdr hdr10 dv web webrip webdl dl bluray bdrip brrip dvdrip dvdscr hdrip hdtv hdcam camrip cam "
+    "ts tc predvd rip x264 x265 h264 h265 hevc avc aac ac3 dd ddp dd5 ddp5 atmos 10bit 8bit mkv mp4 avi "
+    "hindi english eng tamil telugu malayalam kannada bengali punjabi marathi gujarati dual audio multi org "
+    "dubbed dub esub esubs sub subs msub msubs proper repack extended uncut remastered imax full hq"
+).split())
+_RELEASE_RE = re.compile(r"^(\d{3,4}p|\d{1,2}bit|\d(ch|ch1)?|\d{3,4}mb|\d(\.\d)?gb)$")
+_YEAR_RE = re.compile(r"^(19[0-9]\d|20[0-3]\d)$")
+
+
+def normalize_for_dedupe(title: str, year: str | None = None) -> tuple[str, str]:
+    """(title without release tags/year, year). Year field na ho to title ke year token se."""
+    tokens = clean_text_for_search(title).split()
+    found_year = None
+    kept = []
+    for token in tokens:
+        if _YEAR_RE.match(token):
+            found_year = token
+            continue
+        if token in RELEASE_TOKENS or _RELEASE_RE.match(token): continue
+        kept.append(token)
+    # Sirf tags hi the ('1080p hindi'): original tokens hi rakhte hain
+    norm = " ".join(kept) or " ".join(tokens)
+    return norm, str(year or found_year or "")
+
+
+class MinHasher:
+    """Universal hashing ((a*x + b) mod p) se num_perm MinHash functions, character shingles par."""
+    def __init__(self, num_perm: int = DEDUPE_NUM_PERM, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, _PRIME, size=(num_perm, 1)).astype(np.uint64)
+        self.b = rng.randint(0, _PRIME, size=(num_perm, 1)).astype(np.uint64)
+
+    @staticmethod
+    def _shingles(text: str) -> List[int]:
+        padded = f" {text} "
+        if len(padded) <= DEDUPE_SHINGLE: return [zlib.crc32(padded.encode()) % _PRIME]
+        return list({zlib.crc32(padded[i:i + DEDUPE_SHINGLE].encode()) % _PRIME for i in range(len(padded) - DEDUPE_SHINGLE + 1)})
+
+    def signatures(self, texts: List[str]):
+        """(len(texts), num_perm) uint32 matrix. Chunks mein: hash matrix num_perm x shingles bounded rehta hai."""
+        out = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for start in range(0, len(texts), _SIG_CHUNK):
+            shingle_lists = [self._shingles(t) for t in texts[start:start + _SIG_CHUNK]]
+            lengths = np.fromiter((len(s) for s in shingle_lists), dtype=np.int64, count=len(shingle_lists))
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            hashes = np.fromiter((h for s in shingle_lists for h in s), dtype=np.uint64, count=int(lengths.sum()))
+            permuted = (self.a * hashes + self.b) % _PRIME
+            out[start:start + len(shingle_lists)] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        return out
+
+
+class NearDuplicateFinder:
+    """
+    Streaming use: docs (year, clean_title) order mein add() karo; partition (year) poori hote hi add() use
+    lauta deta hai, caller cluster(partition) executor mein chalata hai; end mein finish().
+    Cluster = {"year", "keep", "dupes", "similarity"}; real IMDb ids (tt...) kabhi dupes mein nahi jaate
+    (same naam + year ke do alag IMDb titles, e.g. alag language versions).
+    """
+    def __init__(self, threshold: float = DEDUPE_THRESHOLD, num_perm: int = DEDUPE_NUM_PERM,
+                 bands: int = DEDUPE_BANDS, max_partition: int = DEDUPE_MAX_PARTITION):
+        if num_perm % bands:
+            raise ValueError(f"DEDUPE_NUM_PERM ({num_perm}) DEDUPE_BANDS ({bands}) se divisible hona chahiye")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_partition = max_partition
+        self.hasher = MinHasher(num_perm)
+        self._pending: List[Dict] = []
+        self._partition_key: Optional[str] = None
+        self.scanned = 0
+
+    def add(self, doc: Dict) -> Optional[List[Dict]]:
+        norm, year = normalize_for_dedupe(doc.get('title') or doc.get('clean_title') or "", doc.get('year'))
+        if not norm: return None
+        self.scanned += 1
+        # Partition DB ke sort key (year field) par; bina year field wale docs ka year title se aata hai aur LSH key mein jaata hai
+        partition_key = str(doc.get('year') or "")
+        ready = None
+        if self._pending and (partition_key != self._partition_key or len(self._pending) >= self.max_partition):
+            ready, self._pending = self._pending, []
+        self._partition_key = partition_key
+        self._pending.append({**doc, "_norm": norm, "_year": year})
+        return ready
+
+    def finish(self) -> Optional[List[Dict]]:
+        ready, self._pending = self._pending, []
+        return ready or None
+
+    def cluster(self, partition: List[Dict]) -> List[Dict]:
+        """Ek partition ke near-duplicate clusters (CPU bound, executor mein chalayein)."""
+        n = len(partition)
+        if n < 2: return []
+        sigs = self.hasher.signatures([d["_norm"] for d in partition])
+        parent = list(range(n))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        # LSH: har band ki rows (+ year) ek uint64 key mein; same key wale docs candidate. Bucket mein star (pehle se) + chain (pichhle se) verify
+        mult = (np.arange(1, self.rows + 1, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+        year_keys = np.fromiter((int(d["_year"] or 0) for d in partition), dtype=np.uint64, count=n) * np.uint64(0xC2B2AE3D27D4EB4F)
+        for band in range(self.bands):
+            keys = (sigs[:, band * self.rows:(band + 1) * self.rows].astype(np.uint64) * mult).sum(axis=1) + year_keys
+            order = np.argsort(keys, kind='stable')
+            sorted_keys = keys[order]
+            run_starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+            run_ends = np.concatenate((run_starts[1:], [n]))
+            for s, e in zip(run_starts.tolist(), run_ends.tolist()):
+                if e - s < 2: continue
+                members = order[s:e]
+                star = (sigs[members[1:]] == sigs[members[0]]).mean(axis=1)
+                chain = (sigs[members[1:]] == sigs[members[:-1]]).mean(axis=1)
+                for k in range(1, e - s):
+                    if star[k - 1] >= self.threshold and partition[members[k]]["_year"] == partition[members[0]]["_year"]:
+                        parent[find(int(members[k]))] = find(int(members[0]))
+                    if chain[k - 1] >= self.threshold and partition[members[k]]["_year"] == partition[members[k - 1]]["_year"]:
+                        parent[find(int(members[k]))] = find(int(members[k - 1]))
+
+        groups: Dict[int, List[int]] = {}
+        for i in range(n):
+            groups.setdefault(find(i), []).append(i)
+        clusters = []
+        for idx in groups.values():
+            if len(idx) < 2: continue
+            real = [i for i in idx if _is_real_imdb(partition[i])]
+            # Keep: real IMDb id wala, warna sabse naya upload (cleanup_mongo_duplicates jaisa)
+            keep = max(real or idx, key=lambda i: _added_ts(partition[i]))
+            dupes = [i for i in idx if i != keep and not _is_real_imdb(partition[i])]
+            if not dupes: continue
+            clusters.append({
+                "year": partition[keep]["_year"] or None,
+                "keep": _public(partition[keep]),
+                "dupes": [_public(partition[i]) for i in dupes],
+                # Sabse door wale dupe ka keep se estimated Jaccard
+                "similarity": round(float((sigs[dupes] == sigs[keep]).mean(axis=1).min()), 3),
+            })
+        return clusters
+
+
+def _is_real_imdb(doc: Dict) -> bool:
+    return str(doc['imdb_id']).startswith("tt")
+
+def _added_ts(doc: Dict) -> float:
+    added = doc.get('added_date')
+    return added.timestamp() if hasattr(added, "timestamp") else 0.0
+
+def _public(doc: Dict) -> Dict:
+    return {"imdb_id": doc['imdb_id'], "title": doc.get('title'), "year": doc.get('year')}
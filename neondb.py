@@ -279,6 +279,54 @@ class NeonDB:
                 return []
         return []
 
+    async def search_titles(self, query: str, limit: int = 10) -> List[Dict]:
+        """
+        Search cascade ka full-text tier: imdb_id + title (relevance order, imdb_id par deduped).
+        Time budget caller lagata hai: bot._run_db_tiers asyncio.wait(..., timeout=) ke baad pending task cancel
+        karta hai, yahan sirf query hai. Cancel par connection `async with` se pool mein wapas jaata hai.
+        """
+        if self.mode == "error" or self.mode == "none": return []
+
+        clean_query = re.sub(r"[._\-]+", " ", query).strip()
+        if not clean_query: return []
+        rows = []
+
+        if self.mode == "postgres" and self.pool:
+            sql = """
+            SELECT imdb_id, title, ts_rank(search_vector, q) AS rank
+            FROM videos, plainto_tsquery('english', $1) AS q
+            WHERE search_vector @@ q AND imdb_id IS NOT NULL AND imdb_id NOT LIKE 'auto_%'
+            ORDER BY rank DESC
+            LIMIT $2;
+            """
+            try:
+                async with self.pool.acquire() as conn:
+                    rows = [dict(row) for row in await conn.fetch(sql, clean_query, limit * 3)]
+            except Exception as e:
+                logger.warning(f"Postgres search_titles error: {e}")
+                return []
+
+        elif self.mode == "mongo" and self.collection is not None:
+            try:
+                cursor = self.collection.find(
+                    {"$text": {"$search": clean_query}, "imdb_id": {"$ne": None}},
+                    {"imdb_id": 1, "title": 1, "score": {"$meta": "textScore"}}
+                ).sort([("score", {"$meta": "textScore"})]).limit(limit * 3)
+                rows = await cursor.to_list(length=limit * 3)
+            except Exception as e:
+                logger.warning(f"Mongo search_titles error: {e}")
+                return []
+
+        # Ek movie ki kai files ho sakti hain: pehli (best rank) row rakho
+        results, seen = [], set()
+        for row in rows:
+            imdb_id = row.get('imdb_id')
+            if not imdb_id or imdb_id.startswith('auto_') or imdb_id in seen: continue
+            seen.add(imdb_id)
+            results.append({'imdb_id': imdb_id, 'title': row.get('title') or imdb_id, 'year': None})
+            if len(results) >= limit: break
+        return results
+
     async def remove_movie_by_imdb(self, imdb_id):
         if self.mode == "postgres" and self.pool:
             try:
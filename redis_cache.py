@@ -3,12 +3,16 @@ import os
 import asyncio
 import logging
 import json
-from datetime import datetime, timezone
-from typing import Optional, List, Dict, Any
+import uuid
+import zlib
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Dict, Any, Tuple
 
 try:
     # Use redis.asyncio for non-blocking operations
     from redis.asyncio import Redis, ConnectionPool, ConnectionError
+    from redis.exceptions import WatchError
     REDIS_AVAILABLE = True
 except ImportError:
     class Redis:
@@ -17,6 +21,7 @@ except ImportError:
         def __init__(self, *args, **kwargs): logging.warning("Redis library missing. RedisCacheLayer will be disabled.")
     class ConnectionPool: pass
     class ConnectionError(Exception): pass
+    class WatchError(Exception): pass
     REDIS_AVAILABLE = False
     
 logger = logging.getLogger("bot.redis")
@@ -24,11 +29,96 @@ logger = logging.getLogger("bot.redis")
 REDIS_URL = os.getenv("REDIS_URL")
 ACTIVE_WINDOW_SECONDS = int(os.getenv("ACTIVE_WINDOW_MINUTES", "5")) * 60
 
+# Fuzzy cache chunk size (rows per chunk). Compressed chunk ~100-200KB rehta hai (Upstash request limit se neeche)
+FUZZY_CHUNK_ROWS = int(os.getenv("FUZZY_CHUNK_ROWS", "5000"))
+# Row format: imdb_id \x1f title \x1f year \x1f clean_title, rows \x1e se alag, phir zlib
+FUZZY_CODEC = "usv-zlib-1"
+_FIELD_SEP, _ROW_SEP = "\x1f", "\x1e"
+
+# Shared search sessions: (normalized query, catalog version) -> ranked rows + rendered pages (sab users ke liye ek)
+SEARCH_SESSION_TTL = int(os.getenv("SEARCH_SESSION_TTL", "600"))
+# Query log: roz ka ek sorted set (qlog:YYYYMMDD), har din ke top itne queries hi rakhte hain
+QUERY_LOG_KEEP = int(os.getenv("QUERY_LOG_KEEP", "5000"))
+QUERY_LOG_TTL = 3 * 86400
+# Catalog delta events (pub/sub): har instance apna in-memory index inhi se sync rakhta hai
+CATALOG_EVENTS_CHANNEL = os.getenv("CATALOG_EVENTS_CHANNEL", "catalog:events")
+# Bade delta (bulk refresh) ko itni rows ke events mein todte hain
+CATALOG_EVENT_MAX_ROWS = int(os.getenv("CATALOG_EVENT_MAX_ROWS", "500"))
+
+
+def _chunk_of(imdb_id: str, num_chunks: int) -> int:
+    """imdb_id ka stable chunk number (process restart ke baad bhi same)."""
+    return zlib.crc32(imdb_id.encode("utf-8")) % num_chunks
+
+def _encode_row(movie: Dict) -> str:
+    fields = (movie['imdb_id'], movie.get('title') or "", movie.get('year') or "", movie.get('clean_title') or "")
+    return _FIELD_SEP.join(str(f).replace(_FIELD_SEP, " ").replace(_ROW_SEP, " ") for f in fields)
+
+def _encode_rows(rows: List[str]) -> bytes:
+    return zlib.compress(_ROW_SEP.join(rows).encode("utf-8"), 6)
+
+def _decode_rows(blob: bytes) -> List[str]:
+    text = zlib.decompress(blob).decode("utf-8")
+    return text.split(_ROW_SEP) if text else []
+
+def _encode_fuzzy_chunks(movies: List[Dict], num_chunks: int) -> List[bytes]:
+    buckets: List[List[str]] = [[] for _ in range(num_chunks)]
+    for movie in movies:
+        buckets[_chunk_of(movie['imdb_id'], num_chunks)].append(_encode_row(movie))
+    return [_encode_rows(rows) for rows in buckets]
+
+def _decode_fuzzy_chunks(blobs: List[bytes]) -> List[Dict]:
+    movies = []
+    for blob in blobs:
+        for row in _decode_rows(blob):
+            imdb_id, title, year, clean_title = row.split(_FIELD_SEP)
+            movies.append({'imdb_id': imdb_id, 'title': title, 'year': year or None, 'clean_title': clean_title})
+    return movies
+
+def _patch_fuzzy_chunks(current: Dict[int, Optional[bytes]], changes: Dict[int, Tuple[List[Dict], List[str]]]) -> Dict[int, Tuple[bytes, int]]:
+    """Har chunk decode -> upsert/delete -> encode. Returns {chunk: (blob, row count delta)}."""
+    patched = {}
+    for idx, (upserts, deletes) in changes.items():
+        rows = {row.split(_FIELD_SEP, 1)[0]: row for row in _decode_rows(current[idx])} if current.get(idx) else {}
+        before = len(rows)
+        for imdb_id in deletes:
+            rows.pop(imdb_id, None)
+        for movie in upserts:
+            rows[movie['imdb_id']] = _encode_row(movie)
+        patched[idx] = (_encode_rows(list(rows.values())), len(rows) - before)
+    return patched
+
+def search_session_key(query: str, version: int, scope: str = "") -> str:
+    """
+    Normalized query + catalog version ka chhota stable key (user pointer mein yahi rehta hai).
+    `scope` = version counter ka maalik process: counter per-process hai, alag processes ke same number ka matlab same catalog nahi.
+    """
+    digest = hashlib.blake2b(f"{scope}{_FIELD_SEP}{version}{_FIELD_SEP}{query}".encode("utf-8"), digest_size=10).hexdigest()
+    return f"sq:{digest}"
+
+def _encode_result_rows(results: List[Dict]) -> bytes:
+    # Sirf imdb_id / title / year (ranked order); score, match_type waghera pagination ko nahi chahiye
+    rows = [
+        _FIELD_SEP.join(str(f).replace(_FIELD_SEP, " ").replace(_ROW_SEP, " ") for f in (m['imdb_id'], m.get('title') or "", m.get('year') or ""))
+        for m in results
+    ]
+    return _encode_rows(rows)
+
+def _decode_result_rows(blob: bytes) -> List[Dict]:
+    results = []
+    for row in _decode_rows(blob):
+        imdb_id, title, year = row.split(_FIELD_SEP)
+        results.append({'imdb_id': imdb_id, 'title': title, 'year': year or None})
+    return results
+
 class RedisCacheLayer:
     
     def __init__(self):
         self._pool: Optional[ConnectionPool] = None
         self.redis: Optional[Redis] = None
+        # Binary values (compressed fuzzy chunks) ke liye alag pool, decode_responses=False
+        self._bin_pool: Optional[ConnectionPool] = None
+        self.redis_bin: Optional[Redis] = None
         self._is_ready = False
         self._lock = asyncio.Lock()
         
@@ -63,6 +153,8 @@ class RedisCacheLayer:
                 # Connection timeout ko kam rakhein
                 self._pool = ConnectionPool.from_url(final_url, decode_responses=True, socket_timeout=5)
                 self.redis = Redis(connection_pool=self._pool)
+                self._bin_pool = ConnectionPool.from_url(final_url, decode_responses=False, socket_timeout=10)
+                self.redis_bin = Redis(connection_pool=self._bin_pool)
                 await self.redis.ping()
                 self._is_ready = True
                 logger.info("✅ Redis cache connection safal.")
@@ -79,11 +171,13 @@ class RedisCacheLayer:
         if self.redis:
             try:
                 await self._pool.disconnect()
+                if self._bin_pool: await self._bin_pool.disconnect()
                 logger.info("Redis connection pool disconnect ho gaya।")
             except Exception as e:
                 logger.error(f"Redis pool close karte waqt error: {e}")
             finally:
                 self.redis = None
+                self.redis_bin = None
                 self._is_ready = False
 
     def is_ready(self) -> bool:
@@ -131,38 +225,293 @@ class RedisCacheLayer:
     # +++++ FUZZY CACHE (Persistence) +++++
     # =======================================================
     
-    FUZZY_KEY = "fuzzy_cache_v1"
-    
-    async def save_fuzzy_cache(self, cache_data: Dict[str, Dict]) -> bool:
-        """In-memory cache ko Redis mein store karta hai।"""
+    FUZZY_KEY = "fuzzy_cache_v1" # Legacy single JSON blob (ab sirf cleanup ke liye)
+    FUZZY_PREFIX = "fuzzy_cache_v2"
+    FUZZY_MANIFEST_KEY = "fuzzy_cache_v2:manifest"
+    FUZZY_TTL = 86400 * 7 # 7 din ki TTL
+
+    def _chunk_key(self, generation: str, idx: int) -> str:
+        return f"{self.FUZZY_PREFIX}:{generation}:chunk:{idx}"
+
+    async def _get_fuzzy_manifest(self) -> Optional[Dict[str, Any]]:
+        raw = await self.redis_bin.get(self.FUZZY_MANIFEST_KEY)
+        if not raw: return None
+        manifest = json.loads(raw)
+        return manifest if manifest.get("codec") == FUZZY_CODEC else None
+
+    async def save_fuzzy_cache(self, movies: List[Dict], watermark: Optional[datetime] = None) -> bool:
+        """
+        Catalog ko chunked + compressed binary format mein store karta hai।
+        Naye generation ke chunks pehle likhe jaate hain, phir manifest switch hota hai (readers ko
+        kabhi adha-likha data nahi milta). `watermark` = snapshot time (delta refresh ke liye).
+        """
         if not self.is_ready(): return False
         try:
-            # Redis mein set karne ke liye JSON string mein convert karein
-            json_data = json.dumps(cache_data)
-            await self.redis.set(self.FUZZY_KEY, json_data, ex=86400 * 7) # 7 din ki TTL
-            logger.info("Redis: Fuzzy cache saved.")
+            loop = asyncio.get_running_loop()
+            num_chunks = max(1, -(-len(movies) // FUZZY_CHUNK_ROWS))
+            # Encoding + zlib CPU bound hai: event loop se bahar
+            chunks = await loop.run_in_executor(None, _encode_fuzzy_chunks, movies, num_chunks)
+
+            old_manifest = await self._get_fuzzy_manifest()
+            generation = uuid.uuid4().hex[:12]
+            async with self.redis_bin.pipeline(transaction=False) as pipe:
+                for idx, blob in enumerate(chunks):
+                    pipe.set(self._chunk_key(generation, idx), blob, ex=self.FUZZY_TTL)
+                await pipe.execute()
+
+            manifest = {
+                "codec": FUZZY_CODEC,
+                "generation": generation,
+                "chunks": num_chunks,
+                "count": len(movies),
+                "version": (old_manifest or {}).get("version", 0) + 1,
+                "watermark": watermark.isoformat() if watermark else None,
+                "saved_at": datetime.now(timezone.utc).isoformat(),
+            }
+            async with self.redis_bin.pipeline(transaction=True) as pipe:
+                pipe.set(self.FUZZY_MANIFEST_KEY, json.dumps(manifest), ex=self.FUZZY_TTL)
+                pipe.delete(self.FUZZY_KEY, f"{self.FUZZY_KEY}:watermark")
+                if old_manifest:
+                    pipe.delete(*[self._chunk_key(old_manifest["generation"], i) for i in range(old_manifest["chunks"])])
+                await pipe.execute()
+            logger.info(f"Redis: Fuzzy cache saved ({len(movies):,} movies, {num_chunks} chunks, {sum(map(len, chunks)) / 1e6:.1f} MB).")
             return True
         except Exception as e:
             logger.error(f"Redis save_fuzzy_cache error: {e}", exc_info=False)
             self._is_ready = False
             return False
-            
-    async def load_fuzzy_cache(self) -> Optional[Dict[str, Dict]]:
-        """Redis se cache load karta hai।"""
+
+    async def load_fuzzy_cache(self) -> Optional[Tuple[List[Dict], Optional[datetime]]]:
+        """
+        Redis se cache load karta hai: manifest + saare chunks ek pipeline mein, decode executor mein।
+        Returns: (movies, watermark) ya None (MongoDB fallback).
+        """
         if not self.is_ready(): return None
         try:
-            # decode_responses=True hone ke kaaran, yeh seedha string return karega
-            json_data = await self.redis.get(self.FUZZY_KEY) 
-            if json_data:
-                cache_data = json.loads(json_data)
-                logger.info(f"Redis: Fuzzy cache loaded ({len(cache_data):,} titles).")
-                return cache_data
-            return None
+            manifest = await self._get_fuzzy_manifest()
+            if not manifest: return None
+            async with self.redis_bin.pipeline(transaction=False) as pipe:
+                for idx in range(manifest["chunks"]):
+                    pipe.get(self._chunk_key(manifest["generation"], idx))
+                blobs = await pipe.execute()
+            if any(blob is None for blob in blobs):
+                logger.warning("Redis: Fuzzy cache ke kuch chunks missing hain (expired?), MongoDB se load hoga.")
+                return None
+
+            loop = asyncio.get_running_loop()
+            movies = await loop.run_in_executor(None, _decode_fuzzy_chunks, blobs)
+            watermark = datetime.fromisoformat(manifest["watermark"]) if manifest.get("watermark") else None
+            logger.info(f"Redis: Fuzzy cache loaded ({len(movies):,} movies, v{manifest['version']}).")
+            return movies, watermark
         except Exception as e:
             logger.error(f"Redis load_fuzzy_cache error: {e}", exc_info=False)
             self._is_ready = False
             return None # Fallback to MongoDB
-            
+
+    async def update_fuzzy_titles(self, upserts: List[Dict] = (), deletes: List[str] = (), watermark: Optional[datetime] = None) -> bool:
+        """
+        Per-title update: sirf affected chunks (imdb_id hash se) read-modify-write hote hain, poora blob nahi।
+        WATCH/MULTI transaction se concurrent writers ka update nahi khota। `watermark` diya ho to aage badhta hai।
+        """
+        if not self.is_ready() or not (upserts or deletes): return False
+        loop = asyncio.get_running_loop()
+        for _ in range(3):
+            try:
+                async with self.redis_bin.pipeline(transaction=True) as pipe:
+                    await pipe.watch(self.FUZZY_MANIFEST_KEY)
+                    raw = await pipe.get(self.FUZZY_MANIFEST_KEY)
+                    manifest = json.loads(raw) if raw else None
+                    if not manifest or manifest.get("codec") != FUZZY_CODEC:
+                        return False # Abhi koi snapshot nahi; agla full save sab le lega
+
+                    by_chunk: Dict[int, Tuple[List[Dict], List[str]]] = {}
+                    for movie in upserts:
+                        by_chunk.setdefault(_chunk_of(movie['imdb_id'], manifest["chunks"]), ([], []))[0].append(movie)
+                    for imdb_id in deletes:
+                        by_chunk.setdefault(_chunk_of(imdb_id, manifest["chunks"]), ([], []))[1].append(imdb_id)
+
+                    keys = {idx: self._chunk_key(manifest["generation"], idx) for idx in by_chunk}
+                    await pipe.watch(*keys.values())
+                    current = {idx: await pipe.get(key) for idx, key in keys.items()}
+                    missing = [idx for idx, blob in current.items() if blob is None]
+                    if missing:
+                        # Chunk expire ho gaya: khaali chunk se patch karna us chunk ki baaki rows chupchap gira deta.
+                        # Snapshot hi invalid: manifest + chunks hatao, agla start MongoDB se full load karega
+                        pipe.multi()
+                        pipe.delete(self.FUZZY_MANIFEST_KEY, *[self._chunk_key(manifest["generation"], i) for i in range(manifest["chunks"])])
+                        await pipe.execute()
+                        logger.warning(f"Redis: Fuzzy cache chunks {missing[:5]} missing (expired?). Snapshot invalidate kiya, agla load MongoDB se.")
+                        return False
+                    patched = await loop.run_in_executor(None, _patch_fuzzy_chunks, current, by_chunk)
+
+                    manifest["version"] += 1
+                    manifest["count"] += sum(delta for _, delta in patched.values())
+                    if watermark and (not manifest.get("watermark") or watermark.isoformat() > manifest["watermark"]):
+                        manifest["watermark"] = watermark.isoformat()
+                    pipe.multi()
+                    for idx, (blob, _) in patched.items():
+                        pipe.set(keys[idx], blob, ex=self.FUZZY_TTL)
+                    pipe.set(self.FUZZY_MANIFEST_KEY, json.dumps(manifest), ex=self.FUZZY_TTL)
+                    await pipe.execute()
+                return True
+            except WatchError:
+                continue # Kisi aur ne beech mein likha, dobara try
+            except Exception as e:
+                logger.error(f"Redis update_fuzzy_titles error: {e}", exc_info=False)
+                return False
+        logger.warning("Redis update_fuzzy_titles: 3 retries ke baad bhi conflict, skip.")
+        return False
+
+    # =======================================================
+    # +++++ SHARED SEARCH SESSIONS (Pagination) +++++
+    # =======================================================
+    # Hash `sq:<digest>`: field "r" = compressed result rows, "p:<page>:<group>" = rendered page JSON.
+    # Users sirf `search_ptr:<user_id>` -> session key rakhte hain, isliye memory users ke saath nahi badhti.
+
+    async def save_search_session(self, session_key: str, results: List[Dict], pages: Dict[str, str] = None) -> bool:
+        if not self.is_ready() or not results: return False
+        try:
+            mapping = {"r": _encode_result_rows(results)}
+            mapping.update({field: payload.encode("utf-8") for field, payload in (pages or {}).items()})
+            async with self.redis_bin.pipeline(transaction=True) as pipe:
+                pipe.hset(session_key, mapping=mapping)
+                pipe.expire(session_key, SEARCH_SESSION_TTL)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.debug(f"Redis save_search_session fail: {e}")
+            return False
+
+    async def get_search_session_page(self, session_key: str, field: str) -> Optional[str]:
+        if not self.is_ready(): return None
+        try:
+            raw = await self.redis_bin.hget(session_key, field)
+            return raw.decode("utf-8") if raw else None
+        except Exception as e:
+            logger.debug(f"Redis get_search_session_page fail: {e}")
+            return None
+
+    async def load_search_session_rows(self, session_key: str) -> Optional[List[Dict]]:
+        if not self.is_ready(): return None
+        try:
+            blob = await self.redis_bin.hget(session_key, "r")
+            return _decode_result_rows(blob) if blob else None
+        except Exception as e:
+            logger.debug(f"Redis load_search_session_rows fail: {e}")
+            return None
+
+    async def put_search_session_page(self, session_key: str, field: str, payload: str) -> bool:
+        """Naya rendered page session mein jodta hai. TTL dobara lagta hai: koi bhi key bina expiry ke nahi bachti."""
+        if not self.is_ready(): return False
+        try:
+            async with self.redis_bin.pipeline(transaction=True) as pipe:
+                pipe.hset(session_key, field, payload.encode("utf-8"))
+                pipe.expire(session_key, SEARCH_SESSION_TTL)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.debug(f"Redis put_search_session_page fail: {e}")
+            return False
+
+    # =======================================================
+    # +++++ CATALOG EVENTS (Pub/Sub Index Sync) +++++
+    # =======================================================
+    async def publish_catalog_delta(self, origin: str, seq: int, changed: List[Dict], deleted: List[str]) -> int:
+        """
+        Delta ko compact JSON events mein publish karta hai: {"o": origin, "s": seq, "u": [[imdb_id, title, year, clean_title]], "d": [imdb_id]}.
+        Bada delta CATALOG_EVENT_MAX_ROWS ke tukdon mein (har tukde ka apna seq). Returns: agla seq.
+        """
+        if not self.is_ready(): return seq
+        upserts = [[m['imdb_id'], m.get('title') or "", m.get('year') or "", m.get('clean_title') or ""] for m in changed]
+        deletes = list(deleted)
+        step = max(1, CATALOG_EVENT_MAX_ROWS)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                while True:
+                    chunk_u, upserts = upserts[:step], upserts[step:]
+                    chunk_d, deletes = deletes[:step], deletes[step:]
+                    seq += 1
+                    pipe.publish(CATALOG_EVENTS_CHANNEL, json.dumps({"o": origin, "s": seq, "u": chunk_u, "d": chunk_d}, separators=(",", ":")))
+                    if not upserts and not deletes: break
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Catalog event publish fail: {e}")
+        return seq
+
+    async def listen_catalog_events(self, handler, on_subscribed=None):
+        """
+        Channel subscribe karke har event handler(dict) ko deta hai; connection toote to backoff ke saath dobara.
+        on_subscribed() har (re)subscribe par: beech ke missed events ka reconcile caller karta hai. Cancel se rukta hai.
+        """
+        backoff = 1
+        while True:
+            if not self.is_ready():
+                await asyncio.sleep(5); continue
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(CATALOG_EVENTS_CHANNEL)
+                backoff = 1
+                if on_subscribed: await on_subscribed()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None or message.get("type") != "message": continue
+                    try:
+                        event = json.loads(message["data"])
+                    except (TypeError, ValueError):
+                        logger.warning("Catalog event decode fail, skip.")
+                        continue
+                    await handler(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Catalog events subscription toota: {e}. {backoff}s mein dobara.")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+            finally:
+                try: await pubsub.aclose() if hasattr(pubsub, "aclose") else await pubsub.close()
+                except Exception: pass
+
+    # =======================================================
+    # +++++ QUERY LOG (Hot Query Warming) +++++
+    # =======================================================
+    @staticmethod
+    def _query_log_key(day: datetime) -> str:
+        return f"qlog:{day:%Y%m%d}"
+
+    async def add_query_counts(self, counts: Dict[str, float]) -> bool:
+        """Aggregated (sampled) counts aaj ke sorted set mein; long tail trim hota hai."""
+        if not self.is_ready() or not counts: return False
+        key = self._query_log_key(datetime.now(timezone.utc))
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for query, count in counts.items():
+                    pipe.zincrby(key, count, query)
+                pipe.zremrangebyrank(key, 0, -(QUERY_LOG_KEEP + 1))
+                pipe.expire(key, QUERY_LOG_TTL)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.debug(f"Redis add_query_counts fail: {e}")
+            return False
+
+    async def top_queries(self, n: int) -> Optional[List[Tuple[str, float]]]:
+        """Aaj + kal ke counts mila kar top n queries (din badalte hi popularity reset na ho)."""
+        if not self.is_ready(): return None
+        today = datetime.now(timezone.utc)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for day in (today, today - timedelta(days=1)):
+                    pipe.zrevrange(self._query_log_key(day), 0, n - 1, withscores=True)
+                buckets = await pipe.execute()
+        except Exception as e:
+            logger.debug(f"Redis top_queries fail: {e}")
+            return None
+        merged: Dict[str, float] = {}
+        for bucket in buckets:
+            for query, score in bucket or ():
+                merged[query] = merged.get(query, 0.0) + float(score)
+        return sorted(merged.items(), key=lambda kv: kv[1], reverse=True)[:n]
+
     # =======================================================
     # +++++ OTHER CACHE OPS (For Refresh Limits) +++++
     # =======================================================
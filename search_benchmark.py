@@ -0,0 +1,439 @@
+# search_benchmark.py
+"""
+Search engine benchmark (deploy se pehle engine/index changes compare karne ke liye).
+
+Synthetic catalog (release filenames -> parse_filename -> clean_title) banata hai aur
+typos / acronyms / years / partial titles ki query mix har engine configuration par replay karta hai.
+Report: p50/p95/p99 latency, throughput, peak RSS, reference engine se top-k agreement aur hit@k.
+Default reference "baseline" = index changes se pehle wala engine (full WRatio scan + V7), as-is.
+
+Usage:
+    python search_benchmark.py                          # 10k + 100k
+    python search_benchmark.py --sizes 10000,100000,1000000 --queries 300
+    python search_benchmark.py --engines scalar,batch --reference scalar --json bench.json
+"""
+import os
+import re
+import gc
+import sys
+import json
+import time
+import random
+import string
+import tempfile
+import argparse
+import threading
+from typing import Callable, Dict, List, Tuple
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    psutil = None
+    PSUTIL_AVAILABLE = False
+
+import batch_scorer
+from rapidfuzz import process, fuzz
+
+from search_index import TrigramIndex, MovieCatalog, TokenCorrector, TitleFeatures, build_title_features
+from search_engine import clean_text_for_search, clean_text_for_fuzzy, get_smart_match_score_v7, fuzzy_search, fuzzy_search_batch, tfidf_search, parse_filename
+from tfidf_index import NgramTfidfIndex
+from shared_index import export_shared_index, attach_shared_index
+
+# --- Synthetic catalog ---
+COMMON_WORDS = (
+    "dil pyaar love king war night dark return rise legend city story man raja rani jawan dhoom "
+    "hero zindagi mission secret last first ghost blood gold fire ice shadow journey dream ek do "
+    "teen mera tera naam jung golmaal housefull fast furious star lord kingdom game bhai dost "
+    "the of and in ka ki ke aur se hai"
+).split()
+SEQUEL_SUFFIXES = ["2", "3", "part 2", "chapter 2", "returns", "ii", "reloaded"]
+QUALITIES = ["480p", "720p", "1080p", "2160p"]
+SOURCES = ["WEB-DL", "HDRip", "BluRay", "WEBRip", "HDTS", "DVDRip"]
+LANGS = ["Hindi", "English", "Dual Audio", "Tamil", "Hindi ORG"]
+GROUPS = ["TeamX", "MkvCinemas", "Pahe", "YTS", "KatmovieHD", "Vegamovies"]
+FILENAME_TEMPLATES = [
+    "{dotted}.{year}.{quality}.{source}.{lang_dotted}.x264-{group}.mkv",
+    "[{group}] {title} ({year}) {quality} {source} {lang} ESub.mkv",
+    "{title} {year} {lang} {quality} {source}.mp4",
+    "@{group} {title} ({year}) [{quality}].mkv",
+    "{title} ({year}).mkv",
+]
+
+# Query mix weights (kind -> weight)
+QUERY_MIX = {"exact": 15, "typo": 30, "partial": 25, "year": 20, "acronym": 10}
+
+
+def _syllable_word(rnd: random.Random) -> str:
+    consonants, vowels = "bcdfghjklmnprstvwyz", "aeiou"
+    return "".join(rnd.choice(consonants) + rnd.choice(vowels) + (rnd.choice("nrst") if rnd.random() < 0.3 else "")
+                   for _ in range(rnd.randint(1, 3)))
+
+
+def generate_catalog(size: int, seed: int = 42) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Returns: (movies, truth). movies Mongo/Redis jaise dicts (imdb_id, title, year, clean_title);
+    truth har movie ka asli title (queries isi se bante hain, noisy filename se nahi).
+    """
+    rnd = random.Random(seed)
+    vocab = COMMON_WORDS + [_syllable_word(rnd) for _ in range(max(2000, size // 5))]
+    movies, truth = [], []
+    for i in range(size):
+        # ~3% remakes: same title, alag year
+        if truth and rnd.random() < 0.03:
+            words = truth[rnd.randrange(len(truth))]["title"].split()
+        else:
+            words = [rnd.choice(vocab) for _ in range(rnd.choices((1, 2, 3, 4, 5), (15, 35, 25, 15, 10))[0])]
+            if rnd.random() < 0.1: words += rnd.choice(SEQUEL_SUFFIXES).split()
+        title = " ".join(words)
+        year = str(rnd.randint(1980, 2025))
+        display = title.title()
+        lang = rnd.choice(LANGS)
+        filename = rnd.choice(FILENAME_TEMPLATES).format(
+            title=display, dotted=display.replace(" ", "."), year=year, quality=rnd.choice(QUALITIES),
+            source=rnd.choice(SOURCES), lang=lang, lang_dotted=lang.replace(" ", "."), group=rnd.choice(GROUPS)
+        )
+        parsed = parse_filename(filename)
+        imdb_id = f"tt{i:08d}"
+        movies.append({
+            "imdb_id": imdb_id,
+            "title": parsed["title"],
+            "year": parsed["year"],
+            "clean_title": clean_text_for_search(parsed["title"]),
+        })
+        truth.append({"imdb_id": imdb_id, "title": title, "year": year})
+    return movies, truth
+
+
+def _typo(word: str, rnd: random.Random) -> str:
+    if len(word) < 4: return word
+    i = rnd.randrange(1, len(word) - 1)
+    op = rnd.choice(("swap", "drop", "add", "replace"))
+    if op == "swap": return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if op == "drop": return word[:i] + word[i + 1:]
+    if op == "add": return word[:i] + rnd.choice(string.ascii_lowercase) + word[i:]
+    return word[:i] + rnd.choice(string.ascii_lowercase) + word[i + 1:]
+
+
+def generate_queries(truth: List[Dict], count: int, seed: int = 7) -> List[Tuple[str, str, str]]:
+    """Returns: [(kind, query, expected imdb_id)]."""
+    rnd = random.Random(seed)
+    kinds, weights = list(QUERY_MIX), list(QUERY_MIX.values())
+    queries = []
+    while len(queries) < count:
+        movie = truth[rnd.randrange(len(truth))]
+        title, words = movie["title"], movie["title"].split()
+        kind = rnd.choices(kinds, weights)[0]
+        if kind == "exact":
+            query = title
+        elif kind == "typo":
+            query = " ".join(_typo(w, rnd) if rnd.random() < 0.6 else w for w in words)
+        elif kind == "partial":
+            query = " ".join(words[:max(1, len(words) // 2)]) if len(words) > 1 else words[0][:max(3, len(words[0]) - 2)]
+        elif kind == "year":
+            query = f"{title} {movie['year']}"
+        else:
+            if len(words) < 3: continue
+            query = "".join(w[0] for w in words)
+        queries.append((kind, query, movie["imdb_id"]))
+    return queries
+
+
+# --- Measurement helpers ---
+class PeakRSS:
+    """Background thread se RSS sample karta hai (block ke dauran peak, MB mein)."""
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current() -> int:
+        if PSUTIL_AVAILABLE: return psutil.Process(os.getpid()).memory_info().rss
+        import resource # Fallback: process ka lifetime peak (Linux par KB)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+    @property
+    def peak_mb(self) -> float:
+        return self.peak / 1e6
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values: return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+# --- Engine configurations ---
+class BenchContext:
+    """Ek catalog size ke liye built indexes (saari engine configs yahi share karti hain)."""
+    def __init__(self, movies: List[Dict]):
+        self.build_seconds: Dict[str, float] = {}
+        started = time.perf_counter()
+        self.catalog = MovieCatalog.build(movies)
+        self.build_seconds["catalog"] = time.perf_counter() - started
+        started = time.perf_counter()
+        self.trigram_index = TrigramIndex.build(self.catalog.titles)
+        self.build_seconds["trigram"] = time.perf_counter() - started
+        started = time.perf_counter()
+        self.features = build_title_features(self.catalog.titles)
+        self.build_seconds["features"] = time.perf_counter() - started
+        started = time.perf_counter()
+        self.corrector = TokenCorrector.build(self.catalog.titles)
+        self.build_seconds["symspell"] = time.perf_counter() - started
+
+
+def _with_batch_mode(enabled: bool, fn: Callable):
+    previous = batch_scorer.BATCH_SCORING_ENABLED
+    batch_scorer.BATCH_SCORING_ENABLED = enabled
+    try: return fn()
+    finally: batch_scorer.BATCH_SCORING_ENABLED = previous
+
+
+def _single(batch: bool, trigram: bool, correct: bool = False):
+    def run(ctx: BenchContext, queries: List[str], limit: int) -> Tuple[List[List[Dict]], List[float]]:
+        index = ctx.trigram_index if trigram else None
+        corrector = ctx.corrector if correct else None
+        results, latencies = [], []
+        for query in queries:
+            started = time.perf_counter()
+            results.append(_with_batch_mode(batch, lambda: fuzzy_search(query, limit, ctx.catalog, index, ctx.features, corrector)))
+            latencies.append(time.perf_counter() - started)
+        return results, latencies
+    return run
+
+
+_BASELINE_YEAR_RE = re.compile(r"\b(19[7-9]\d|20[0-2]\d)\b")
+
+def baseline_search(query: str, limit: int, catalog: MovieCatalog) -> List[Dict]:
+    """
+    Index changes se pehle wala engine, as-is: exact anchor, poori library par WRatio (top 800, cutoff 35),
+    har candidate par V7 (features per call). Koi trigram shortlist, year partition, acronym forcing ya typo correction nahi.
+    """
+    year_match = _BASELINE_YEAR_RE.search(query)
+    query_year = year_match.group(1) if year_match else None
+    q_fuzzy, q_anchor = clean_text_for_fuzzy(query), clean_text_for_search(query)
+    if not q_fuzzy or not q_anchor: return []
+    query_tokens = [t for t in q_anchor.split() if t]
+
+    candidates, seen_imdb = [], set()
+    anchor_keys = {q_anchor, q_anchor[4:] if q_anchor.startswith('the ') else 'the ' + q_anchor}
+    for key in anchor_keys:
+        for data in catalog.get(key) or ():
+            if data['imdb_id'] not in seen_imdb:
+                candidates.append({'imdb_id': data['imdb_id'], 'title': data['title'], 'year': data.get('year'), 'score': 2000})
+                seen_imdb.add(data['imdb_id'])
+
+    if len(candidates) < limit:
+        all_titles = list(catalog.keys())
+        for key, fuzz_score, _ in process.extract(q_fuzzy, all_titles, limit=800, scorer=fuzz.WRatio, score_cutoff=35):
+            for data in catalog.get(key) or ():
+                if data['imdb_id'] in seen_imdb: continue
+                intent_score = get_smart_match_score_v7(query_tokens, TitleFeatures(key), query_year, data.get('year'))
+                score = (900 + intent_score) if fuzz_score >= 90 else (fuzz_score + intent_score)
+                candidates.append({'imdb_id': data['imdb_id'], 'title': data['title'], 'year': data.get('year'), 'score': score})
+                seen_imdb.add(data['imdb_id'])
+    candidates.sort(key=lambda x: x['score'], reverse=True)
+    return candidates[:limit]
+
+
+def _baseline(ctx: BenchContext, queries: List[str], limit: int) -> Tuple[List[List[Dict]], List[float]]:
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(baseline_search(query, limit, ctx.catalog))
+        latencies.append(time.perf_counter() - started)
+    return results, latencies
+
+
+def _shared_mmap(ctx: BenchContext, queries: List[str], limit: int) -> Tuple[List[List[Dict]], List[float]]:
+    # Multi-worker shared index (shared_index.py): flat mmap file, features bounded per-process cache mein
+    if getattr(ctx, "shared", None) is None:
+        path = os.path.join(tempfile.gettempdir(), f"search_benchmark_{os.getpid()}.shared")
+        export_shared_index(ctx.catalog, path)
+        ctx.shared = attach_shared_index(path, None, 0)
+        ctx.shared_trigram = ctx.shared.make_trigram_index()
+        ctx.shared_features = ctx.shared.make_title_features()
+        os.remove(path)  # mmap khula rehta hai
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(fuzzy_search(query, limit, ctx.shared, ctx.shared_trigram, ctx.shared_features))
+        latencies.append(time.perf_counter() - started)
+    return results, latencies
+
+
+def _tfidf(ctx: BenchContext, queries: List[str], limit: int) -> Tuple[List[List[Dict]], List[float]]:
+    # Trigram TF-IDF sparse mat-vec shortlist + V7 re-rank (matrix pehli baar banta hai, build time alag record)
+    if getattr(ctx, "tfidf", None) is None:
+        started = time.perf_counter()
+        ctx.tfidf = NgramTfidfIndex.build(ctx.catalog.titles)
+        ctx.build_seconds["tfidf"] = time.perf_counter() - started
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(tfidf_search(query, limit, ctx.catalog, ctx.tfidf, ctx.features, ctx.corrector))
+        latencies.append(time.perf_counter() - started)
+    return results, latencies
+
+
+def _micro_batched(size: int):
+    def run(ctx: BenchContext, queries: List[str], limit: int) -> Tuple[List[List[Dict]], List[float]]:
+        # SearchMicroBatcher jaisa: ek batch ki har query ki latency = poore batch ka time
+        results, latencies = [], []
+        for i in range(0, len(queries), size):
+            chunk = queries[i:i + size]
+            started = time.perf_counter()
+            results.extend(_with_batch_mode(True, lambda: fuzzy_search_batch(chunk, limit, ctx.catalog, ctx.trigram_index, ctx.features)))
+            latencies.extend([time.perf_counter() - started] * len(chunk))
+        return results, latencies
+    return run
+
+
+ENGINES: Dict[str, Callable] = {
+    "baseline": _baseline,  # Purana engine as-is (default reference): full WRatio scan + V7
+    "fullscan": _single(batch=False, trigram=False),  # Current engine, trigram shortlist ke bina (year partition + acronym index chalu)
+    "scalar": _single(batch=False, trigram=True),
+    "batch": _single(batch=True, trigram=True),
+    "batch16": _micro_batched(16),
+    "symspell": _single(batch=False, trigram=True, correct=True),  # scalar + typo token correction
+    "shared": _shared_mmap,
+    "tfidf": _tfidf,
+}
+NUMPY_ENGINES = {"batch", "batch16", "tfidf"}
+
+
+def bench_v7_scorer(ctx: BenchContext, queries: List[Tuple[str, str, str]], pairs: int = 200000) -> float:
+    """get_smart_match_score_v7 ka raw throughput (calls/sec) random (query, title) pairs par."""
+    rnd = random.Random(3)
+    titles = ctx.catalog.titles
+    parsed = [clean_text_for_search(q).split() for _, q, _ in queries] or [["test"]]
+    sample = [(parsed[rnd.randrange(len(parsed))], ctx.features[titles[rnd.randrange(len(titles))]]) for _ in range(pairs)]
+    started = time.perf_counter()
+    for tokens, features in sample:
+        get_smart_match_score_v7(tokens, features, "2020", "2021")
+    return pairs / (time.perf_counter() - started)
+
+
+def run_benchmark(sizes: List[int], engines: List[str], reference: str, query_count: int, limit: int, top_k: int, seed: int) -> List[Dict]:
+    report = []
+    for size in sizes:
+        print(f"\n=== Catalog: {size:,} movies ===")
+        movies, truth = generate_catalog(size, seed)
+        with PeakRSS() as rss:
+            ctx = BenchContext(movies)
+        del movies
+        gc.collect()
+        builds = ", ".join(f"{k} {v:.2f}s" for k, v in ctx.build_seconds.items())
+        print(f"Index build: {builds} | {len(ctx.catalog):,} titles | peak RSS {rss.peak_mb:.0f} MB")
+        v7_rate = bench_v7_scorer(ctx, generate_queries(truth, 200, seed + 1))
+        print(f"get_smart_match_score_v7: {v7_rate:,.0f} calls/s")
+
+        queries = generate_queries(truth, query_count, seed + 1)
+        query_texts = [q for _, q, _ in queries]
+        # Warm-up (rapidfuzz/numpy first-call overhead measurement mein na aaye)
+        for name in engines:
+            ENGINES[name](ctx, query_texts[:3], limit)
+
+        top_ids: Dict[str, List[List[str]]] = {}
+        for name in [reference] + [e for e in engines if e != reference]:
+            gc.collect()
+            with PeakRSS() as rss:
+                started = time.perf_counter()
+                results, latencies = ENGINES[name](ctx, query_texts, limit)
+                elapsed = time.perf_counter() - started
+            top_ids[name] = [[r["imdb_id"] for r in res[:top_k]] for res in results]
+
+            # Reference engine ke top-k se overlap, aur expected movie top-k mein aayi ya nahi
+            agreement = sum(
+                len(set(a) & set(b)) / max(1, min(top_k, len(b))) if b else float(not a)
+                for a, b in zip(top_ids[name], top_ids[reference])
+            ) / len(queries)
+            hits_by_kind: Dict[str, List[int]] = {}
+            for (kind, _, expected), ids in zip(queries, top_ids[name]):
+                hits_by_kind.setdefault(kind, []).append(int(expected in ids))
+            hit_rate = sum(sum(v) for v in hits_by_kind.values()) / len(queries)
+
+            latencies.sort()
+            row = {
+                "size": size,
+                "engine": name,
+                "queries": len(queries),
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+                "qps": len(queries) / elapsed if elapsed else 0.0,
+                "peak_rss_mb": rss.peak_mb,
+                f"top{top_k}_agreement": agreement,
+                f"hit@{top_k}": hit_rate,
+                f"hit@{top_k}_by_kind": {k: sum(v) / len(v) for k, v in hits_by_kind.items()},
+                "build_seconds": ctx.build_seconds,
+                "v7_calls_per_sec": v7_rate,
+            }
+            report.append(row)
+            print(
+                f"{name:>9} | p50 {row['p50_ms']:7.2f} ms | p95 {row['p95_ms']:7.2f} ms | p99 {row['p99_ms']:7.2f} ms | "
+                f"{row['qps']:8.1f} q/s | RSS {row['peak_rss_mb']:6.0f} MB | "
+                f"top{top_k} agree {agreement:5.1%} | hit@{top_k} {hit_rate:5.1%}"
+            )
+        del ctx
+        gc.collect()
+    return report
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Search engine benchmark (synthetic catalogs).")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma separated catalog sizes (e.g. 10000,100000,1000000)")
+    parser.add_argument("--engines", default=",".join(ENGINES), help=f"Engine configs: {', '.join(ENGINES)}")
+    parser.add_argument("--reference", default="baseline", help="Top-k agreement isi engine ke results se")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--limit", type=int, default=100, help="Search result limit (bot jaisa)")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Report JSON file mein bhi likhein")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    unknown = [e for e in engines + [args.reference] if e not in ENGINES]
+    if unknown:
+        parser.error(f"Unknown engine(s): {', '.join(unknown)}")
+    if not batch_scorer.NUMPY_AVAILABLE:
+        skipped = [e for e in engines if e in NUMPY_ENGINES]
+        if skipped: print(f"NumPy nahi mila, skip: {', '.join(skipped)}")
+        engines = [e for e in engines if e not in NUMPY_ENGINES]
+        if args.reference in NUMPY_ENGINES: parser.error("Reference engine ke liye NumPy chahiye.")
+    if args.reference not in engines:
+        engines.insert(0, args.reference)
+    if not PSUTIL_AVAILABLE:
+        print("psutil nahi mila: RSS process lifetime peak hai (per-engine nahi).")
+
+    report = run_benchmark(sizes, engines, args.reference, args.queries, args.limit, args.top_k, args.seed)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved: {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+# search_cache.py
+import os
+import random
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Kitni normalized queries ke results RAM mein rahenge (0 = cache off)
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "2048"))
+# Query log: itne fraction searches count hote hain (1.0 = sab), aur process-local top list ka size
+QUERY_LOG_SAMPLE_RATE = float(os.getenv("QUERY_LOG_SAMPLE_RATE", "0.25"))
+QUERY_LOG_LOCAL_SIZE = int(os.getenv("QUERY_LOG_LOCAL_SIZE", "5000"))
+
+
+class SearchResultCache:
+    """
+    In-process LRU cache: normalized query -> fuzzy search results.
+    Har entry ke saath catalog version store hota hai; catalog badalne par (version bump)
+    purani entries lookup ke waqt stale maani jaati hain. Thread-safe (executor threads se bhi).
+    """
+    def __init__(self, max_size: int = SEARCH_RESULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._data: "OrderedDict[Any, tuple[int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, key: Any, version: int) -> Optional[Any]:
+        if self.max_size <= 0: return None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != version:
+                # Catalog change ke baad ka purana result
+                del self._data[key]
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def has(self, key: Any, version: int) -> bool:
+        """Fresh entry hai ya nahi (hit/miss stats aur LRU order nahi badalta; cache warmer ke liye)."""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] == version
+
+    def put(self, key: Any, version: int, value: Any):
+        if self.max_size <= 0: return
+        with self._lock:
+            self._data[key] = (version, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return (self.hits / total) if total else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hit_ratio(), 4),
+        }
+
+
+class SingleFlight:
+    """
+    Request coalescing (event loop par): same key ki concurrent calls ek hi in-flight
+    computation share karti hain. Pehla caller (leader) task start karta hai, baaki usi ka result await karte hain.
+    Task shield hota hai, isliye kisi ek caller ka timeout/cancel baaki sabka kaam cancel nahi karta.
+    """
+    def __init__(self):
+        self._inflight: Dict[Any, asyncio.Future] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Any, factory: Callable[[], Awaitable[Any]]) -> Any:
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.followers += 1
+        else:
+            fut = asyncio.ensure_future(factory())
+            self._inflight[key] = fut
+            self.leaders += 1
+            fut.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(fut)
+
+    def _forget(self, key: Any, fut: asyncio.Future):
+        if self._inflight.get(key) is fut:
+            del self._inflight[key]
+        # Koi await na kar raha ho (sab cancel) to "exception never retrieved" warning na aaye
+        if not fut.cancelled(): fut.exception()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.followers
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "coalesced_ratio": round(self.followers / total, 4) if total else 0.0,
+        }
+
+
+class TierStats:
+    """
+    Tiered search cascade ke counters: har tier kitni baar try hua, kitni baar hits diye,
+    kitni baar time budget mein nahi aaya, aur final answer kis tier se aaya.
+    """
+    def __init__(self):
+        self.queries = 0
+        self.answered = 0
+        self.tiers: Dict[str, Dict[str, int]] = {}
+        self.answered_by: Dict[str, int] = {}
+
+    def _tier(self, name: str) -> Dict[str, int]:
+        tier = self.tiers.get(name)
+        if tier is None:
+            tier = self.tiers[name] = {"attempts": 0, "hits": 0, "timeouts": 0, "errors": 0}
+        return tier
+
+    def record_tier(self, name: str, hit_count: int = 0, timed_out: bool = False, failed: bool = False):
+        tier = self._tier(name)
+        tier["attempts"] += 1
+        if hit_count: tier["hits"] += 1
+        if timed_out: tier["timeouts"] += 1
+        if failed: tier["errors"] += 1
+
+    def record_query(self, top_tier: Optional[str]):
+        self.queries += 1
+        if top_tier:
+            self.answered += 1
+            self.answered_by[top_tier] = self.answered_by.get(top_tier, 0) + 1
+
+    def summary(self) -> str:
+        """Log line: tier=hit_rate (attempts, timeouts)."""
+        parts = []
+        for name, tier in self.tiers.items():
+            rate = tier["hits"] / tier["attempts"] if tier["attempts"] else 0.0
+            parts.append(f"{name}={rate:.0%} ({tier['attempts']} tries, {tier['timeouts']} timeouts)")
+        answered = self.answered / self.queries if self.queries else 0.0
+        return f"answered {answered:.0%} of {self.queries} | " + ", ".join(parts)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queries": self.queries,
+            "answered": self.answered,
+            "answered_by": dict(self.answered_by),
+            "tiers": {
+                name: dict(tier, hit_rate=round(tier["hits"] / tier["attempts"], 4) if tier["attempts"] else 0.0)
+                for name, tier in self.tiers.items()
+            },
+        }
+
+
+class QueryLog:
+    """
+    Sampled query counter (hot query warming ke liye). Har query `sample_rate` probability se count hoti hai,
+    weight 1/sample_rate ke saath taaki totals unbiased rahein. Pending counts drain() par ek saath flush hote hain
+    (Redis par ek pipeline); `totals` process-local running counts hain jo Redis na hone par warmer use karta hai.
+    """
+    def __init__(self, sample_rate: float = QUERY_LOG_SAMPLE_RATE, max_local: int = QUERY_LOG_LOCAL_SIZE):
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.max_local = max_local
+        self._pending: Dict[str, float] = {}
+        self.totals: Dict[str, float] = {}
+        self.seen = 0
+        self.sampled = 0
+
+    def record(self, query: str) -> bool:
+        self.seen += 1
+        if not query or self.sample_rate <= 0 or random.random() >= self.sample_rate: return False
+        self.sampled += 1
+        weight = 1.0 / self.sample_rate
+        self._pending[query] = self._pending.get(query, 0.0) + weight
+        self.totals[query] = self.totals.get(query, 0.0) + weight
+        if len(self.totals) > self.max_local:
+            # Long tail hatao: top half rakho
+            keep = sorted(self.totals.items(), key=lambda kv: kv[1], reverse=True)[:self.max_local // 2]
+            self.totals = dict(keep)
+        return True
+
+    def drain(self) -> Dict[str, float]:
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def top(self, n: int) -> List[str]:
+        return [q for q, _ in sorted(self.totals.items(), key=lambda kv: kv[1], reverse=True)[:n]]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"seen": self.seen, "sampled": self.sampled, "pending": len(self._pending), "tracked": len(self.totals)}
@@ -0,0 +1,571 @@
+# search_engine.py
+# V7 Intent Engine (side-effect free): bot.py aur search worker processes (search_pool.py) dono
+# isi module ko import karte hain. Yahan koi env/Bot/DB initialization nahi honi chahiye.
+import os
+import re
+import logging
+from typing import List, Dict
+
+from rapidfuzz import process, fuzz
+
+import batch_scorer
+from batch_scorer import np
+import search_index
+from search_index import TrigramIndex, TitleFeatures, MovieCatalog, TokenCorrector, YEAR_NEIGHBOR_WINDOW
+from tfidf_index import NgramTfidfIndex, TFIDF_SHORTLIST_SIZE
+
+logger = logging.getLogger("bot.search_engine")
+
+
+# --- CLEANING LOGIC (Unchanged, moved from bot.py) ---
+def clean_text_for_search(text: str) -> str:
+    """Strict cleaning for Search Index (Used for Fuzzy Cache Keys and Exact Match Anchor)."""
+    if not text: return ""
+    text = text.lower()
+    # Separators ko space se badle (DB clean logic se synchronize)
+    text = re.sub(r"[._\-]+", " ", text) 
+    # FIX: Better regex to only remove S01/Season 1 constructs (Bug #15)
+    text = re.sub(r"\b(s|season)\s*\d{1,2}(?!\d)", " ", text)
+    # Sirf a-z, 0-9, aur space rakhein
+    text = re.sub(r"[^a-z0-9\s]+", "", text) 
+    # Extra spaces hatayein
+    text = re.sub(r"\s+", " ", text).strip() 
+    return text
+
+def clean_text_for_fuzzy(text: str) -> str:
+    # FIX: Unified cleaning logic using the main search cleaner (Bug #17)
+    return clean_text_for_search(text)
+
+# Release filename -> title/year (bot.py indexing aur search_benchmark.py dono use karte hain)
+def parse_filename(filename: str) -> Dict[str, str | None]:
+    if not filename: return {"title": "Untitled", "year": None}
+    year = None
+    match_paren = re.search(r"\(((19[89]\d|20[0-3]\d))\)", filename)
+    if match_paren: year = match_paren.group(1)
+    else:
+        matches_bare = re.findall(r"\b((19[89]\d|20[0-3]\d))\b", filename)
+        if matches_bare: year = matches_bare[-1][0]
+    
+    title = os.path.splitext(filename)[0].strip()
+    if year: title = re.sub(rf"(\s*\(?{year}\)?\s*)$", "", title, flags=re.IGNORECASE).strip()
+    title = re.sub(r"\[.*?\]", "", title, flags=re.IGNORECASE)
+    title = re.sub(r"\(.*?\)", "", title, flags=re.IGNORECASE)
+    common_tags = r"\b(web-rip|org|hindi|dd 5.1|english|480p|720p|1080p|web-dl|hdrip|bluray|dual audio|esub|full hd)\b"
+    title = re.sub(common_tags, "", title, flags=re.IGNORECASE)
+    title = re.sub(r'[._]', ' ', title).strip()
+    title = re.sub(r"\s+", " ", title).strip()
+    
+    if not title:
+        title = os.path.splitext(filename)[0].strip()
+        title = re.sub(r"\[.*?\]", "", title, flags=re.IGNORECASE).strip()
+        title = re.sub(r"\(.*?\)", "", title, flags=re.IGNORECASE).strip()
+        title = re.sub(r'[._]', ' ', title).strip()
+        title = re.sub(r"\s+", " ", title).strip()
+        
+    return {"title": title or "Untitled", "year": year}
+
+
+# ==================================================
+# +++++ V7 ULTRA INTENT ENGINE (Google-Like) +++++
+# ==================================================
+
+def get_smart_match_score_v7(query_tokens: List[str], target: TitleFeatures, query_year: str = None, target_year: str = None) -> int:
+    """
+    V7 Ultra Engine:
+    10-Point Logic System for 'Google-Like' Accuracy without high CPU usage.
+    `target` precomputed TitleFeatures record hai (load_fuzzy_cache mein banta hai).
+    """
+    if not query_tokens or not target or not target.clean: return 0
+    
+    score = 0
+    # Create Tight Strings (Spaces removed) for typo tolerance (e.g., 'ironman' == 'iron man')
+    query_str_tight = "".join(query_tokens).lower()
+    target_clean = target.clean
+    target_str_tight = target.tight
+    target_token_set = target.token_set
+    
+    # --- LOGIC 1: EXACT TIGHT MATCH (Highest Priority) ---
+    if query_str_tight == target_str_tight:
+        return 2000 # Instant Winner
+        
+    # --- LOGIC 2: STARTS WITH (Prefix Bonus) ---
+    # Example: "Ava" matches "Avatar" better than "The Ava..."
+    if target_clean.startswith(query_tokens[0]):
+        score += 150
+    elif target_str_tight.startswith(query_str_tight):
+        score += 100
+
+    # --- LOGIC 3: YEAR BOOSTING (Critical for Accuracy) ---
+    # If user typed '2023' and movie is '2023', massive boost.
+    if query_year and target_year:
+        if query_year == target_year:
+            score += 300
+    
+    # --- LOGIC 4: WORD PRESENCE & WHOLE WORD MATCH ---
+    matched_words = 0
+    for q_token in query_tokens:
+        if len(q_token) < 2: continue 
+        # Check if token exists as a WHOLE word in target
+        if q_token in target_token_set:
+            score += 60 # Whole word bonus (High)
+            matched_words += 1
+        # Check if token exists as Substring
+        elif q_token in target_clean:
+            score += 30 # Substring bonus (Medium)
+            matched_words += 1
+            
+    # Full Query Match Bonus
+    if matched_words == len([t for t in query_tokens if len(t) >= 2]):
+        score += 100
+
+    # --- LOGIC 5: WORD ORDER CORRECTNESS ---
+    # "Iron Man" (Correct) vs "Man Iron" (Incorrect)
+    try:
+        last_idx = -1
+        order_score = 0
+        for q_token in query_tokens:
+            curr_idx = target_clean.find(q_token)
+            if curr_idx > last_idx:
+                order_score += 20
+                last_idx = curr_idx
+        score += order_score
+    except: pass
+
+    # --- LOGIC 6: ACRONYM/INITIALS MATCH ---
+    # Handles "KGF" -> "K.G.F" or "DDLJ"
+    if len(query_tokens) == 1 and len(query_str_tight) > 2:
+        # Check if first letters of target match query
+        if query_str_tight == target.initials:
+            score += 250
+
+    # --- LOGIC 7: SEQUENCE MATCH (Your Legacy Logic - Preserved) ---
+    # Checks character-by-character sequence
+    last_idx = -1
+    broken = False
+    for char in query_str_tight:
+        found_idx = target_str_tight.find(char, last_idx + 1)
+        if found_idx == -1:
+            broken = True
+            break
+        last_idx = found_idx
+    
+    if not broken:
+        score += 100 # Sequence found
+        
+        # --- LOGIC 8: DENSITY SCORE (Coverage) ---
+        # "Avengers" matches "The Avengers" (High Density) better than "Avengers Age of Ultron..." (Low Density)
+        density = len(query_str_tight) / target.length
+        score += int(density * 100) # Max 100 bonus
+
+    # --- LOGIC 9: AESTHETIC PENALTY ---
+    # Penalize if query is tiny and matches a huge title (prevent false positives)
+    if len(query_str_tight) < 4 and target.length > 30:
+        score -= 50
+        
+    # --- LOGIC 10: ROMAN NUMERAL INTELLIGENCE (Basic) ---
+    # If query has '2', boost titles with 'II'
+    if '2' in query_tokens and 'ii' in target_token_set: score += 50
+    if '3' in query_tokens and 'iii' in target_token_set: score += 50
+
+    return score
+
+def _parse_fuzzy_query(query: str):
+    """Query se (query_year, q_fuzzy, q_anchor, query_tokens) nikalta hai. Invalid ho to None."""
+    # Extract Year from Query if present (e.g., "Jawan 2023")
+    query_year = None
+    year_match = re.search(r"\b(19[7-9]\d|20[0-2]\d)\b", query)
+    if year_match:
+        query_year = year_match.group(1)
+    
+    q_fuzzy = clean_text_for_fuzzy(query) 
+    q_anchor = clean_text_for_search(query) 
+    
+    if not q_fuzzy or not q_anchor: return None
+    
+    query_tokens = [t for t in q_anchor.split() if t]
+    return query_year, q_fuzzy, q_anchor, query_tokens
+
+def _query_variants(query: str, corrector: TokenCorrector | None = None) -> list:
+    """
+    Parsed query ke variants: raw hamesha pehle, aur `corrector` ne tokens badle hon to corrected bhi
+    ('avangers endgme' -> 'avengers endgame'). Dono score hote hain aur har movie ka behtar score rehta hai,
+    kyunki correction kabhi sahi raw match ko bhi bigaad deta hai. Invalid query = empty list.
+    """
+    parsed = _parse_fuzzy_query(query)
+    if not parsed: return []
+    variants = [parsed]
+    if corrector is not None:
+        query_year, _, _, query_tokens = parsed
+        corrected = corrector.correct_tokens(query_tokens)
+        if corrected != query_tokens:
+            q_corrected = " ".join(corrected)
+            variants.append((query_year, q_corrected, q_corrected, corrected))
+    return variants
+
+def _exact_anchor_candidates(q_anchor: str, current_cache: MovieCatalog) -> tuple[List[Dict], set]:
+    """Exact clean_title match (aur 'the ' variant) ko MAX SCORE ke saath return karta hai."""
+    candidates = []
+    seen_imdb = set()
+    anchor_keys = [q_anchor]
+    if q_anchor.startswith('the '): anchor_keys.append(q_anchor[4:]) 
+    else: anchor_keys.append('the ' + q_anchor) 
+
+    for key in set(anchor_keys):
+        if key in current_cache:
+            movies_list = current_cache[key]
+            if isinstance(movies_list, dict): movies_list = [movies_list]
+
+            for data in movies_list:
+                if data['imdb_id'] not in seen_imdb:
+                     candidates.append({
+                        'imdb_id': data['imdb_id'],
+                        'title': data['title'],
+                        'year': data.get('year'),
+                        'score': 2000, # MAX SCORE
+                        'match_type': 'exact_anchor'
+                     })
+                     seen_imdb.add(data['imdb_id'])
+    return candidates, seen_imdb
+
+def _year_partition(query_year: str | None, query_tokens: List[str], current_cache: MovieCatalog) -> tuple[List[str], frozenset | None]:
+    """
+    "Jawan 2023" jaisi query: sirf 2022-2024 (aur bina year wali) movies ke titles.
+    Sirf year wali query ("2012") par filter nahi lagta, wahan year hi title ho sakta hai.
+    """
+    # MovieCatalog ya shared_index.SharedCatalog (dono year_partition dete hain)
+    if not query_year or not hasattr(current_cache, "year_partition"): return [], None
+    if all(t == query_year for t in query_tokens): return [], None
+    base = int(query_year)
+    years = [str(y) for y in range(base - YEAR_NEIGHBOR_WINDOW, base + YEAR_NEIGHBOR_WINDOW + 1)]
+    titles, title_set = current_cache.year_partition(years)
+    if not titles: return [], None  # Us year ki koi movie hi nahi: normal search
+    return titles, title_set
+
+def _substring_titles(q_fuzzy: str, current_cache: MovieCatalog, allowed) -> List[str]:
+    """
+    Query ke andar poore aane wale titles ('golo do kat' mein 'go', 'do'). WRatio ka partial match inhe 90 deta hai,
+    par chhote title ka trigram Dice itna kam hai ki shortlist mein nahi aate. Sirf dict lookups (query length ka square).
+    """
+    n = len(q_fuzzy)
+    # WRatio partial scale 0.9 sirf length ratio <= 8 tak; usse chhote substrings ka fuzz 60 se upar nahi jaata
+    min_len = max(2, -(-n // 8))
+    found, seen = [], set()
+    for i in range(n):
+        if q_fuzzy[i] == " ": continue
+        for j in range(i + min_len, n):
+            sub = q_fuzzy[i:j]
+            if sub in seen or sub[-1] == " ": continue
+            seen.add(sub)
+            if sub in current_cache and (allowed is None or sub in allowed):
+                found.append(sub)
+    return found
+
+def _fuzzy_search_space(q_fuzzy: str, q_anchor: str, query_year: str | None, query_tokens: List[str], current_cache: MovieCatalog, trigram_index: TrigramIndex) -> tuple[List[str], List[str]]:
+    """
+    Returns: (search_space, acronym_hits).
+    acronym_hits initials index ka dict lookup hai ('ddlj'); ye titles WRatio cutoff ke neeche
+    bhi V7 re-ranking tak pahunchte hain (Logic 6 ka +250 wahi deta hai).
+    """
+    year_titles, allowed = _year_partition(query_year, query_tokens, current_cache)
+    # Trigram shortlist: poori library ki jagah sirf few hundred titles score honge.
+    search_space = trigram_index.candidates(q_fuzzy, allowed=allowed) if trigram_index else []
+    acronym_hits = trigram_index.acronym_candidates(q_anchor) if trigram_index else []
+    min_score = search_index.TRIGRAM_SHORTLIST_MIN_SCORE
+    if search_space and min_score and process.extractOne(q_fuzzy, search_space, scorer=fuzz.WRatio, score_cutoff=min_score) is None:
+        # Quality guard: shortlist mein koi strong match (WRatio >= min_score) nahi, yaani typo query jiske
+        # WRatio hits Dice order mein neeche hain. Aisi query ka shortlist wide.
+        search_space = trigram_index.candidates(q_fuzzy, limit=search_index.TRIGRAM_WIDE_SHORTLIST_SIZE, allowed=allowed)
+    if not search_space and (not acronym_hits or min_score):
+        # Koi trigram hit nahi (guard on ho to acronym hits ke saath bhi): year partition, warna purana full scan fallback.
+        # Catalog ka stable titles sequence seedha use hota hai (per-query copy nahi)
+        search_space = year_titles or (current_cache.titles if hasattr(current_cache, "titles") else list(current_cache.keys()))
+    elif search_space:
+        shortlist = set(search_space)
+        extra = [t for t in _substring_titles(q_fuzzy, current_cache, allowed) if t not in shortlist]
+        if extra: search_space = search_space + extra
+    return search_space, acronym_hits
+
+def fuzzy_search(query: str, limit: int, current_cache: MovieCatalog, trigram_index: TrigramIndex, title_features: Dict[str, TitleFeatures], corrector: TokenCorrector | None = None, vectorized: bool | None = None) -> List[Dict]:
+    """
+    V7 Ultra Search Handler:
+    Integrates Intent Engine V7 with RapidFuzz for Google-like precision.
+    Index snapshots caller deta hai (bot globals ya worker process ki apni copy).
+    vectorized=None = BATCH_SCORING_ENABLED config; True/False sirf is call ke liye (shadow eval).
+    """
+    # Vectorized mode: same V7 logic, NumPy arrays par
+    if vectorized is None: vectorized = batch_scorer.BATCH_SCORING_ENABLED
+    if vectorized and batch_scorer.NUMPY_AVAILABLE:
+        return fuzzy_search_batch([query], limit, current_cache, trigram_index, title_features, corrector, vectorized=True)[0]
+
+    if not current_cache:
+        return []
+
+    try:
+        # --- INTELLIGENT QUERY PARSING ---
+        variants = _query_variants(query, corrector)
+        if not variants: return []
+        results = [_fuzzy_search_parsed(parsed, limit, current_cache, trigram_index, title_features) for parsed in variants]
+        # Raw aur corrected dono: har movie ka behtar score (tie par raw)
+        return results[0] if len(results) == 1 else merge_tier_results(results, limit)
+
+    except Exception as e:
+        logger.error(f"fuzzy_search V7 mein error: {e}", exc_info=True)
+        return []
+
+def _fuzzy_search_parsed(parsed: tuple, limit: int, current_cache: MovieCatalog, trigram_index: TrigramIndex, title_features: Dict[str, TitleFeatures]) -> List[Dict]:
+    """fuzzy_search ka ek query variant (exact anchor + shortlist WRatio + V7 re-ranking)."""
+    query_year, q_fuzzy, q_anchor, query_tokens = parsed
+    
+    # --- 1. EXACT MATCH ANCHOR (Confirmation) ---
+    candidates, seen_imdb = _exact_anchor_candidates(q_anchor, current_cache)
+    
+    # --- 2. RAPIDFUZZ BROAD FETCH (Keeping 800 Limit as requested) ---
+    # CPU Optimization: Only scan if exact match didn't fill the page
+    if len(candidates) < limit:
+        search_space, acronym_hits = _fuzzy_search_space(q_fuzzy, q_anchor, query_year, query_tokens, current_cache, trigram_index)
+        
+        pre_filtered = process.extract(
+            q_fuzzy, 
+            search_space, 
+            limit=800, # Keeping your request
+            scorer=fuzz.WRatio, 
+            score_cutoff=35 
+        ) if search_space else []
+        
+        # Acronym hits hamesha re-rank hote hain (cutoff se neeche ho to fuzz score 0, cdist jaisa)
+        if acronym_hits:
+            already = {hit[0] for hit in pre_filtered}
+            for title in acronym_hits:
+                if title not in already:
+                    pre_filtered.append((title, fuzz.WRatio(q_fuzzy, title, score_cutoff=35), None))
+        
+        # --- 3. V7 ENGINE RE-RANKING ---
+        for clean_title_key, fuzz_score, _ in pre_filtered:
+            movies_list = current_cache.get(clean_title_key)
+            if not movies_list: continue
+            if isinstance(movies_list, dict): movies_list = [movies_list]
+            # Precomputed record; naya title (abhi index nahi hua) ho to on-the-fly
+            features = title_features.get(clean_title_key) or TitleFeatures(clean_title_key)
+
+            for data in movies_list:
+                if data['imdb_id'] in seen_imdb: continue
+                
+                target_year = data.get('year')
+                
+                # CALL V7 ENGINE
+                intent_score = get_smart_match_score_v7(query_tokens, features, query_year, target_year)
+                
+                final_score = 0
+                match_type = "fuzzy"
+                
+                # Hybrid Scoring Formula
+                if fuzz_score >= 90:
+                    final_score = 900 + intent_score
+                    match_type = "high_fuzzy"
+                else:
+                    # Base fuzz score + V7 Intelligence
+                    final_score = fuzz_score + intent_score
+                    match_type = "intent_v7"
+
+                candidates.append({
+                    'imdb_id': data['imdb_id'],
+                    'title': data['title'],
+                    'year': target_year,
+                    'score': final_score,
+                    'match_type': match_type
+                })
+                seen_imdb.add(data['imdb_id'])
+
+    # 4. Final Sort
+    candidates.sort(key=lambda x: x['score'], reverse=True)
+    
+    return candidates[:limit]
+
+def tfidf_search(query: str, limit: int, current_cache: MovieCatalog, tfidf_index: NgramTfidfIndex, title_features: Dict[str, TitleFeatures], corrector: TokenCorrector | None = None) -> List[Dict]:
+    """
+    Vector-space engine (FUZZY_SEARCH_ENGINE=tfidf): WRatio scan ki jagah TF-IDF trigram cosine shortlist,
+    phir wahi V7 intent re-ranking. Score scale fuzzy_search jaisa (cosine * 100 + intent), taaki tier merge same rahe.
+    """
+    if not current_cache or tfidf_index is None:
+        return []
+
+    try:
+        variants = _query_variants(query, corrector)
+        if not variants: return []
+        results = []
+        for query_year, q_fuzzy, q_anchor, query_tokens in variants:
+            candidates, seen_imdb = _exact_anchor_candidates(q_anchor, current_cache)
+
+            if len(candidates) < limit:
+                for clean_title_key, similarity in tfidf_index.top_k(q_fuzzy, max(limit, TFIDF_SHORTLIST_SIZE)):
+                    movies_list = current_cache.get(clean_title_key)
+                    if not movies_list: continue
+                    if isinstance(movies_list, dict): movies_list = [movies_list]
+                    features = title_features.get(clean_title_key) or TitleFeatures(clean_title_key)
+                    sim_score = similarity * 100
+                    for data in movies_list:
+                        if data['imdb_id'] in seen_imdb: continue
+                        target_year = data.get('year')
+                        intent_score = get_smart_match_score_v7(query_tokens, features, query_year, target_year)
+                        high = sim_score >= 90
+                        candidates.append({
+                            'imdb_id': data['imdb_id'],
+                            'title': data['title'],
+                            'year': target_year,
+                            'score': (900 + intent_score) if high else (sim_score + intent_score),
+                            'match_type': "high_fuzzy" if high else "tfidf"
+                        })
+                        seen_imdb.add(data['imdb_id'])
+
+            candidates.sort(key=lambda x: x['score'], reverse=True)
+            results.append(candidates[:limit])
+        # Raw aur corrected dono: har movie ka behtar score (tie par raw)
+        return results[0] if len(results) == 1 else merge_tier_results(results, limit)
+
+    except Exception as e:
+        logger.error(f"tfidf_search mein error: {e}", exc_info=True)
+        return []
+
+class _FeatureLookup:
+    """titles[i] ka TitleFeatures on demand: score_queries sirf prefilter ke baad bache titles ke features padhta hai."""
+    __slots__ = ("titles", "known")
+
+    def __init__(self, titles: List[str], known: Dict[str, TitleFeatures]):
+        self.titles = titles
+        self.known = known
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def __getitem__(self, i: int) -> TitleFeatures:
+        title = self.titles[i]
+        return self.known.get(title) or TitleFeatures(title)
+
+def fuzzy_search_batch(queries: List[str], limit: int, current_cache: MovieCatalog, trigram_index: TrigramIndex, title_features: Dict[str, TitleFeatures], corrector: TokenCorrector | None = None, vectorized: bool | None = None) -> List[List[Dict]]:
+    """
+    Vectorized V7 engine (batch_scorer): har query apne search space par rapidfuzz cdist se score hoti hai
+    aur V7 bonuses NumPy array operations se lagte hain. Har query ka result fuzzy_search jaisa.
+    """
+    if vectorized is None: vectorized = batch_scorer.BATCH_SCORING_ENABLED
+    if not (vectorized and batch_scorer.NUMPY_AVAILABLE):
+        return [fuzzy_search(q, limit, current_cache, trigram_index, title_features, corrector, vectorized=False) for q in queries]
+
+    results: List[List[Dict]] = [[] for _ in queries]
+    if not current_cache or not queries:
+        return results
+
+    try:
+        # 1. Har query variant (raw, corrected): parse + exact anchor + trigram search space
+        specs, spec_owner, units, unit_owner, space_per_spec, forced_per_spec = [], [], [], [], [], []
+        union_ids: Dict[str, int] = {}
+        for qi, query in enumerate(queries):
+            for query_year, q_fuzzy, q_anchor, query_tokens in _query_variants(query, corrector):
+                candidates, seen_imdb = _exact_anchor_candidates(q_anchor, current_cache)
+                if len(candidates) < limit:
+                    search_space, acronym_hits = _fuzzy_search_space(q_fuzzy, q_anchor, query_year, query_tokens, current_cache, trigram_index)
+                    space = [union_ids.setdefault(title, len(union_ids)) for title in search_space]
+                    forced = [union_ids.setdefault(title, len(union_ids)) for title in acronym_hits]
+                    specs.append((q_fuzzy, query_tokens, query_year))
+                    spec_owner.append(len(units))
+                    space_per_spec.append(space)
+                    forced_per_spec.append(forced)
+                units.append((candidates, seen_imdb))
+                unit_owner.append(qi)
+
+        # 2. Rows: har (title, movie) pair ek row
+        titles = list(union_ids)
+        row_data, row_title_idx, row_years = [], [], []
+        for ti, title in enumerate(titles):
+            movies_list = current_cache.get(title)
+            if not movies_list: continue
+            if isinstance(movies_list, dict): movies_list = [movies_list]
+            for data in movies_list:
+                row_data.append(data)
+                row_title_idx.append(ti)
+                row_years.append(data.get('year') or "")
+        features = _FeatureLookup(titles, title_features)
+
+        # 3. Per-query cdist (apne search space par) + vectorized V7
+        scored = batch_scorer.score_queries(
+            specs, titles, features,
+            np.asarray(row_title_idx, dtype=np.int64), np.asarray(row_years, dtype=str),
+            space_per_spec, forced=forced_per_spec
+        )
+
+        # 4. Per-variant merge (fuzz desc order mein dedupe, jaise process.extract karta tha)
+        scored_by_unit = dict(zip(spec_owner, scored))
+        per_query: List[List[List[Dict]]] = [[] for _ in queries]
+        for ui, (candidates, seen_imdb) in enumerate(units):
+            if ui in scored_by_unit:
+                rows, final, high = scored_by_unit[ui]
+                order = np.argsort(-final, kind='stable')
+                for k in order:
+                    data = row_data[rows[k]]
+                    if data['imdb_id'] in seen_imdb: continue
+                    candidates.append({
+                        'imdb_id': data['imdb_id'],
+                        'title': data['title'],
+                        'year': data.get('year'),
+                        'score': float(final[k]),
+                        'match_type': "high_fuzzy" if high[k] else "intent_v7"
+                    })
+                    seen_imdb.add(data['imdb_id'])
+            candidates.sort(key=lambda x: x['score'], reverse=True)
+            per_query[unit_owner[ui]].append(candidates[:limit])
+        # Raw aur corrected dono: har movie ka behtar score (tie par raw)
+        for qi, variants in enumerate(per_query):
+            if variants:
+                results[qi] = variants[0] if len(variants) == 1 else merge_tier_results(variants, limit)
+        return results
+
+    except Exception as e:
+        logger.error(f"fuzzy_search_batch mein error: {e}", exc_info=True)
+        return results
+
+
+# --- TIERED CASCADE: DB full-text hits ko in-memory scale par laana ---
+def score_external_hits(query: str, hits: List[Dict], tier: str) -> List[Dict]:
+    """
+    Mongo $text / Neon tsvector hits ko wahi formula deta hai jo fuzzy_search use karta hai
+    (exact anchor 2000, warna WRatio + V7 intent), taaki alag tiers ke scores seedha compare ho sakein.
+    """
+    parsed = _parse_fuzzy_query(query)
+    if not parsed: return []
+    query_year, q_fuzzy, q_anchor, query_tokens = parsed
+    anchor_keys = {q_anchor, q_anchor[4:] if q_anchor.startswith('the ') else 'the ' + q_anchor}
+
+    scored = []
+    for hit in hits:
+        imdb_id, title = hit.get('imdb_id'), hit.get('title')
+        if not imdb_id or not title: continue
+        clean_title = clean_text_for_search(title)
+        if not clean_title: continue
+        if clean_title in anchor_keys:
+            score, match_type = 2000, 'exact_anchor'
+        else:
+            fuzz_score = fuzz.WRatio(q_fuzzy, clean_text_for_fuzzy(title))
+            intent_score = get_smart_match_score_v7(query_tokens, TitleFeatures(clean_title), query_year, hit.get('year'))
+            score = (900 + intent_score) if fuzz_score >= 90 else (fuzz_score + intent_score)
+            match_type = f"{tier}_text"
+        scored.append({
+            'imdb_id': imdb_id,
+            'title': title,
+            'year': hit.get('year'),
+            'score': score,
+            'match_type': match_type
+        })
+    return scored
+
+def merge_tier_results(tiers: List[List[Dict]], limit: int) -> List[Dict]:
+    """
+    Tier results (priority order: memory pehle) ko ek ranked list mein merge karta hai.
+    Same imdb_id do tiers mein aaye to zyada score wala record rehta hai (tie par pehla tier).
+    """
+    best: Dict[str, Dict] = {}
+    for hits in tiers:
+        for movie in hits:
+            current = best.get(movie['imdb_id'])
+            if current is None or movie.get('score', 0) > current.get('score', 0):
+                best[movie['imdb_id']] = movie
+    merged = sorted(best.values(), key=lambda x: x.get('score', 0), reverse=True)
+    return merged[:limit]
@@ -0,0 +1,658 @@
+# search_index.py
+import os
+import sys
+import zlib
+import heapq
+import logging
+from array import array
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from rapidfuzz.distance import OSA
+
+logger = logging.getLogger("bot.search_index")
+
+# Kitne candidate titles rapidfuzz tak jayenge (Few hundred is enough for V7 re-ranking)
+TRIGRAM_SHORTLIST_SIZE = int(os.getenv("TRIGRAM_SHORTLIST_SIZE", "400"))
+# Quality guard: shortlist ka best WRatio isse kam ho to trigram match kamzor hai (0 = guard off)...
+TRIGRAM_SHORTLIST_MIN_SCORE = int(os.getenv("TRIGRAM_SHORTLIST_MIN_SCORE", "90"))
+# ...aisi query ka shortlist itna wide hota hai (typo queries ke WRatio hits Dice order mein neeche hote hain)
+TRIGRAM_WIDE_SHORTLIST_SIZE = int(os.getenv("TRIGRAM_WIDE_SHORTLIST_SIZE", "2000"))
+# Isse badi posting list ko poora scan nahi karte, sirf existing candidates ke liye probe karte hain
+TRIGRAM_MAX_SCAN = int(os.getenv("TRIGRAM_MAX_SCAN", "20000"))
+# Acronym index: itne letters se chhoti queries initials lookup nahi karti (V7 Logic 6 jaisa)
+ACRONYM_MIN_LENGTH = 3
+# Inline autocomplete: ek prefix par itni sorted entries tak hi scan (sub-ms latency)
+PREFIX_SCAN_MAX = int(os.getenv("PREFIX_SCAN_MAX", "300"))
+# Year wali query ("Jawan 2023") ke candidates sirf year +/- itne saal ki movies se aate hain
+YEAR_NEIGHBOR_WINDOW = int(os.getenv("YEAR_NEIGHBOR_WINDOW", "1"))
+# Typo correction (SymSpell): max edit distance (0 = off) aur deletes sirf token ke itne pehle letters par
+TOKEN_CORRECTION_MAX_EDIT = int(os.getenv("TOKEN_CORRECTION_MAX_EDIT", "2"))
+TOKEN_CORRECTION_PREFIX = int(os.getenv("TOKEN_CORRECTION_PREFIX", "7"))
+# Isse chhote tokens ('ka', '2', 'ii') correct nahi hote; 6 se chhote tokens par max 1 edit
+TOKEN_CORRECTION_MIN_LENGTH = 4
+
+
+def make_trigrams(text: str) -> Set[str]:
+    """Space-padded character trigrams ('avatar' -> ' av', 'ava', ..., 'ar ')."""
+    if not text: return set()
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def count_trigram_overlaps(postings: List) -> Dict[int, int]:
+    """
+    Sorted posting lists (title ids) se: title id -> kitne query trigrams match hue.
+    Rare trigrams pehle: unki lists poori scan hoti hain; common trigram (e.g. 'the') sirf known candidates ko probe karta hai.
+    """
+    postings.sort(key=len)
+    counts: Dict[int, int] = {}
+    for posting in postings:
+        if len(posting) <= TRIGRAM_MAX_SCAN or not counts:
+            for tid in posting:
+                counts[tid] = counts.get(tid, 0) + 1
+        else:
+            size = len(posting)
+            for tid in counts:
+                pos = bisect_left(posting, tid)
+                if pos < size and posting[pos] == tid:
+                    counts[tid] += 1
+    return counts
+
+
+def title_initials(title: str) -> str:
+    """Har word ka pehla letter ('dilwale dulhania le jayenge' -> 'ddlj')."""
+    return "".join(t[0] for t in title.split())
+
+
+class TrigramIndex:
+    """
+    Character-trigram inverted index over fuzzy cache keys (clean titles).
+    Har title ko ek integer id milta hai; posting lists sorted array('I') hain
+    taaki 500k+ titles par bhi RAM kam lage. Removed titles sirf tombstone hote hain.
+    Saath mein initials -> title ids map bhi rakhta hai (acronym queries: 'kgf', 'ddlj').
+    """
+    def __init__(self):
+        self.titles: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._postings: Dict[str, array] = {}
+        self._gram_counts = array('H')
+        self._dead: Set[int] = set()
+        self._initials: Dict[str, array] = {}
+
+    @classmethod
+    def build(cls, titles: Iterable[str]) -> "TrigramIndex":
+        """Poora index ek saath banata hai (CPU bound, executor mein chalayein)."""
+        index = cls()
+        for title in titles:
+            index.add(title)
+        logger.info(f"Trigram index built: {len(index):,} titles, {len(index._postings):,} trigrams.")
+        return index
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, title: str):
+        if not title: return
+        tid = self._ids.get(title)
+        if tid is not None:
+            self._dead.discard(tid)
+            return
+        tid = len(self.titles)
+        grams = make_trigrams(title)
+        self.titles.append(title)
+        self._ids[title] = tid
+        self._gram_counts.append(min(len(grams), 0xFFFF))
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = array('I')
+            posting.append(tid)
+        # V7 Logic 6 sirf 3+ letter acronyms ko bonus deta hai, isliye 3+ words wale titles hi
+        initials = title_initials(title)
+        if len(initials) >= ACRONYM_MIN_LENGTH:
+            ids = self._initials.get(initials)
+            if ids is None:
+                ids = self._initials[sys.intern(initials)] = array('I')
+            ids.append(tid)
+
+    def discard(self, title: str):
+        tid = self._ids.pop(title, None)
+        if tid is not None:
+            self._dead.add(tid)
+
+    def acronym_candidates(self, query: str, limit: int = TRIGRAM_SHORTLIST_SIZE) -> List[str]:
+        """
+        Single-token query ko initials maan kar dict lookup ('kgf' -> 'k g f', 'kolar gold fields').
+        Multi-word ya chhoti queries ke liye empty list.
+        """
+        if " " in query or len(query) < ACRONYM_MIN_LENGTH: return []
+        ids = self._initials.get(query)
+        if not ids: return []
+        dead = self._dead
+        return [self.titles[tid] for tid in ids if tid not in dead][:limit]
+
+    def candidates(self, query: str, limit: int = TRIGRAM_SHORTLIST_SIZE, allowed: Set[str] | frozenset | None = None) -> List[str]:
+        """
+        Query se trigram overlap ke hisaab se top `limit` titles deta hai (Dice score), index order mein
+        (full scan jaisa: same WRatio/V7 score wale ties catalog order se tootte hain, Dice order se nahi).
+        `allowed` diya ho to sirf unhi titles mein se (e.g. year partition).
+        Empty list ka matlab hai koi overlap nahi mila (caller full scan kar sakta hai).
+        """
+        grams = make_trigrams(query)
+        postings = [self._postings[g] for g in grams if g in self._postings]
+        if not postings: return []
+        counts = count_trigram_overlaps(postings)
+
+        q_len = len(grams)
+        gram_counts = self._gram_counts
+        dead = self._dead
+        titles = self.titles
+        live = (tid for tid in counts if tid not in dead)
+        if allowed is not None:
+            live = (tid for tid in live if titles[tid] in allowed)
+        top = heapq.nlargest(
+            limit,
+            live,
+            key=lambda tid: (2 * counts[tid]) / (q_len + gram_counts[tid])
+        )
+        top.sort()
+        return [titles[tid] for tid in top]
+
+
+class TitleFeatures:
+    """
+    V7 scorer ke liye per-title precomputed data (load ke waqt ek baar banta hai).
+    Har query par regex/split/initials dobara nahi banane padte.
+    """
+    __slots__ = ("clean", "tight", "tokens", "token_set", "initials", "length")
+
+    def __init__(self, clean: str):
+        self.clean = clean
+        self.tokens = tuple(clean.split())
+        self.tight = "".join(self.tokens).lower()
+        self.token_set = frozenset(self.tokens)
+        self.initials = title_initials(clean)
+        self.length = len(self.tight)
+
+
+def build_title_features(titles: Iterable[str]) -> Dict[str, TitleFeatures]:
+    """Saare cache keys ke liye TitleFeatures map (CPU bound, executor mein chalayein)."""
+    return {title: TitleFeatures(title) for title in titles if title}
+
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index (inline mode type-ahead ke liye).
+    `_keys` sorted lookup keys hain aur `_titles` unke parallel asli cache keys;
+    'the ' se shuru hone wale titles bina 'the' ke bhi index hote hain ('dark kn' -> 'the dark knight').
+    Lookup bisect + chhota forward scan hai, rapidfuzz ka koi kaam nahi.
+    """
+    def __init__(self):
+        self._keys: List[str] = []
+        self._titles: List[str] = []
+
+    @staticmethod
+    def _lookup_keys(title: str) -> Tuple[str, ...]:
+        if title.startswith("the ") and len(title) > 4:
+            return (title, title[4:])
+        return (title,)
+
+    @classmethod
+    def build(cls, titles: Iterable[str]) -> "PrefixIndex":
+        """Poora index ek sort mein banata hai (CPU bound, executor mein chalayein)."""
+        index = cls()
+        pairs = sorted((key, title) for title in titles if title for key in cls._lookup_keys(title))
+        index._keys = [key for key, _ in pairs]
+        index._titles = [title for _, title in pairs]
+        return index
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, title: str):
+        if not title: return
+        keys, titles = self._keys, self._titles
+        for key in self._lookup_keys(title):
+            pos = bisect_left(keys, key)
+            end = pos
+            while end < len(keys) and keys[end] == key:
+                if titles[end] == title: break
+                end += 1
+            else:
+                keys.insert(pos, key)
+                titles.insert(pos, title)
+
+    def discard(self, title: str):
+        keys, titles = self._keys, self._titles
+        for key in self._lookup_keys(title):
+            pos = bisect_left(keys, key)
+            while pos < len(keys) and keys[pos] == key:
+                if titles[pos] == title:
+                    del keys[pos]
+                    del titles[pos]
+                    break
+                pos += 1
+
+    def search(self, prefix: str, limit: int = 20, scan: int = PREFIX_SCAN_MAX) -> List[str]:
+        """`prefix` se shuru hone wale titles; chhote (exact ke kareeb) titles pehle."""
+        if not prefix: return []
+        keys, titles = self._keys, self._titles
+        found: Dict[str, None] = {}
+        pos = bisect_left(keys, prefix)
+        end = min(len(keys), pos + scan)
+        while pos < end and keys[pos].startswith(prefix):
+            found[titles[pos]] = None
+            pos += 1
+        return sorted(found, key=lambda t: (len(t), t))[:limit]
+
+
+def _delete_variants(word: str, max_edit: int) -> Set[str]:
+    """`word` aur uske saare <= max_edit character-deletion variants (SymSpell)."""
+    variants = {word}
+    frontier = [word]
+    for _ in range(max_edit):
+        next_frontier = []
+        for w in frontier:
+            if len(w) <= 1: continue
+            for i in range(len(w)):
+                d = w[:i] + w[i + 1:]
+                if d not in variants:
+                    variants.add(d)
+                    next_frontier.append(d)
+        frontier = next_frontier
+    return variants
+
+
+def _variant_hash(variant: str) -> int:
+    # Process-independent hash (str hash har process mein alag hota hai; index pickle hokar pool workers tak jaata hai)
+    return zlib.crc32(variant.encode("utf-8"))
+
+
+class TokenCorrector:
+    """
+    SymSpell-style token spelling correction: catalog ke har title token ke deletion variants
+    ek sorted array('Q') mein (crc32(variant) << 32 | token id) ke roop mein rehte hain.
+    Query token ke variants bisect se lookup hote hain, candidates OSA distance se verify,
+    aur sabse kam distance (tie par zyada titles wala) token milta hai. Catalog size se lookup cost nahi badhti.
+    Jo token kisi dictionary token ka prefix hai (adhoora type kiya word) use correct nahi karte.
+    Build ke baad aaye tokens chhote `_extra` dict mein jaate hain (sorted array dobara nahi banta).
+    """
+    def __init__(self, max_edit: int = TOKEN_CORRECTION_MAX_EDIT, prefix_length: int = TOKEN_CORRECTION_PREFIX):
+        self.max_edit = max_edit
+        self.prefix_length = prefix_length
+        self._tokens: List[str] = []         # token id -> token
+        self._ids: Dict[str, int] = {}
+        self._freq = array('I')              # token id -> kitne live titles mein (0 = dead)
+        self._keys = array('Q')              # sorted (variant hash << 32 | token id)
+        self._extra: Dict[int, List[int]] = {}  # variant hash -> token ids (incremental adds)
+        self._sorted: List[str] = []         # sorted tokens (prefix check)
+
+    @classmethod
+    def build(cls, titles: Iterable[str]) -> "TokenCorrector":
+        """Poori dictionary ek sort mein (CPU bound, executor mein chalayein)."""
+        corrector = cls()
+        for title in titles:
+            if title: corrector._count(title, 1)
+        if corrector.max_edit > 0:
+            keys = set()
+            for tid, token in enumerate(corrector._tokens):
+                if len(token) < TOKEN_CORRECTION_MIN_LENGTH: continue
+                for variant in _delete_variants(token[:corrector.prefix_length], corrector.max_edit):
+                    keys.add((_variant_hash(variant) << 32) | tid)
+            corrector._keys = array('Q', sorted(keys))
+        corrector._sorted = sorted(corrector._tokens)
+        return corrector
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def __contains__(self, token: str) -> bool:
+        tid = self._ids.get(token)
+        return tid is not None and self._freq[tid] > 0
+
+    def _count(self, title: str, delta: int) -> List[int]:
+        """Title ke unique tokens ki frequency badalta hai. Returns: naye bane token ids."""
+        new_ids = []
+        for token in set(title.split()):
+            tid = self._ids.get(token)
+            if tid is None:
+                if delta < 0: continue
+                tid = self._ids[token] = len(self._tokens)
+                self._tokens.append(token)
+                self._freq.append(0)
+                new_ids.append(tid)
+            self._freq[tid] = max(0, self._freq[tid] + delta)
+        return new_ids
+
+    def add(self, title: str):
+        if not title: return
+        for tid in self._count(title, 1):
+            token = self._tokens[tid]
+            insort(self._sorted, token)
+            if self.max_edit <= 0 or len(token) < TOKEN_CORRECTION_MIN_LENGTH: continue
+            for variant in _delete_variants(token[:self.prefix_length], self.max_edit):
+                self._extra.setdefault(_variant_hash(variant), []).append(tid)
+
+    def discard(self, title: str):
+        if title: self._count(title, -1)
+
+    def _lookup(self, variant_hash: int) -> Iterator[int]:
+        keys = self._keys
+        lo = variant_hash << 32
+        pos = bisect_left(keys, lo)
+        while pos < len(keys) and (keys[pos] >> 32) == variant_hash:
+            yield keys[pos] & 0xFFFFFFFF
+            pos += 1
+        yield from self._extra.get(variant_hash, ())
+
+    def correct(self, token: str) -> str:
+        """Dictionary ka sabse kareeb token (max_edit ke andar). Known/chhota/koi match nahi = token jaisa tha."""
+        if self.max_edit <= 0 or len(token) < TOKEN_CORRECTION_MIN_LENGTH or not token.isalpha() or token in self:
+            return token
+        # Bina vowel ke tokens ('ddlj', 'znmd') acronyms hain, typo nahi: acronym index ke liye waise hi rehne do
+        if not any(v in token for v in "aeiouy"): return token
+        pos = bisect_left(self._sorted, token)
+        if pos < len(self._sorted) and self._sorted[pos].startswith(token): return token
+        budget = 1 if len(token) < 6 else self.max_edit
+        freq, tokens = self._freq, self._tokens
+        best, best_rank = token, None
+        seen: Set[int] = set()
+        for variant in _delete_variants(token[:self.prefix_length], budget):
+            for tid in self._lookup(_variant_hash(variant)):
+                if tid in seen or not freq[tid]: continue
+                seen.add(tid)
+                distance = OSA.distance(token, tokens[tid], score_cutoff=budget)
+                if distance > budget: continue
+                rank = (distance, -freq[tid], tokens[tid])
+                if best_rank is None or rank < best_rank:
+                    best, best_rank = tokens[tid], rank
+        return best
+
+    def correct_tokens(self, tokens: List[str]) -> List[str]:
+        return [self.correct(token) for token in tokens]
+
+
+class MovieRecord:
+    """
+    MovieCatalog ki ek movie ka lightweight view (access par banta hai, store nahi hota).
+    `record['title']` / `record.get('year')` dict jaisa access bhi deta hai, taaki engine code same rahe.
+    """
+    __slots__ = ("imdb_id", "title", "year", "clean_title")
+
+    def __init__(self, imdb_id: str, title: str, year: str | None, clean_title: str):
+        self.imdb_id = imdb_id
+        self.title = title
+        self.year = year
+        self.clean_title = clean_title
+
+    def __getitem__(self, name: str):
+        try: return getattr(self, name)
+        except AttributeError: raise KeyError(name) from None
+
+    def get(self, name: str, default=None):
+        return getattr(self, name, default)
+
+    def to_dict(self) -> Dict:
+        return {"imdb_id": self.imdb_id, "title": self.title, "year": self.year, "clean_title": self.clean_title}
+
+    def __repr__(self) -> str:
+        return f"MovieRecord({self.imdb_id!r}, {self.title!r}, {self.year!r})"
+
+
+class _CatalogState:
+    """MovieCatalog ke parallel arrays. Compaction naya state banakar ek hi reference swap karta hai."""
+    __slots__ = ("titles", "tids", "head", "m_imdb", "m_title", "m_year", "m_tid", "m_next", "year_slots", "imdb_slots", "dead_movies")
+
+    def __init__(self):
+        self.titles: List[str] = []          # tid -> clean_title (stable, dead titles compaction tak rehte hain)
+        self.tids: Dict[str, int] = {}       # live clean_title -> tid
+        self.head = array('i')               # tid -> pehla movie slot (-1 = khaali)
+        self.m_imdb: List[str | None] = []   # slot -> imdb_id (None = removed)
+        self.m_title: List[str | None] = []
+        self.m_year = array('H')             # slot -> MovieCatalog._years index
+        self.m_tid = array('I')              # slot -> tid
+        self.m_next = array('i')             # slot -> same title ka agla slot (-1 = end)
+        self.year_slots: Dict[int, array] = {}  # year index -> movie slots (year partition)
+        self.imdb_slots: Dict[str, int] = {}    # live imdb_id -> slot (reverse map: remove/update bina scan)
+        self.dead_movies = 0
+
+
+class MovieCatalog:
+    """
+    Compact in-memory catalog: clean_title -> movies, parallel arrays mein (per-movie dict nahi).
+    Purane `Dict[str, List[Dict]]` jaisa read API (in, get, [], len, keys, items) deta hai;
+    values MovieRecord tuples hain jo access par banti hain.
+    Dono taraf index: clean_title -> movies aur imdb_id -> slot, isliye add/remove/update catalog size
+    par depend nahi karte (sirf us title ki chhoti chain walk hoti hai).
+    `titles` ek stable sequence hai jo incrementally badhta hai, isliye full-scan fallback ko
+    har query par keys copy nahi karni padti (removed titles ka cache lookup khaali aata hai).
+    """
+    # Itne % movie slots dead ho jaayein to arrays compact karte hain
+    COMPACT_DEAD_RATIO = 0.25
+
+    def __init__(self):
+        self._s = _CatalogState()
+        # Year strings ki table (bahut repeat hoti hain): index 0 = None
+        self._years: List[str | None] = [None]
+        self._year_ids: Dict[str, int] = {}
+        # year_partition() results: (years) -> (generation, titles, title set). Har mutation generation badhata hai
+        self._generation = 0
+        self._partitions: Dict[Tuple[str, ...], tuple] = {}
+
+    @classmethod
+    def build(cls, movies: Iterable[Dict]) -> "MovieCatalog":
+        """Mongo/Redis movie dicts se catalog banata hai (CPU bound, executor mein chalayein)."""
+        catalog = cls()
+        for data in movies:
+            catalog.add(data)
+        return catalog
+
+    @property
+    def titles(self) -> List[str]:
+        return self._s.titles
+
+    def movie_count(self) -> int:
+        return len(self._s.m_imdb) - self._s.dead_movies
+
+    def entry(self, imdb_id: str) -> MovieRecord | None:
+        """imdb_id -> uska current record (None = catalog mein nahi)."""
+        s = self._s
+        slot = s.imdb_slots.get(imdb_id)
+        if slot is None: return None
+        return MovieRecord(s.m_imdb[slot], s.m_title[slot], self._years[s.m_year[slot]], s.titles[s.m_tid[slot]])
+
+    def key_of(self, imdb_id: str) -> str | None:
+        s = self._s
+        slot = s.imdb_slots.get(imdb_id)
+        return None if slot is None else s.titles[s.m_tid[slot]]
+
+    # --- Read API (dict compatible) ---
+    def __contains__(self, key: str) -> bool:
+        return key in self._s.tids
+
+    def get(self, key: str, default=None):
+        s = self._s
+        tid = s.tids.get(key)
+        if tid is None: return default
+        return self._records(s, tid)
+
+    def __getitem__(self, key: str) -> Tuple[MovieRecord, ...]:
+        records = self.get(key)
+        if records is None: raise KeyError(key)
+        return records
+
+    def __len__(self) -> int:
+        return len(self._s.tids)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._s.tids)
+
+    def keys(self):
+        return self._s.tids.keys()
+
+    def items(self):
+        s = self._s
+        for key, tid in list(s.tids.items()):
+            yield key, self._records(s, tid)
+
+    def values(self):
+        for _, records in self.items():
+            yield records
+
+    def year_partition(self, years: Iterable[str]) -> Tuple[List[str], frozenset]:
+        """
+        Diye gaye years ki movies wale live titles (+ bina year wali movies, unhe exclude karna galat hoga).
+        Catalog na badle tab tak result memoized rehta hai.
+        """
+        key = tuple(sorted(set(years)))
+        generation = self._generation
+        cached = self._partitions.get(key)
+        if cached is not None and cached[0] == generation:
+            return cached[1], cached[2]
+
+        s = self._s
+        year_ids = [0] + [self._year_ids[y] for y in key if y in self._year_ids]
+        seen: Dict[int, None] = {}
+        for yid in year_ids:
+            for slot in s.year_slots.get(yid, ()):
+                if s.m_imdb[slot] is not None:
+                    seen[s.m_tid[slot]] = None
+        titles = [s.titles[tid] for tid in seen]
+        title_set = frozenset(titles)
+        # Har partition badi ho sakti hai (1M catalog par ~75k titles): sirf kuch hi memoized
+        if len(self._partitions) >= 8: self._partitions.clear()
+        self._partitions[key] = (generation, titles, title_set)
+        return titles, title_set
+
+    def _records(self, s: _CatalogState, tid: int) -> Tuple[MovieRecord, ...]:
+        key = s.titles[tid]
+        years = self._years
+        out = []
+        slot = s.head[tid]
+        while slot != -1:
+            out.append(MovieRecord(s.m_imdb[slot], s.m_title[slot], years[s.m_year[slot]], key))
+            slot = s.m_next[slot]
+        return tuple(out)
+
+    # --- Mutations (event loop / FUZZY_CACHE_LOCK se) ---
+    def _year_id(self, year: str | None) -> int:
+        if not year: return 0
+        yid = self._year_ids.get(year)
+        if yid is None:
+            yid = self._year_ids[year] = len(self._years)
+            self._years.append(sys.intern(year))
+        return yid
+
+    def add(self, movie: Dict | MovieRecord) -> str:
+        """Movie ko uske clean_title key mein jodta hai (same imdb_id kahin bhi pehle se ho to replace). Returns key."""
+        return self.update(movie)[1]
+
+    def update(self, movie: Dict | MovieRecord) -> Tuple[str | None, str]:
+        """
+        Upsert: imdb_id pehle kisi aur title par tha to wahan se hat kar naye key par jaata hai.
+        Returns: (old_key, new_key). old_key None = nayi movie; old_key != new_key aur `old_key not in catalog`
+        ho to caller us key ke derived indexes (trigram/prefix) bhi hataye.
+        """
+        key = movie['clean_title']
+        if not key: return None, key
+        imdb_id = movie['imdb_id']
+        self._generation += 1
+        s = self._s
+        old_key = None
+        old_slot = s.imdb_slots.get(imdb_id)
+        if old_slot is not None:
+            old_tid = s.m_tid[old_slot]
+            old_key = s.titles[old_tid]
+            self._unlink(s, old_tid, {imdb_id})
+            if old_key != key and s.head[old_tid] == -1:
+                s.tids.pop(old_key, None)
+        tid = s.tids.get(key)
+        if tid is None:
+            tid = s.tids[key] = len(s.titles)
+            s.titles.append(key)
+            s.head.append(-1)
+
+        slot = len(s.m_imdb)
+        s.imdb_slots[imdb_id] = slot
+        s.m_imdb.append(imdb_id)
+        s.m_title.append(movie.get('title', "N/A"))
+        yid = self._year_id(movie.get('year'))
+        s.m_year.append(yid)
+        year_slots = s.year_slots.get(yid)
+        if year_slots is None:
+            year_slots = s.year_slots[yid] = array('I')
+        year_slots.append(slot)
+        s.m_tid.append(tid)
+        s.m_next.append(-1)
+        # Chain ke end mein jodein (insertion order same rahe)
+        prev = s.head[tid]
+        if prev == -1:
+            s.head[tid] = slot
+        else:
+            while s.m_next[prev] != -1: prev = s.m_next[prev]
+            s.m_next[prev] = slot
+        if old_key is not None and old_key != key: self._maybe_compact()
+        return old_key, key
+
+    def _unlink(self, s: _CatalogState, tid: int, imdb_ids: Set[str] | None = None):
+        """Title chain se `imdb_ids` wali movies (None = saari) hatata hai."""
+        self._generation += 1
+        prev, slot = -1, s.head[tid]
+        while slot != -1:
+            nxt = s.m_next[slot]
+            if imdb_ids is None or s.m_imdb[slot] in imdb_ids:
+                if prev == -1: s.head[tid] = nxt
+                else: s.m_next[prev] = nxt
+                if s.imdb_slots.get(s.m_imdb[slot]) == slot: del s.imdb_slots[s.m_imdb[slot]]
+                s.m_imdb[slot] = s.m_title[slot] = None
+                s.dead_movies += 1
+            else:
+                prev = slot
+            slot = nxt
+
+    def discard(self, key: str):
+        s = self._s
+        tid = s.tids.pop(key, None)
+        if tid is None: return
+        self._unlink(s, tid)
+        self._maybe_compact()
+
+    def remove(self, imdb_id: str) -> str | None:
+        """Ek movie hatata hai. Returns: uska key (None = thi hi nahi). Key ki aakhri movie thi to key bhi hat jaati hai."""
+        key = self._remove(imdb_id)
+        if key is not None: self._maybe_compact()
+        return key
+
+    def _remove(self, imdb_id: str) -> str | None:
+        s = self._s
+        slot = s.imdb_slots.get(imdb_id)
+        if slot is None: return None
+        tid = s.m_tid[slot]
+        key = s.titles[tid]
+        self._unlink(s, tid, {imdb_id})
+        if s.head[tid] == -1:
+            s.tids.pop(key, None)
+        return key
+
+    def remove_imdb_ids(self, imdb_ids: Set[str]) -> List[str]:
+        """Diye gaye imdb_ids hatata hai. Returns: affected keys (jinki movies badli ya key hi hat gayi)."""
+        if not imdb_ids: return []
+        affected = {key for key in map(self._remove, imdb_ids) if key is not None}
+        self._maybe_compact()
+        return list(affected)
+
+    def _maybe_compact(self):
+        s = self._s
+        dead_titles = len(s.titles) - len(s.tids)
+        if s.dead_movies < 1000 and dead_titles < 1000: return
+        if s.dead_movies < len(s.m_imdb) * self.COMPACT_DEAD_RATIO and dead_titles < len(s.titles) * self.COMPACT_DEAD_RATIO:
+            return
+        # Naya state banakar swap: chal rahi searches purana state hi dekhti rehti hain
+        live = [record for _, records in self.items() for record in records]
+        fresh = MovieCatalog()
+        fresh._years, fresh._year_ids = self._years, self._year_ids
+        for record in live:
+            fresh.add(record)
+        self._s = fresh._s
+        self._generation += 1
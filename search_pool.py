@@ -0,0 +1,352 @@
+# search_pool.py
+import os
+import asyncio
+import logging
+import itertools
+import threading
+import multiprocessing as mp
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger("bot.search_pool")
+
+# 0 = disabled (searches shared ThreadPoolExecutor mein chalte hain). Multi-core VM par cores ke barabar rakhein.
+SEARCH_PROCESS_WORKERS = int(os.getenv("SEARCH_PROCESS_WORKERS", "0"))
+SEARCH_PROCESS_TIMEOUT = int(os.getenv("SEARCH_PROCESS_TIMEOUT", "5"))
+# Crash hue worker ki jagah itni baar naya process; uske baad slot band (baaki workers / in-process fallback)
+SEARCH_PROCESS_MAX_RESPAWNS = int(os.getenv("SEARCH_PROCESS_MAX_RESPAWNS", "3"))
+
+
+def _worker_main(conn):
+    """
+    Worker process entrypoint. Apni khud ki index copy rakhta hai aur Pipe par commands sunta hai:
+    ("load", cache) | ("add", key, movie) | ("remove", key) | ("search", req_id, queries, limit) | ("stop",)
+    Load na ho paye (unpickle/attach error) to ("load_failed", error) bhejta hai aur purane index par zinda rehta hai.
+    """
+    # Heavy imports sirf child mein (spawn), bot.py import nahi hota
+    from search_index import TrigramIndex, TitleFeatures, MovieCatalog, TokenCorrector, build_title_features
+    from search_engine import fuzzy_search_batch
+
+    cache = MovieCatalog()
+    trigram_index = TrigramIndex()
+    title_features: Dict = {}
+    corrector = TokenCorrector()
+
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            break
+        except Exception as e:
+            # Frame poora padha ja chuka hai, sirf unpickle fail (e.g. SharedCatalog ki file kisi aur process ne replace kar di)
+            logger.error(f"Search worker: message unpickle nahi hua: {e}")
+            conn.send(("load_failed", str(e)))
+            continue
+        op = msg[0]
+        try:
+            if op == "search":
+                _, req_id, queries, limit = msg
+                conn.send(("result", req_id, fuzzy_search_batch(queries, limit, cache, trigram_index, title_features, corrector)))
+            elif op == "load":
+                # Pehle sab naya banao, phir ek saath swap (beech mein error aaye to purana index salamat)
+                new_cache = msg[1]
+                if hasattr(new_cache, "make_trigram_index"):
+                    # Shared index: same mmap file attach hoti hai, features bounded cache mein
+                    new_trigram, new_features = new_cache.make_trigram_index(), new_cache.make_title_features()
+                else:
+                    keys = list(new_cache.keys())
+                    new_trigram, new_features = TrigramIndex.build(keys), build_title_features(keys)
+                new_corrector = TokenCorrector.build(new_cache.keys())
+                cache, trigram_index, title_features, corrector = new_cache, new_trigram, new_features, new_corrector
+                conn.send(("loaded", len(cache)))
+            elif op == "add":
+                _, key, movie = msg
+                if key not in cache: corrector.add(key)
+                cache.add(movie)
+                trigram_index.add(key)
+                title_features[key] = TitleFeatures(key)
+            elif op == "remove":
+                key = msg[1]
+                if key in cache: corrector.discard(key)
+                cache.discard(key)
+                trigram_index.discard(key)
+                title_features.pop(key, None)
+            elif op == "stop":
+                break
+        except Exception as e:
+            logger.error(f"Search worker error ({op}): {e}", exc_info=True)
+            if op == "search":
+                conn.send(("result", msg[1], None))
+            elif op == "load":
+                conn.send(("load_failed", str(e)))
+    conn.close()
+
+
+def _is_stale(cache: Any) -> bool:
+    """SharedCatalog jiski file disk par replace ho chuki (worker usse attach nahi kar sakta)."""
+    return cache is not None and hasattr(cache, "is_current") and not cache.is_current()
+
+
+class _Worker:
+    __slots__ = ("idx", "process", "conn", "ready", "pending", "send_lock", "loading", "backlog", "dead", "respawns", "loaded_from")
+
+    def __init__(self, idx: int, process, conn, respawns: int = 0):
+        self.idx = idx
+        self.process = process
+        self.conn = conn
+        self.ready = False  # Index load hone tak searches nahi bheje jaate
+        self.pending: Dict[int, asyncio.Future] = {}
+        # Connection thread-safe nahi: har write (executor ka load ya loop ke add/remove/search) isi lock ke andar
+        self.send_lock = threading.Lock()
+        # Load chal rahe hon (count) to add/remove backlog mein, load bhejne ke baad replay
+        self.loading = 0
+        self.backlog: List[tuple] = []
+        self.dead = False
+        self.respawns = respawns
+        self.loaded_from: Any = None  # Aakhri bheja gaya catalog (load_failed par stale check)
+
+
+class SearchProcessPool:
+    """
+    Optional process-pool search backend (GIL bypass).
+    Har worker process ke paas title index ki apni copy hoti hai; catalog change par
+    load/add/remove broadcast hota hai. Results Pipe par aate hain aur event loop
+    `add_reader` se unhe pick karta hai (koi extra thread nahi).
+    """
+    def __init__(self, num_workers: int = SEARCH_PROCESS_WORKERS):
+        self.num_workers = num_workers
+        self._workers: List[_Worker] = []
+        self._req_ids = itertools.count(1)
+        self._rr = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ctx = None
+        self._cache: Any = None  # Aakhri load kiya catalog (respawn hue worker ko yahi milta hai)
+        # Bot deta hai: current generation ka catalog. Shared file replace ho chuki ho to khud nayi generation attach
+        # karke sab workers ko load bhejta hai aur None lautata hai
+        self.cache_provider: Optional[Callable[[], Awaitable[Any]]] = None
+        self._load_lock: Optional[asyncio.Lock] = None
+        self._stopping = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.num_workers > 0
+
+    def is_ready(self) -> bool:
+        return any(self._usable(w) for w in self._workers)
+
+    @property
+    def degraded(self) -> bool:
+        """Koi slot permanently band (respawn limit khatam): searches in-process fallback par jaa sakti hain."""
+        return any(w.dead and w.respawns >= SEARCH_PROCESS_MAX_RESPAWNS for w in self._workers)
+
+    @staticmethod
+    def _usable(worker: _Worker) -> bool:
+        # Load pipe mein likha ja raha ho to search nahi (executor thread ke write se takkar)
+        return worker.ready and not worker.loading and not worker.dead
+
+    def start(self):
+        if not self.enabled or self._workers: return
+        self._loop = asyncio.get_running_loop()
+        self._load_lock = asyncio.Lock()
+        # spawn: fork ke saath uvloop/threads ka state copy hona risky hai
+        self._ctx = mp.get_context("spawn")
+        for i in range(self.num_workers):
+            self._workers.append(self._spawn(i))
+        logger.info(f"Search process pool started with {self.num_workers} workers.")
+
+    def _spawn(self, idx: int, respawns: int = 0) -> _Worker:
+        parent_conn, child_conn = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_worker_main, args=(child_conn,), name=f"SearchWorker-{idx}", daemon=True)
+        proc.start()
+        child_conn.close()
+        worker = _Worker(idx, proc, parent_conn, respawns)
+        self._loop.add_reader(parent_conn.fileno(), self._on_readable, worker)
+        return worker
+
+    def _on_readable(self, worker: _Worker):
+        try:
+            while worker.conn.poll():
+                msg = worker.conn.recv()
+                if msg[0] == "result":
+                    fut = worker.pending.pop(msg[1], None)
+                    if fut and not fut.done(): fut.set_result(msg[2])
+                elif msg[0] == "loaded":
+                    worker.ready = True
+                    logger.info(f"SearchWorker-{worker.idx}: index loaded ({msg[1]:,} titles).")
+                elif msg[0] == "load_failed":
+                    logger.error(f"SearchWorker-{worker.idx}: index load fail: {msg[1]}")
+                    # Stale shared catalog tha aur usse naya load abhi nahi gaya: current generation dobara. Warna slot
+                    # not-ready rehta hai (same payload dobara bhejna wahi error deta)
+                    sent = worker.loaded_from
+                    if sent is self._cache and _is_stale(sent):
+                        worker.loading += 1
+                        asyncio.create_task(self._reload(worker))
+        except (EOFError, OSError) as e:
+            logger.error(f"SearchWorker-{worker.idx} died: {e}")
+            self._mark_dead(worker)
+
+    def _mark_dead(self, worker: _Worker):
+        """Sirf loop thread se. Pending searches None (fallback) aur slot ka respawn schedule."""
+        if worker.dead: return
+        worker.dead = True
+        worker.ready = False
+        worker.backlog.clear()
+        try: self._loop.remove_reader(worker.conn.fileno())
+        except Exception: pass
+        for fut in worker.pending.values():
+            if not fut.done(): fut.set_result(None)
+        worker.pending.clear()
+        if self._stopping: return
+        if worker.respawns < SEARCH_PROCESS_MAX_RESPAWNS:
+            self._loop.call_soon(self._respawn, worker)
+        else:
+            logger.error(f"SearchWorker-{worker.idx} respawn limit ({SEARCH_PROCESS_MAX_RESPAWNS}) khatam. Pool degraded.")
+
+    def _respawn(self, old: _Worker):
+        if self._stopping or self._workers[old.idx] is not old: return
+        if old.process.is_alive(): old.process.terminate()
+        old.process.join(timeout=1)
+        try: old.conn.close()
+        except Exception: pass
+        worker = self._spawn(old.idx, old.respawns + 1)
+        self._workers[old.idx] = worker
+        logger.warning(f"SearchWorker-{old.idx} respawn hua ({worker.respawns}/{SEARCH_PROCESS_MAX_RESPAWNS}).")
+        if self._cache is not None:
+            worker.loading += 1
+            asyncio.create_task(self._reload(worker))
+
+    async def _reload(self, worker: _Worker):
+        """Ek worker ko current catalog (caller ne `loading` badha diya hai). Stale shared catalog kabhi replay nahi hota."""
+        try:
+            cache = self._cache
+            if _is_stale(cache):
+                cache = await self.cache_provider() if self.cache_provider else None
+                if _is_stale(cache):
+                    logger.error(f"SearchWorker-{worker.idx}: current generation bhi stale hai, load skip.")
+                    cache = None
+                elif cache is not None:
+                    self._cache = cache
+        except Exception as e:
+            logger.error(f"SearchWorker-{worker.idx}: current generation nahi mili: {e}")
+            cache = None
+        if cache is None:
+            # Provider ne nayi generation ka load sabko bhej diya (ya kuch nahi mila): yeh hold chhodo
+            self._finish_loading(worker)
+            return
+        await self._load_workers([worker], cache)
+
+    def _write(self, worker: _Worker, msg: tuple):
+        """Pipe par ek frame (kisi bhi thread se). Pickle pehle poora banta hai, isliye pickle error par kuch nahi likha jaata."""
+        with worker.send_lock:
+            worker.conn.send(msg)
+
+    def _send(self, worker: _Worker, msg: tuple) -> bool:
+        """Loop thread se send; fail par worker dead."""
+        if worker.dead: return False
+        try:
+            self._write(worker, msg)
+            return True
+        except (OSError, ValueError) as e:
+            logger.error(f"SearchWorker-{worker.idx} send failed: {e}")
+            self._mark_dead(worker)
+            return False
+
+    def _send_delta(self, worker: _Worker, msg: tuple):
+        if worker.dead: return
+        if worker.loading:
+            worker.backlog.append(msg)
+        else:
+            self._send(worker, msg)
+
+    async def load(self, cache: Any):
+        """Poora index har worker ko bhejta hai. Bada payload hai isliye send executor thread mein."""
+        if not self._workers: return
+        if _is_stale(cache) and self.cache_provider:
+            # Publish aur send ke beech shared file replace ho gayi: provider current generation attach karke khud load bhejta hai
+            cache = await self.cache_provider()
+            if cache is None or cache is self._cache or _is_stale(cache): return
+        self._cache = cache
+        workers = [w for w in self._workers if not w.dead]
+        # Abhi se (lock ke intezaar mein bhi) deltas backlog mein: snapshot ke baad ke changes load ke baad replay
+        for worker in workers:
+            worker.loading += 1
+        await self._load_workers(workers, cache)
+
+    async def _load_workers(self, workers: List[_Worker], cache: Any):
+        """Har worker ka `loading` caller badha chuka hota hai. Loads ek-ek karke (purana load naye ke baad na pahunche)."""
+        loop = asyncio.get_running_loop()
+        async with self._load_lock:
+            for worker in workers:
+                try:
+                    if worker.dead: continue
+                    worker.ready = False
+                    worker.loaded_from = cache
+                    error = None
+                    for _ in range(3):
+                        try:
+                            await loop.run_in_executor(None, self._write, worker, ("load", cache))
+                            error = None
+                            break
+                        except RuntimeError as e:
+                            # Pickle ke dauran catalog loop thread par badla: kuch likha nahi gaya, dobara try
+                            error = e
+                        except (OSError, ValueError) as e:
+                            error = e
+                            break
+                    if error is not None:
+                        logger.error(f"SearchWorker-{worker.idx} load send failed: {error}")
+                        self._mark_dead(worker)
+                finally:
+                    self._finish_loading(worker)
+
+    def _finish_loading(self, worker: _Worker):
+        worker.loading -= 1
+        if not worker.loading and not worker.dead:
+            # Load pipe mein pahunch gaya: beech ke add/remove usi order mein uske baad
+            backlog, worker.backlog = worker.backlog, []
+            for msg in backlog:
+                if not self._send(worker, msg): break
+
+    def add(self, key: str, movie: Dict):
+        for worker in self._workers:
+            self._send_delta(worker, ("add", key, movie))
+
+    def remove(self, key: str):
+        for worker in self._workers:
+            self._send_delta(worker, ("remove", key))
+
+    async def search(self, query: str, limit: int = 100) -> Optional[List[Dict]]:
+        """Ready worker par search. None ka matlab: caller in-process fallback use kare."""
+        ready = [w for w in self._workers if self._usable(w)]
+        if not ready: return None
+        worker = ready[next(self._rr) % len(ready)]
+        req_id = next(self._req_ids)
+        fut = asyncio.get_running_loop().create_future()
+        worker.pending[req_id] = fut
+        if not self._send(worker, ("search", req_id, [query], limit)):
+            return None
+        try:
+            results = await asyncio.wait_for(fut, timeout=SEARCH_PROCESS_TIMEOUT)
+        except asyncio.TimeoutError:
+            worker.pending.pop(req_id, None)
+            logger.warning(f"SearchWorker-{worker.idx} timeout for '{query}'.")
+            return None
+        return results[0] if results else None
+
+    def stop(self):
+        self._stopping = True
+        for worker in self._workers:
+            try: self._loop.remove_reader(worker.conn.fileno())
+            except Exception: pass
+            if worker.process.is_alive():
+                try: worker.conn.send(("stop",))
+                except Exception: pass
+                worker.process.join(timeout=2)
+                if worker.process.is_alive(): worker.process.terminate()
+            worker.conn.close()
+        if self._workers:
+            logger.info("Search process pool band ho gaya.")
+        self._workers.clear()
+
+
+# Global Pool Instance
+search_pool = SearchProcessPool()
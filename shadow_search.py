@@ -0,0 +1,201 @@
+# shadow_search.py
+# Shadow mode: live queries ka ek sampled hissa candidate engine par bhi chalta hai (hot path ke bahar),
+# production engine ke saath latency / CPU / top-5 overlap compare hota hai aur metrics Mongo mein jaate hain.
+import os
+import time
+import random
+import asyncio
+import logging
+import concurrent.futures
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from search_engine import fuzzy_search, tfidf_search
+from tfidf_index import NUMPY_AVAILABLE, TFIDF_SEARCH_ENABLED
+
+logger = logging.getLogger("bot.shadow_search")
+
+# Candidate engine ka naam (SHADOW_ENGINES mein se); khaali = shadow mode off
+SHADOW_SEARCH_ENGINE = os.getenv("SHADOW_SEARCH_ENGINE", "").strip().lower()
+# Live searches ka itna fraction shadow mein bhi chalta hai
+SHADOW_SEARCH_SAMPLE_RATE = float(os.getenv("SHADOW_SEARCH_SAMPLE_RATE", "0.05"))
+# Itne comparisons pehle se chal rahe hon to naya sample drop (live traffic par load bounded)
+SHADOW_SEARCH_MAX_INFLIGHT = int(os.getenv("SHADOW_SEARCH_MAX_INFLIGHT", "2"))
+# Itne samples jama hone par metrics collection mein ek insert_many
+SHADOW_SEARCH_FLUSH_SIZE = int(os.getenv("SHADOW_SEARCH_FLUSH_SIZE", "50"))
+
+SHADOW_TOP_K = 5
+
+
+# --- Candidate engines ---
+# Signature: (query, limit, catalog, trigram_index, title_features, corrector, tfidf_index) -> ranked hits
+def _production(query, limit, catalog, trigram_index, features, corrector, tfidf_index=None):
+    # bot.python_fuzzy_search jaisa switch: live engine TF-IDF ho to wahi production hai
+    if TFIDF_SEARCH_ENABLED and tfidf_index is not None:
+        return tfidf_search(query, limit, catalog, tfidf_index, features, corrector)
+    return fuzzy_search(query, limit, catalog, trigram_index, features, corrector)
+
+SHADOW_ENGINES: Dict[str, Callable[..., List[Dict]]] = {
+    "scalar": lambda q, n, cat, tri, feat, cor, tf: fuzzy_search(q, n, cat, tri, feat, cor, vectorized=False),
+    "batch": lambda q, n, cat, tri, feat, cor, tf: fuzzy_search(q, n, cat, tri, feat, cor, vectorized=True),
+    "fullscan": lambda q, n, cat, tri, feat, cor, tf: fuzzy_search(q, n, cat, None, feat, cor),  # Trigram shortlist ke bina
+    "nocorrect": lambda q, n, cat, tri, feat, cor, tf: fuzzy_search(q, n, cat, tri, feat, None),  # Typo correction ke bina
+}
+if NUMPY_AVAILABLE:
+    # TF-IDF trigram cosine shortlist (tfidf_index.py); matrix bot tabhi banata hai jab yeh candidate ho
+    SHADOW_ENGINES["tfidf"] = lambda q, n, cat, tri, feat, cor, tf: tfidf_search(q, n, cat, tf, feat, cor)
+
+
+def _timed(fn: Callable[[], List[Dict]]) -> tuple[List[Dict], float, float]:
+    """(result, wall ms, CPU ms). CPU = is thread ka time (cdist ke extra worker threads count nahi hote)."""
+    wall, cpu = time.perf_counter(), time.thread_time()
+    result = fn()
+    return result, (time.perf_counter() - wall) * 1000, (time.thread_time() - cpu) * 1000
+
+
+def _top_ids(hits: List[Dict]) -> List[str]:
+    ids: List[str] = []
+    for hit in hits:
+        if hit['imdb_id'] not in ids: ids.append(hit['imdb_id'])
+        if len(ids) == SHADOW_TOP_K: break
+    return ids
+
+
+def compare_engines(engine: str, query: str, limit: int, catalog, trigram_index, features, corrector, tfidf_index=None) -> Dict[str, Any]:
+    """Same snapshot par production aur candidate dono chalate hain (same thread, isliye timings comparable)."""
+    candidate = SHADOW_ENGINES[engine]
+    if engine == "tfidf" and tfidf_index is None:
+        raise ValueError("TF-IDF index abhi bana nahi")
+    prod_hits, prod_ms, prod_cpu = _timed(lambda: _production(query, limit, catalog, trigram_index, features, corrector, tfidf_index))
+    cand_hits, cand_ms, cand_cpu = _timed(lambda: candidate(query, limit, catalog, trigram_index, features, corrector, tfidf_index))
+    prod_top, cand_top = _top_ids(prod_hits), _top_ids(cand_hits)
+    return {
+        "engine": engine,
+        "query": query,
+        "ts": datetime.now(timezone.utc),
+        "prod_ms": round(prod_ms, 3), "cand_ms": round(cand_ms, 3),
+        "prod_cpu_ms": round(prod_cpu, 3), "cand_cpu_ms": round(cand_cpu, 3),
+        "prod_hits": len(prod_hits), "cand_hits": len(cand_hits),
+        # Top-5 overlap production ke top-5 ke hisaab se (dono khaali = 1.0, dono ne same "kuch nahi" diya)
+        "overlap5": len(set(prod_top) & set(cand_top)) / len(prod_top) if prod_top else (1.0 if not cand_top else 0.0),
+        "top1_match": (prod_top[:1] == cand_top[:1]),
+    }
+
+
+class ShadowEvaluator:
+    """
+    Sampled shadow comparisons. submit() hot path par sirf ek random() + create_task hai; asal kaam
+    apne single-thread executor mein hota hai taaki live searches wale executor se takkar na ho.
+    Samples buffer hote hain aur `sink` (Database.add_shadow_samples) mein batch mein likhe jaate hain.
+    """
+    def __init__(self, engine: str = SHADOW_SEARCH_ENGINE, sample_rate: float = SHADOW_SEARCH_SAMPLE_RATE,
+                 max_inflight: int = SHADOW_SEARCH_MAX_INFLIGHT, flush_size: int = SHADOW_SEARCH_FLUSH_SIZE):
+        if engine and engine not in SHADOW_ENGINES:
+            logger.warning(f"Shadow engine '{engine}' nahi mila (options: {', '.join(SHADOW_ENGINES)}). Shadow mode off.")
+            engine = ""
+        self.engine = engine
+        self.sample_rate = sample_rate
+        self.max_inflight = max_inflight
+        self.flush_size = flush_size
+        self.sink: Optional[Callable[[List[Dict]], Awaitable[Any]]] = None
+        self._buffer: List[Dict] = []
+        self._inflight = 0
+        self._executor: concurrent.futures.ThreadPoolExecutor | None = None
+        self.submitted = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def enabled(self) -> bool:
+        return bool(self.engine) and self.sample_rate > 0
+
+    def submit(self, query: str, snapshot: tuple, sink: Callable[[List[Dict]], Awaitable[Any]] | None = None) -> bool:
+        """snapshot = (catalog, trigram_index, title_features, corrector, tfidf_index). True = sample schedule hua."""
+        if not self.enabled() or not query or random.random() >= self.sample_rate: return False
+        if self._inflight >= self.max_inflight:
+            self.dropped += 1
+            return False
+        if sink is not None: self.sink = sink
+        self._inflight += 1
+        self.submitted += 1
+        asyncio.create_task(self._run(query, snapshot))
+        return True
+
+    async def _run(self, query: str, snapshot: tuple):
+        try:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+            loop = asyncio.get_running_loop()
+            sample = await loop.run_in_executor(self._executor, compare_engines, self.engine, query, 100, *snapshot)
+            self._buffer.append(sample)
+            if len(self._buffer) >= self.flush_size:
+                await self.flush()
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Shadow search fail ({self.engine}, '{query}'): {e}")
+        finally:
+            self._inflight -= 1
+
+    async def flush(self) -> int:
+        """Buffered samples sink mein. Sink na ho / fail ho to samples chhod dete hain (metrics best-effort hain)."""
+        samples, self._buffer = self._buffer, []
+        if not samples or self.sink is None: return 0
+        try:
+            await self.sink(samples)
+            return len(samples)
+        except Exception as e:
+            logger.warning(f"Shadow metrics write fail ({len(samples)} samples): {e}")
+            return 0
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"engine": self.engine or None, "sample_rate": self.sample_rate, "submitted": self.submitted,
+                "dropped": self.dropped, "failed": self.failed, "inflight": self._inflight, "buffered": len(self._buffer)}
+
+
+# --- Report ---
+def _percentile(values: List[float], pct: float) -> float:
+    if not values: return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summarize_shadow_samples(samples: List[Dict]) -> Dict[str, Dict[str, float]]:
+    """Engine-wise summary: latency p50/p95, avg CPU, top-5 overlap, top-1 agreement."""
+    by_engine: Dict[str, List[Dict]] = {}
+    for sample in samples:
+        by_engine.setdefault(sample.get("engine") or "?", []).append(sample)
+    summary = {}
+    for engine, rows in by_engine.items():
+        n = len(rows)
+        prod_ms = [r["prod_ms"] for r in rows]
+        cand_ms = [r["cand_ms"] for r in rows]
+        prod_cpu = sum(r.get("prod_cpu_ms", 0) for r in rows) / n
+        cand_cpu = sum(r.get("cand_cpu_ms", 0) for r in rows) / n
+        summary[engine] = {
+            "samples": n,
+            "prod_p50_ms": _percentile(prod_ms, 50), "prod_p95_ms": _percentile(prod_ms, 95),
+            "cand_p50_ms": _percentile(cand_ms, 50), "cand_p95_ms": _percentile(cand_ms, 95),
+            "prod_cpu_ms": prod_cpu, "cand_cpu_ms": cand_cpu,
+            "overlap5": sum(r.get("overlap5", 0) for r in rows) / n,
+            "top1_match": sum(1 for r in rows if r.get("top1_match")) / n,
+        }
+    return summary
+
+
+def format_shadow_report(summary: Dict[str, Dict[str, float]], hours: int) -> str:
+    if not summary: return f"🕶️ **Shadow Report** ({hours}h)\nAbhi koi sample nahi hai."
+    lines = [f"🕶️ **Shadow Report** ({hours}h)"]
+    for engine, s in sorted(summary.items()):
+        speedup = s["prod_p50_ms"] / s["cand_p50_ms"] if s["cand_p50_ms"] else 0.0
+        lines.append(
+            f"\n⚙️ **{engine}** vs production — {s['samples']:,} samples\n"
+            f"⏱ p50 {s['prod_p50_ms']:.1f} → {s['cand_p50_ms']:.1f} ms ({speedup:.2f}x), "
+            f"p95 {s['prod_p95_ms']:.1f} → {s['cand_p95_ms']:.1f} ms\n"
+            f"🧮 CPU {s['prod_cpu_ms']:.1f} → {s['cand_cpu_ms']:.1f} ms/query\n"
+            f"🎯 Top-5 overlap {s['overlap5']:.0%}, top-1 same {s['top1_match']:.0%}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,715 @@
+# shared_index.py
+"""
+Shared-memory title index (gunicorn/uvicorn multi-worker ke liye).
+
+Ek loader worker catalog ko flat binary file mein likhta hai (default /dev/shm, yaani RAM wala tmpfs);
+baaki sab workers use read-only mmap karte hain, isliye index RAM mein sirf ek baar rehta hai.
+File mein koi Python object nahi: strings ek blob + offsets mein, postings/ids plain uint arrays mein.
+Titles sorted hain, isliye key lookup aur prefix search seedha binary search hai (hash map ki copy nahi).
+
+Worker ke apne changes (auto-index, delta refresh) ek chhote overlay mein jaate hain: naye/badle titles
+ek local MovieCatalog mein, aur base ke purane titles `hidden` tids se chhup jaate hain.
+"""
+import os
+import time
+import mmap
+import heapq
+import pickle
+import struct
+import logging
+import tempfile
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    fcntl = None
+    FCNTL_AVAILABLE = False
+
+from search_index import (
+    MovieCatalog, MovieRecord, TrigramIndex, PrefixIndex, TitleFeatures, make_trigrams, title_initials,
+    count_trigram_overlaps, ACRONYM_MIN_LENGTH, TRIGRAM_SHORTLIST_SIZE, PREFIX_SCAN_MAX,
+)
+
+logger = logging.getLogger("bot.shared_index")
+
+_SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+# Multi-worker deploy (gunicorn -w N) par True karein. Single process mein koi fayda nahi.
+SHARED_INDEX_ENABLED = os.getenv("SHARED_INDEX_ENABLED", "False").lower() == 'true' and FCNTL_AVAILABLE
+SHARED_INDEX_PATH = os.getenv("SHARED_INDEX_PATH", os.path.join(_SHM_DIR, "moviebot_search_index.shared"))
+# Isse purani file par naya worker attach nahi karta, khud rebuild karta hai (seconds)
+SHARED_INDEX_MAX_AGE = int(os.getenv("SHARED_INDEX_MAX_AGE", "1800"))
+# Shared mode mein har process sirf itne scored titles ke TitleFeatures yaad rakhta hai (poora map nahi)
+SHARED_FEATURES_CACHE_SIZE = int(os.getenv("SHARED_FEATURES_CACHE_SIZE", "50000"))
+
+SHARED_MAGIC = b"MBSHIDX1"
+SHARED_FORMAT_VERSION = 1
+_LEN = struct.Struct("<I")
+_GRAM_WIDTH = 12  # 3 code points, UTF-32-LE (fixed width: binary search bina offsets ke)
+_ALIGN = 8
+# Har itne sorted titles par ek fence key process memory mein (binary search ke Python steps kam)
+_FENCE_STEP = 64
+
+
+def _encode_gram(gram: str) -> bytes:
+    return gram.encode("utf-32-le")
+
+
+def _string_table(strings: Sequence[str]) -> Tuple[array, bytes]:
+    offsets = array('Q', [0])
+    parts = []
+    total = 0
+    for s in strings:
+        b = s.encode("utf-8")
+        parts.append(b)
+        total += len(b)
+        offsets.append(total)
+    return offsets, b"".join(parts)
+
+
+def export_shared_index(catalog: MovieCatalog, path: str = SHARED_INDEX_PATH, watermark=None) -> int:
+    """
+    MovieCatalog se flat shared index file banata hai (atomic rename). CPU bound: executor mein chalayein.
+    Purani file jin workers ne mmap ki hai woh unke paas valid rehti hai (unlinked inode).
+    Returns: bytes written.
+    """
+    titles = sorted(catalog.keys())  # str order == utf-8 byte order (binary search bytes par hota hai)
+    years: List[Optional[str]] = [None]
+    year_ids: Dict[str, int] = {}
+    m_imdb, m_title, m_year, m_tid = [], [], array('H'), array('I')
+    movie_start = array('Q', [0])
+    for tid, key in enumerate(titles):
+        for record in catalog[key]:
+            year = record.get('year')
+            yid = 0
+            if year:
+                yid = year_ids.get(year)
+                if yid is None:
+                    yid = year_ids[year] = len(years)
+                    years.append(year)
+            m_imdb.append(record['imdb_id'])
+            m_title.append(record.get('title') or "N/A")
+            m_year.append(yid)
+            m_tid.append(tid)
+        movie_start.append(len(m_imdb))
+
+    imdb_order = array('I', sorted(range(len(m_imdb)), key=m_imdb.__getitem__))
+    year_order = sorted(range(len(m_imdb)), key=m_year.__getitem__)
+    year_slots = array('I', year_order)
+    year_start = array('Q', [0] * (len(years) + 1))
+    for slot in year_order:
+        year_start[m_year[slot] + 1] += 1
+    for i in range(1, len(year_start)):
+        year_start[i] += year_start[i - 1]
+
+    # Trigram postings (tid ascending, isliye har list sorted)
+    grams: Dict[str, array] = {}
+    gram_counts = array('H')
+    initials: Dict[str, array] = {}
+    aliases: List[Tuple[str, int]] = []
+    for tid, key in enumerate(titles):
+        title_grams = make_trigrams(key)
+        gram_counts.append(min(len(title_grams), 0xFFFF))
+        for gram in title_grams:
+            posting = grams.get(gram)
+            if posting is None:
+                posting = grams[gram] = array('I')
+            posting.append(tid)
+        ini = title_initials(key)
+        if len(ini) >= ACRONYM_MIN_LENGTH:
+            initials.setdefault(ini, array('I')).append(tid)
+        if key.startswith("the ") and len(key) > 4:
+            aliases.append((key[4:], tid))
+    gram_keys = sorted(grams, key=_encode_gram)
+    post_off = array('Q', [0])
+    postings = array('I')
+    for gram in gram_keys:
+        postings.extend(grams[gram])
+        post_off.append(len(postings))
+    del grams
+    ini_keys = sorted(initials)
+    ini_off = array('Q', [0])
+    ini_postings = array('I')
+    for ini in ini_keys:
+        ini_postings.extend(initials[ini])
+        ini_off.append(len(ini_postings))
+    aliases.sort()
+
+    title_off, title_blob = _string_table(titles)
+    imdb_off, imdb_blob = _string_table(m_imdb)
+    mtitle_off, mtitle_blob = _string_table(m_title)
+    inikey_off, inikey_blob = _string_table(ini_keys)
+    alias_off, alias_blob = _string_table([a for a, _ in aliases])
+    sections = {
+        "title_off": title_off, "title_blob": title_blob, "movie_start": movie_start,
+        "imdb_off": imdb_off, "imdb_blob": imdb_blob, "mtitle_off": mtitle_off, "mtitle_blob": mtitle_blob,
+        "m_year": m_year, "m_tid": m_tid, "imdb_order": imdb_order,
+        "year_start": year_start, "year_slots": year_slots,
+        "gram_blob": b"".join(_encode_gram(g) for g in gram_keys), "post_off": post_off, "postings": postings,
+        "gram_counts": gram_counts,
+        "inikey_off": inikey_off, "inikey_blob": inikey_blob, "ini_off": ini_off, "ini_postings": ini_postings,
+        "alias_off": alias_off, "alias_blob": alias_blob, "alias_tid": array('I', [tid for _, tid in aliases]),
+    }
+
+    layout, pos = {}, 0
+    for name, data in sections.items():
+        nbytes = len(data) * data.itemsize if isinstance(data, array) else len(data)
+        layout[name] = (pos, nbytes, data.typecode if isinstance(data, array) else 'B')
+        pos += nbytes + (-nbytes % _ALIGN)
+    header = pickle.dumps({
+        "format": SHARED_FORMAT_VERSION,
+        "created_at": time.time(),
+        "watermark": watermark,
+        "titles": len(titles),
+        "movies": len(m_imdb),
+        "years": years,
+        "sections": layout,
+        "data_size": pos,
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+    # Data section 8-byte aligned rahe (memoryview casts)
+    header += b"\0" * (-(len(SHARED_MAGIC) + _LEN.size + len(header)) % _ALIGN)
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(SHARED_MAGIC)
+        f.write(_LEN.pack(len(header)))
+        f.write(header)
+        for name, data in sections.items():
+            f.write(data.tobytes() if isinstance(data, array) else data)
+            f.write(b"\0" * (-layout[name][1] % _ALIGN))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(SHARED_MAGIC) + _LEN.size + len(header) + pos
+
+
+class SharedIndexFile:
+    """Flat index file ka read-only mmap view. Sab arrays zero-copy memoryviews hain."""
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # os.replace naya inode deta hai: path par abhi bhi yahi file hai ya nahi (is_current)
+            self.inode = os.fstat(f.fileno()).st_ino
+        mm = self._mm
+        if mm[:len(SHARED_MAGIC)] != SHARED_MAGIC:
+            raise ValueError(f"{path}: shared index format pehchana nahi gaya")
+        pos = len(SHARED_MAGIC)
+        (header_len,) = _LEN.unpack_from(mm, pos)
+        pos += _LEN.size
+        header = pickle.loads(mm[pos:pos + header_len])
+        pos += header_len
+        if header.get("format") != SHARED_FORMAT_VERSION:
+            raise ValueError(f"{path}: shared index version {header.get('format')} (current {SHARED_FORMAT_VERSION})")
+        if len(mm) - pos != header["data_size"]:
+            raise ValueError(f"{path}: shared index adhoori hai (size mismatch)")
+
+        self.header = header
+        self.created_at: float = header["created_at"]
+        self.watermark = header["watermark"]
+        self.n_titles: int = header["titles"]
+        self.n_movies: int = header["movies"]
+        self.years: List[Optional[str]] = header["years"]
+        self.year_ids: Dict[str, int] = {y: i for i, y in enumerate(self.years) if y}
+        view = memoryview(mm)
+        for name, (offset, nbytes, typecode) in header["sections"].items():
+            section = view[pos + offset:pos + offset + nbytes]
+            setattr(self, name, section if typecode == 'B' else section.cast(typecode))
+        self.n_grams = len(self.gram_blob) // _GRAM_WIDTH
+        # Chhota sparse index (1M titles par ~16k keys): bisect C mein, phir 64 ke block mein search
+        self._fences = [bytes(self.title_blob[self.title_off[i]:self.title_off[i + 1]]) for i in range(0, self.n_titles, _FENCE_STEP)]
+
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+    def is_current(self) -> bool:
+        """Path par abhi bhi yahi file hai (kisi ne nayi generation se replace nahi ki)."""
+        try:
+            return os.stat(self.path).st_ino == self.inode
+        except OSError:
+            return False
+
+    # --- String tables ---
+    @staticmethod
+    def _get(offsets, blob, i: int) -> str:
+        return str(blob[offsets[i]:offsets[i + 1]], "utf-8")
+
+    @staticmethod
+    def _lower_bound(offsets, blob, target: bytes, n: int, lo: int = 0) -> int:
+        hi = n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(blob[offsets[mid]:offsets[mid + 1]]) < target: lo = mid + 1
+            else: hi = mid
+        return lo
+
+    def title(self, tid: int) -> str:
+        return self._get(self.title_off, self.title_blob, tid)
+
+    def title_lower_bound(self, target: bytes) -> int:
+        block = max(bisect_right(self._fences, target) - 1, 0) * _FENCE_STEP
+        return self._lower_bound(self.title_off, self.title_blob, target, min(self.n_titles, block + _FENCE_STEP), block)
+
+    def find_title(self, key: str) -> Optional[int]:
+        target = key.encode("utf-8")
+        pos = self.title_lower_bound(target)
+        if pos < self.n_titles and bytes(self.title_blob[self.title_off[pos]:self.title_off[pos + 1]]) == target:
+            return pos
+        return None
+
+    def records(self, tid: int) -> Tuple[MovieRecord, ...]:
+        key = self.title(tid)
+        years = self.years
+        return tuple(
+            MovieRecord(self._get(self.imdb_off, self.imdb_blob, slot), self._get(self.mtitle_off, self.mtitle_blob, slot), years[self.m_year[slot]], key)
+            for slot in range(self.movie_start[tid], self.movie_start[tid + 1])
+        )
+
+    def movies_in(self, tid: int) -> int:
+        return self.movie_start[tid + 1] - self.movie_start[tid]
+
+    def slots_for_imdb(self, imdb_id: str) -> List[int]:
+        target = imdb_id.encode("utf-8")
+        order, offsets, blob = self.imdb_order, self.imdb_off, self.imdb_blob
+        lo, hi = 0, self.n_movies
+        while lo < hi:
+            mid = (lo + hi) // 2
+            slot = order[mid]
+            if bytes(blob[offsets[slot]:offsets[slot + 1]]) < target: lo = mid + 1
+            else: hi = mid
+        slots = []
+        while lo < self.n_movies:
+            slot = order[lo]
+            if bytes(blob[offsets[slot]:offsets[slot + 1]]) != target: break
+            slots.append(slot)
+            lo += 1
+        return slots
+
+    def year_slots_of(self, yid: int):
+        return self.year_slots[self.year_start[yid]:self.year_start[yid + 1]]
+
+    def gram_posting(self, gram: str):
+        target = _encode_gram(gram)
+        blob = self.gram_blob
+        lo, hi = 0, self.n_grams
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(blob[mid * _GRAM_WIDTH:(mid + 1) * _GRAM_WIDTH]) < target: lo = mid + 1
+            else: hi = mid
+        if lo < self.n_grams and bytes(blob[lo * _GRAM_WIDTH:(lo + 1) * _GRAM_WIDTH]) == target:
+            return self.postings[self.post_off[lo]:self.post_off[lo + 1]]
+        return None
+
+    def initials_posting(self, initials: str):
+        n = len(self.ini_off) - 1
+        target = initials.encode("utf-8")
+        pos = self._lower_bound(self.inikey_off, self.inikey_blob, target, n)
+        if pos < n and self._get(self.inikey_off, self.inikey_blob, pos) == initials:
+            return self.ini_postings[self.ini_off[pos]:self.ini_off[pos + 1]]
+        return None
+
+    def close(self):
+        for name in self.header["sections"]:
+            getattr(self, name).release()
+        self.gram_blob = None
+        try: self._mm.close()
+        except BufferError: pass  # Koi view abhi bhi zinda hai; GC par band hoga
+
+
+class _TitleSequence(Sequence):
+    """Base tids (lazy decode) + overlay titles. Engine full scan / year partition isi par chalte hain."""
+    def __init__(self, base: SharedIndexFile, tids: Optional[Sequence[int]], local: Sequence[str]):
+        self._base = base
+        self._tids = tids  # None = saare base titles
+        self._local = local
+        self._n = base.n_titles if tids is None else len(tids)
+
+    def __len__(self) -> int:
+        return self._n + len(self._local)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0: i += len(self)
+        if i < self._n:
+            return self._base.title(i if self._tids is None else self._tids[i])
+        return self._local[i - self._n]
+
+    def __iter__(self) -> Iterator[str]:
+        base = self._base
+        for tid in (range(self._n) if self._tids is None else self._tids):
+            yield base.title(tid)
+        yield from self._local
+
+
+class SharedTitleSet:
+    """Year partition ka membership test: base tids (int set) + overlay titles."""
+    __slots__ = ("base", "tids", "local")
+
+    def __init__(self, base: SharedIndexFile, tids: Set[int], local: frozenset):
+        self.base = base
+        self.tids = tids
+        self.local = local
+
+    def __contains__(self, title: str) -> bool:
+        if title in self.local: return True
+        tid = self.base.find_title(title)
+        return tid is not None and tid in self.tids
+
+    def __len__(self) -> int:
+        return len(self.tids) + len(self.local)
+
+
+class SharedCatalog:
+    """
+    MovieCatalog jaisa read API (in, get, [], len, keys, items, titles, year_partition, entry) shared base file par,
+    aur add/update/remove/discard/remove_imdb_ids ek per-worker overlay mein.
+    """
+    def __init__(self, base: SharedIndexFile):
+        self._base = base
+        self._local = MovieCatalog()
+        self._hidden: Set[int] = set()  # Base tids jo overlay ne replace/remove kar diye
+        self._generation = 0
+        self._partitions: Dict[Tuple[str, ...], tuple] = {}
+
+    def __getstate__(self):
+        # Search worker processes ko sirf path + overlay jaata hai; woh khud same file mmap karte hain
+        return {"path": self._base.path, "created_at": self._base.created_at, "local": self._local, "hidden": self._hidden}
+
+    def __setstate__(self, state):
+        base = SharedIndexFile(state["path"])
+        if base.created_at != state["created_at"]:
+            base.close()
+            raise ValueError("Shared index file badal chuki hai (naya generation), attach nahi kar sakte.")
+        self.__init__(base)
+        self._local = state["local"]
+        self._hidden = state["hidden"]
+
+    @property
+    def path(self) -> str:
+        return self._base.path
+
+    @property
+    def watermark(self):
+        return self._base.watermark
+
+    @property
+    def created_at(self) -> float:
+        return self._base.created_at
+
+    def is_current(self) -> bool:
+        """False = file replace ho chuki: pickle karke worker ko bhejna bekaar (__setstate__ attach nahi karega)."""
+        return self._base.is_current()
+
+    def overlay_size(self) -> int:
+        return len(self._local) + len(self._hidden)
+
+    def _base_tid(self, key: str) -> Optional[int]:
+        tid = self._base.find_title(key)
+        return None if tid is None or tid in self._hidden else tid
+
+    # --- Read API ---
+    @property
+    def titles(self) -> Sequence[str]:
+        return _TitleSequence(self._base, None, self._local.titles)
+
+    def movie_count(self) -> int:
+        hidden_movies = sum(self._base.movies_in(tid) for tid in self._hidden)
+        return self._base.n_movies - hidden_movies + self._local.movie_count()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._local or self._base_tid(key) is not None
+
+    def get(self, key: str, default=None):
+        records = self._local.get(key)
+        if records is not None: return records
+        tid = self._base_tid(key)
+        if tid is None: return default
+        return self._base.records(tid)
+
+    def __getitem__(self, key: str) -> Tuple[MovieRecord, ...]:
+        records = self.get(key)
+        if records is None: raise KeyError(key)
+        return records
+
+    def __len__(self) -> int:
+        return self._base.n_titles - len(self._hidden) + len(self._local)
+
+    def __iter__(self) -> Iterator[str]:
+        base, hidden = self._base, self._hidden
+        for tid in range(base.n_titles):
+            if tid not in hidden: yield base.title(tid)
+        yield from list(self._local.keys())
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        for key in self:
+            records = self.get(key)
+            if records: yield key, records
+
+    def values(self):
+        for _, records in self.items():
+            yield records
+
+    def year_partition(self, years: Iterable[str]) -> Tuple[Sequence[str], SharedTitleSet]:
+        """MovieCatalog.year_partition jaisa; titles lazy sequence aur membership int tids par."""
+        key = tuple(sorted(set(years)))
+        generation = (self._generation, self._local._generation)
+        cached = self._partitions.get(key)
+        if cached is not None and cached[0] == generation:
+            return cached[1], cached[2]
+
+        base, hidden = self._base, self._hidden
+        tids: Dict[int, None] = {}
+        m_tid = base.m_tid
+        for yid in [0] + [base.year_ids[y] for y in key if y in base.year_ids]:
+            for slot in base.year_slots_of(yid):
+                tid = m_tid[slot]
+                if tid not in hidden: tids[tid] = None
+        local_titles, local_set = self._local.year_partition(key)
+        tid_list = array('I', tids)
+        titles = _TitleSequence(base, tid_list, local_titles)
+        title_set = SharedTitleSet(base, set(tids), local_set)
+        if len(self._partitions) >= 8: self._partitions.clear()
+        self._partitions[key] = (generation, titles, title_set)
+        return titles, title_set
+
+    # --- Mutations (overlay, event loop / FUZZY_CACHE_LOCK se) ---
+    def _hide(self, tid: int):
+        self._hidden.add(tid)
+        self._generation += 1
+
+    def _base_slot(self, imdb_id: str) -> Optional[int]:
+        """imdb_id ka live base slot (overlay ne uska title hide kar diya ho to None)."""
+        for slot in self._base.slots_for_imdb(imdb_id):
+            if self._base.m_tid[slot] not in self._hidden: return slot
+        return None
+
+    def entry(self, imdb_id: str) -> Optional[MovieRecord]:
+        record = self._local.entry(imdb_id)
+        if record is not None: return record
+        slot = self._base_slot(imdb_id)
+        if slot is None: return None
+        return next(r for r in self._base.records(self._base.m_tid[slot]) if r.imdb_id == imdb_id)
+
+    def key_of(self, imdb_id: str) -> Optional[str]:
+        key = self._local.key_of(imdb_id)
+        if key is not None: return key
+        slot = self._base_slot(imdb_id)
+        return None if slot is None else self._base.title(self._base.m_tid[slot])
+
+    def add(self, movie) -> str:
+        return self.update(movie)[1]
+
+    def update(self, movie) -> Tuple[Optional[str], str]:
+        """MovieCatalog.update jaisa upsert: returns (old_key, new_key)."""
+        key = movie['clean_title']
+        if not key: return None, key
+        old_key = self.key_of(movie['imdb_id'])
+        # Dusre title se move: base copy wahan se hatao (overlay ki copy local.update khud hata deta hai)
+        if old_key is not None and old_key != key:
+            self.remove(movie['imdb_id'])
+        tid = self._base_tid(key)
+        if tid is not None:
+            # Base title overlay mein copy hota hai; aage ke saare changes wahin
+            for record in self._base.records(tid):
+                self._local.add(record)
+            self._hide(tid)
+        self._local.add(movie)
+        return old_key, key
+
+    def remove(self, imdb_id: str) -> Optional[str]:
+        affected = self.remove_imdb_ids({imdb_id})
+        return affected[0] if affected else None
+
+    def discard(self, key: str):
+        self._local.discard(key)
+        tid = self._base_tid(key)
+        if tid is not None: self._hide(tid)
+
+    def remove_imdb_ids(self, imdb_ids: Set[str]) -> List[str]:
+        if not imdb_ids: return []
+        affected = set(self._local.remove_imdb_ids(imdb_ids))
+        base = self._base
+        for imdb_id in imdb_ids:
+            for slot in base.slots_for_imdb(imdb_id):
+                tid = base.m_tid[slot]
+                if tid in self._hidden: continue
+                keep = [r for r in base.records(tid) if r.imdb_id not in imdb_ids]
+                self._hide(tid)
+                for record in keep:
+                    self._local.add(record)
+                affected.add(base.title(tid))
+        return list(affected)
+
+    def make_trigram_index(self) -> "SharedTrigramIndex":
+        return SharedTrigramIndex(self)
+
+    def make_prefix_index(self) -> "SharedPrefixIndex":
+        return SharedPrefixIndex(self)
+
+    def make_title_features(self) -> "TitleFeatureCache":
+        return TitleFeatureCache()
+
+
+class TitleFeatureCache(dict):
+    """
+    Shared mode ka title_features map. Poora map har process mein banana shared index ka maqsad khatam karta
+    (1M titles par GBs), isliye sirf score hue titles ke TitleFeatures, `max_size` tak (sabse purane pehle nikalte hain).
+    get() miss par bana ke rakhta hai, kabhi None nahi deta. Fields mmap mein store karna sasta nahi:
+    string decode ka kharcha utna hi hai jitna tight/initials dobara banana.
+    """
+    def __init__(self, max_size: int = SHARED_FEATURES_CACHE_SIZE):
+        super().__init__()
+        self.max_size = max_size
+
+    def get(self, key: str, default=None) -> TitleFeatures:
+        features = dict.get(self, key)
+        if features is None:
+            features = TitleFeatures(key)
+            if self.max_size > 0:
+                # Executor threads ek saath evict kar sakte hain: pop(default) race mein KeyError nahi deta
+                if len(self) >= self.max_size: self.pop(next(iter(self), None), None)
+                self[key] = features
+        return features
+
+
+def _dice(q_grams: Set[str], q_len: int, title: str) -> float:
+    grams = make_trigrams(title)
+    return (2 * len(q_grams & grams)) / (q_len + len(grams))
+
+
+class SharedTrigramIndex:
+    """TrigramIndex jaisa API: base postings shared file se, overlay titles ke liye chhota local TrigramIndex."""
+    def __init__(self, catalog: SharedCatalog):
+        self._catalog = catalog
+        self._base = catalog._base
+        self._local = TrigramIndex()
+        for key in list(catalog._local.keys()):
+            self._local.add(key)
+
+    def __len__(self) -> int:
+        return len(self._catalog)
+
+    def add(self, title: str):
+        if self._catalog._base_tid(title) is None:
+            self._local.add(title)
+
+    def discard(self, title: str):
+        self._local.discard(title)
+
+    def candidates(self, query: str, limit: int = TRIGRAM_SHORTLIST_SIZE, allowed=None) -> List[str]:
+        grams = make_trigrams(query)
+        q_len = len(grams)
+        scored: List[Tuple[float, str]] = []
+
+        postings = [p for p in (self._base.gram_posting(g) for g in grams) if p is not None]
+        if postings:
+            counts = count_trigram_overlaps(postings)
+            hidden, gram_counts = self._catalog._hidden, self._base.gram_counts
+            live = (tid for tid in counts if tid not in hidden)
+            if isinstance(allowed, SharedTitleSet):
+                allowed_tids = allowed.tids
+                live = (tid for tid in live if tid in allowed_tids)
+            elif allowed is not None:
+                live = (tid for tid in live if self._base.title(tid) in allowed)
+            dice = lambda tid: (2 * counts[tid]) / (q_len + gram_counts[tid])
+            scored.extend((dice(tid), -tid, self._base.title(tid)) for tid in heapq.nlargest(limit, live, key=dice))
+
+        if len(self._local):
+            # Overlay titles base ke baad (SharedCatalog.titles jaisa order)
+            local_allowed = allowed.local if isinstance(allowed, SharedTitleSet) else allowed
+            local = self._local.candidates(query, limit, allowed=local_allowed)
+            scored.extend((_dice(grams, q_len, t), -(self._base.n_titles + i), t) for i, t in enumerate(local))
+        # TrigramIndex.candidates jaisa: Dice se chuno, catalog order mein lautao
+        top = heapq.nlargest(limit, scored)
+        top.sort(key=lambda item: -item[1])
+        return [title for _, _, title in top]
+
+    def acronym_candidates(self, query: str, limit: int = TRIGRAM_SHORTLIST_SIZE) -> List[str]:
+        if " " in query or len(query) < ACRONYM_MIN_LENGTH: return []
+        found = []
+        posting = self._base.initials_posting(query)
+        if posting is not None:
+            hidden = self._catalog._hidden
+            found = [self._base.title(tid) for tid in posting[:limit * 2] if tid not in hidden]
+        found.extend(self._local.acronym_candidates(query, limit))
+        return found[:limit]
+
+
+class SharedPrefixIndex:
+    """PrefixIndex jaisa API. Base titles file mein pehle se sorted hain ('the ...' aliases alag table mein)."""
+    def __init__(self, catalog: SharedCatalog):
+        self._catalog = catalog
+        self._base = catalog._base
+        self._local = PrefixIndex.build(list(catalog._local.keys()))
+
+    def __len__(self) -> int:
+        return len(self._catalog)
+
+    def add(self, title: str):
+        if self._catalog._base_tid(title) is None:
+            self._local.add(title)
+
+    def discard(self, title: str):
+        self._local.discard(title)
+
+    def _scan(self, offsets, blob, n: int, prefix: str, scan: int, pos: Optional[int] = None) -> Iterator[int]:
+        target = prefix.encode("utf-8")
+        if pos is None: pos = SharedIndexFile._lower_bound(offsets, blob, target, n)
+        end = min(n, pos + scan)
+        while pos < end and bytes(blob[offsets[pos]:offsets[pos + 1]]).startswith(target):
+            yield pos
+            pos += 1
+
+    def search(self, prefix: str, limit: int = 20, scan: int = PREFIX_SCAN_MAX) -> List[str]:
+        if not prefix: return []
+        base, hidden = self._base, self._catalog._hidden
+        found: Dict[str, None] = {}
+        start = base.title_lower_bound(prefix.encode("utf-8"))
+        for tid in self._scan(base.title_off, base.title_blob, base.n_titles, prefix, scan, start):
+            if tid not in hidden: found[base.title(tid)] = None
+        for pos in self._scan(base.alias_off, base.alias_blob, len(base.alias_tid), prefix, scan):
+            tid = base.alias_tid[pos]
+            if tid not in hidden: found[base.title(tid)] = None
+        for title in self._local.search(prefix, limit=scan, scan=scan):
+            found[title] = None
+        return sorted(found, key=lambda t: (len(t), t))[:limit]
+
+
+# --- Loader coordination ---
+def acquire_loader_lock(path: str = SHARED_INDEX_PATH) -> int:
+    """Ek time par ek hi worker index banaye (baaki wait karke wahi file attach karte hain). Blocking: executor mein."""
+    fd = os.open(f"{path}.lock", os.O_CREAT | os.O_RDWR, 0o644)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    return fd
+
+
+def release_loader_lock(fd: int):
+    try:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def attach_shared_index(path: str = SHARED_INDEX_PATH, max_age: Optional[float] = SHARED_INDEX_MAX_AGE, newer_than: Optional[float] = None) -> Optional[SharedCatalog]:
+    """
+    Existing shared file se SharedCatalog. File na ho / corrupt ho / purani ho to None (caller rebuild kare).
+    `newer_than` ke baad bani file max_age ke bina bhi valid hai (wait ke dauran kisi aur worker ne banayi).
+    """
+    if not os.path.exists(path): return None
+    try:
+        base = SharedIndexFile(path)
+    except Exception as e:
+        logger.warning(f"Shared index attach nahi hua ({path}): {e}")
+        return None
+    fresh = (newer_than is not None and base.created_at >= newer_than) or (max_age is not None and base.age() <= max_age)
+    if not fresh:
+        base.close()
+        return None
+    return SharedCatalog(base)
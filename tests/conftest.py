@@ -0,0 +1,14 @@
+# tests/conftest.py
+# Flat modules repo root par hain; bot.py import time par yeh env vars maangta hai (koi connection nahi banta)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("BOT_TOKEN", "123456:ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghi")
+os.environ.setdefault("DATABASE_URL_PRIMARY", "mongodb://localhost")
+os.environ.setdefault("DATABASE_URL_FALLBACK", "mongodb://localhost")
+os.environ.setdefault("NEON_DATABASE_URL", "postgres://localhost")
+# Tests disk snapshot / shared file nahi likhte
+os.environ.setdefault("INDEX_SNAPSHOT_ENABLED", "False")
+os.environ.setdefault("SHARED_INDEX_ENABLED", "False")
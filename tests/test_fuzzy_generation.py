@@ -0,0 +1,227 @@
+# tests/test_fuzzy_generation.py
+# Double-buffered rebuild, delta log replay aur lock ke bahar chalne wale builds (delta/key windows)
+import time
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import bot
+from batch_scorer import NUMPY_AVAILABLE
+from index_snapshot import IndexSnapshot
+from search_engine import clean_text_for_search
+from search_index import MovieCatalog, TrigramIndex, PrefixIndex, TokenCorrector, build_title_features
+from tfidf_index import NgramTfidfIndex
+
+
+def movie(imdb_id, title, year="2020"):
+    return {"imdb_id": imdb_id, "title": title, "clean_title": clean_text_for_search(title), "year": year}
+
+
+def make_generation(movies):
+    catalog = MovieCatalog.build(movies)
+    keys = list(catalog.keys())
+    return bot.FuzzyGeneration(
+        catalog, TrigramIndex.build(keys), build_title_features(keys), PrefixIndex.build(keys),
+        TokenCorrector.build(keys), NgramTfidfIndex.build(keys) if NUMPY_AVAILABLE else None
+    )
+
+
+def token_freqs(corrector):
+    return {token: freq for token, freq in zip(corrector._tokens, corrector._freq) if freq}
+
+
+def assert_consistent(gen):
+    """Har derived index live catalog keys se fresh build jaisa ho."""
+    keys = sorted(gen.catalog.keys())
+    assert sorted(gen.trigram_index._ids) == keys
+    assert sorted(gen.title_features) == keys
+    fresh_prefix = PrefixIndex.build(keys)
+    assert (gen.prefix_index._keys, gen.prefix_index._titles) == (fresh_prefix._keys, fresh_prefix._titles)
+    assert token_freqs(gen.token_corrector) == token_freqs(TokenCorrector.build(keys))
+    if gen.tfidf_index is not None:
+        tfidf = gen.tfidf_index
+        live = {title for title, row in tfidf._rows.items() if tfidf._alive[row]} | set(tfidf._extra)
+        assert sorted(live) == keys
+
+
+async def drain_tasks():
+    """Background tasks (snapshot derived build) khatam hone tak."""
+    pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    await asyncio.wait_for(asyncio.gather(*pending), timeout=10)
+
+
+@pytest.fixture
+def fuzzy_state(monkeypatch):
+    """Har test ke liye taaza locks/logs; bot ke generation globals test ke baad wapas."""
+    monkeypatch.setattr(bot, "FUZZY_CACHE_LOCK", asyncio.Lock())
+    monkeypatch.setattr(bot, "FUZZY_REBUILD_LOCK", asyncio.Lock())
+    monkeypatch.setattr(bot, "fuzzy_rebuild_log", None)
+    monkeypatch.setattr(bot, "fuzzy_delta_windows", [])
+    monkeypatch.setattr(bot, "fuzzy_key_windows", [])
+    monkeypatch.setattr(bot, "schedule_index_snapshot", lambda: None)
+    monkeypatch.setattr(bot, "schedule_hot_query_warm", lambda: None)
+    monkeypatch.setattr(bot, "TFIDF_SEARCH_ENABLED", NUMPY_AVAILABLE)
+    for name in ("fuzzy_movie_cache", "fuzzy_trigram_index", "fuzzy_title_features", "fuzzy_prefix_index",
+                 "fuzzy_token_corrector", "fuzzy_tfidf_index", "fuzzy_cache_watermark", "catalog_version"):
+        monkeypatch.setattr(bot, name, getattr(bot, name))
+
+
+@pytest.fixture
+def gated_snapshot(monkeypatch, fuzzy_state):
+    """
+    restore_index_snapshot ke liye in-memory snapshot. Derived build (build_title_features) executor
+    mein tab tak ruka rehta hai jab tak test `release` set na kare.
+    """
+    catalog = MovieCatalog.build([movie("tt1", "Jawan"), movie("tt2", "Pathaan"), movie("tt3", "Dunki")])
+    snapshot = IndexSnapshot(catalog, TrigramIndex.build(list(catalog.keys())), None, time.time())
+    monkeypatch.setattr(bot, "INDEX_SNAPSHOT_ENABLED", True)
+    monkeypatch.setattr(bot, "SHARED_INDEX_ENABLED", False)
+    monkeypatch.setattr(bot, "load_snapshot", lambda: snapshot)
+    started, release = threading.Event(), threading.Event()
+    real_build = bot.build_title_features
+
+    def gated_build(keys):
+        started.set()
+        release.wait(10)
+        return real_build(keys)
+
+    monkeypatch.setattr(bot, "build_title_features", gated_build)
+    return catalog, started, release
+
+
+def test_delta_during_rebuild_is_replayed_exactly_once(fuzzy_state, monkeypatch):
+    old = [movie("tt1", "Jawan"), movie("tt2", "Pathaan")]
+    replays = []
+    real_apply = bot._apply_fuzzy_delta
+
+    def spy_apply(changed, deleted, gen=None):
+        if gen is not None: replays.append((changed, deleted))
+        real_apply(changed, deleted, gen)
+
+    monkeypatch.setattr(bot, "_apply_fuzzy_delta", spy_apply)
+
+    async def scenario():
+        bot._publish_generation(make_generation(old), None)
+        started, gate = asyncio.Event(), asyncio.Event()
+
+        async def build():
+            rows = list(old)  # DB fetch write se pehle ho chuka
+            started.set()
+            await gate.wait()
+            return make_generation(rows), None
+
+        rebuild = asyncio.create_task(bot._rebuild_fuzzy_generation(build))
+        await started.wait()
+        async with bot.FUZZY_CACHE_LOCK:
+            bot._record_fuzzy_delta([movie("tt3", "Dunki")], ["tt1"])
+        gate.set()
+        assert await rebuild
+        # Publish ke baad ka write log mein nahi jaata (dobara replay nahi)
+        async with bot.FUZZY_CACHE_LOCK:
+            bot._record_fuzzy_delta([movie("tt4", "Animal")], [])
+
+    asyncio.run(scenario())
+    assert replays == [([movie("tt3", "Dunki")], ["tt1"])]
+    assert bot.fuzzy_rebuild_log is None
+    gen = bot._current_generation()
+    assert sorted(gen.catalog.keys()) == ["animal", "dunki", "pathaan"]
+    assert token_freqs(gen.token_corrector)["dunki"] == 1
+    assert_consistent(gen)
+
+
+def test_failed_rebuild_keeps_live_generation_and_closes_log(fuzzy_state):
+    async def scenario():
+        live = make_generation([movie("tt1", "Jawan")])
+        bot._publish_generation(live, None)
+
+        async def build():
+            async with bot.FUZZY_CACHE_LOCK:
+                bot._record_fuzzy_delta([movie("tt2", "Dunki")], [])
+            return None
+
+        assert not await bot._rebuild_fuzzy_generation(build)
+        return live
+
+    live = asyncio.run(scenario())
+    assert bot.fuzzy_movie_cache is live.catalog
+    assert bot.fuzzy_rebuild_log is None
+    assert sorted(bot.fuzzy_movie_cache.keys()) == ["dunki", "jawan"]
+
+
+def test_write_during_delta_fetch_is_not_overwritten_by_delta(fuzzy_state):
+    old_watermark = datetime.now(timezone.utc) - timedelta(minutes=5)
+    new_watermark = old_watermark + timedelta(minutes=4)
+
+    async def scenario():
+        bot._publish_generation(make_generation([movie("tt1", "Jawan"), movie("tt2", "Pathaan")]), old_watermark)
+        started, gate = asyncio.Event(), asyncio.Event()
+
+        class FakeDB:
+            async def get_fuzzy_cache_delta(self, watermark):
+                started.set()
+                await gate.wait()
+                # Fetch writer se pehle ka hai: tt1 ka purana title, tt2 delete
+                return [movie("tt1", "Jawan")], ["tt2"], new_watermark
+
+        refresh = asyncio.create_task(bot._delta_refresh_fuzzy_cache(FakeDB(), broadcast=False))
+        await started.wait()
+        assert len(bot.fuzzy_delta_windows) == 1
+        async with bot.FUZZY_CACHE_LOCK:
+            bot._record_fuzzy_delta([movie("tt1", "Jawan Returns")], [])
+        gate.set()
+        assert await refresh
+
+    asyncio.run(scenario())
+    assert bot.fuzzy_delta_windows == []
+    assert bot.fuzzy_movie_cache.key_of("tt1") == "jawan returns"
+    assert bot.fuzzy_movie_cache.key_of("tt2") is None
+    assert bot.fuzzy_cache_watermark == new_watermark
+    assert_consistent(bot._current_generation())
+
+
+def test_rename_and_delete_during_snapshot_build_keep_indexes_consistent(gated_snapshot):
+    catalog, started, release = gated_snapshot
+
+    async def scenario():
+        assert await bot.restore_index_snapshot()
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 10)
+        assert len(bot.fuzzy_key_windows) == 1
+        async with bot.FUZZY_CACHE_LOCK:
+            # Rename (purani key khaali) + delete + nayi movie
+            bot._record_fuzzy_delta([movie("tt1", "Jawan Returns"), movie("tt4", "Animal")], ["tt2"])
+        release.set()
+        await drain_tasks()
+
+    asyncio.run(scenario())
+    assert bot.fuzzy_key_windows == []
+    gen = bot._current_generation()
+    assert gen.catalog is catalog
+    assert sorted(gen.catalog.keys()) == ["animal", "dunki", "jawan returns"]
+    assert_consistent(gen)
+
+
+def test_stale_snapshot_build_is_not_published_over_newer_generation(gated_snapshot):
+    catalog, started, release = gated_snapshot
+    newer = make_generation([movie("tt9", "Animal")])
+
+    async def scenario():
+        assert await bot.restore_index_snapshot()
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 10)
+
+        async def build():
+            return newer, None
+
+        assert await bot._rebuild_fuzzy_generation(build)
+        release.set()
+        await drain_tasks()
+
+    asyncio.run(scenario())
+    gen = bot._current_generation()
+    assert gen.catalog is newer.catalog
+    assert gen.title_features is newer.title_features
+    assert gen.prefix_index is newer.prefix_index
+    assert gen.token_corrector is newer.token_corrector
+    assert gen.tfidf_index is newer.tfidf_index
+    assert_consistent(gen)
@@ -0,0 +1,154 @@
+# tests/test_search_index.py
+# MovieCatalog mutations/compaction aur TokenCorrector ke ref-counts
+from search_index import MovieCatalog, TokenCorrector
+
+
+def movie(imdb_id, clean_title, year="2020", title=None):
+    return {"imdb_id": imdb_id, "title": title or clean_title.title(), "clean_title": clean_title, "year": year}
+
+
+def ids(records):
+    return [r["imdb_id"] for r in records]
+
+
+# --- MovieCatalog ---
+def test_add_and_read_api():
+    catalog = MovieCatalog()
+    assert catalog.add(movie("tt1", "jawan", "2023")) == "jawan"
+    catalog.add(movie("tt2", "jawan", "1999"))
+    catalog.add(movie("tt3", "dunki"))
+
+    assert "jawan" in catalog and len(catalog) == 2 and catalog.movie_count() == 3
+    assert ids(catalog["jawan"]) == ["tt1", "tt2"]  # insertion order
+    assert catalog.entry("tt2").year == "1999"
+    assert catalog.key_of("tt3") == "dunki"
+    assert catalog.get("missing") is None and catalog.key_of("missing") is None
+
+
+def test_update_same_key_replaces_record():
+    catalog = MovieCatalog.build([movie("tt1", "jawan", "2022")])
+    assert catalog.update(movie("tt1", "jawan", "2023", title="Jawan (Hindi)")) == ("jawan", "jawan")
+    records = catalog["jawan"]
+    assert ids(records) == ["tt1"]
+    assert (records[0]["title"], records[0]["year"]) == ("Jawan (Hindi)", "2023")
+    assert catalog.movie_count() == 1
+
+
+def test_update_with_rename_moves_movie_and_drops_empty_key():
+    catalog = MovieCatalog.build([movie("tt1", "jawan"), movie("tt2", "pathaan"), movie("tt3", "pathaan")])
+
+    assert catalog.update(movie("tt1", "jawan returns")) == ("jawan", "jawan returns")
+    assert "jawan" not in catalog and catalog.get("jawan") is None
+    assert catalog.key_of("tt1") == "jawan returns"
+    # Stable titles sequence: purani key compaction tak rehti hai, lookup khaali
+    assert "jawan" in catalog.titles
+
+    # Purani key par aur movies hon to key bani rehti hai
+    assert catalog.update(movie("tt2", "pathaan 2")) == ("pathaan", "pathaan 2")
+    assert ids(catalog["pathaan"]) == ["tt3"]
+    assert sorted(catalog.keys()) == ["jawan returns", "pathaan", "pathaan 2"]
+    assert catalog.movie_count() == 3
+
+
+def test_remove_down_to_empty_key():
+    catalog = MovieCatalog.build([movie("tt1", "dunki"), movie("tt2", "dunki"), movie("tt3", "animal")])
+
+    assert catalog.remove("tt1") == "dunki"
+    assert ids(catalog["dunki"]) == ["tt2"]
+    assert catalog.remove("tt2") == "dunki"
+    assert "dunki" not in catalog and catalog.key_of("tt2") is None
+    assert catalog.remove("tt2") is None  # dobara remove no-op
+    assert list(catalog.keys()) == ["animal"] and catalog.movie_count() == 1
+    # Khaali key par wapas add
+    catalog.add(movie("tt4", "dunki"))
+    assert ids(catalog["dunki"]) == ["tt4"]
+
+
+def test_year_partition_follows_updates():
+    catalog = MovieCatalog.build([movie("tt1", "jawan", "2023"), movie("tt2", "dunki", "2010")])
+    assert catalog.year_partition(["2023"])[0] == ["jawan"]
+    catalog.update(movie("tt2", "dunki", "2023"))
+    assert sorted(catalog.year_partition(["2023"])[0]) == ["dunki", "jawan"]
+    catalog.remove("tt1")
+    assert catalog.year_partition(["2023"])[0] == ["dunki"]
+
+
+def test_compaction_drops_dead_slots_and_keeps_live_movies():
+    catalog = MovieCatalog.build([movie(f"tt{i}", f"title {i}", str(1990 + i % 30)) for i in range(2000)])
+    removed = catalog.remove_imdb_ids({f"tt{i}" for i in range(1500)})
+    assert len(removed) == 1500
+
+    s = catalog._s
+    assert s.dead_movies == 0
+    assert len(s.titles) == len(s.tids) == 500
+    assert len(s.m_imdb) == len(s.imdb_slots) == 500
+    for i in range(1500, 2000):
+        assert catalog.entry(f"tt{i}").year == str(1990 + i % 30)
+    assert catalog.key_of("tt0") is None
+
+
+def test_compaction_while_iterating():
+    catalog = MovieCatalog.build([movie(f"tt{i}", f"title {i}") for i in range(2000)])
+    old_state = catalog._s
+    seen = {}
+    for n, (key, records) in enumerate(catalog.items()):
+        seen[key] = ids(records)
+        if n == 10:
+            # Iteration ke beech compaction: iterator purane state par chalta rehta hai
+            catalog.remove_imdb_ids({f"tt{i}" for i in range(1000, 2000)})
+            assert catalog._s is not old_state
+
+    assert len(seen) == 2000
+    # Jo movies abhi bhi hain unke records sahi; hatayi gayi keys khaali aati hain (crash/garbage nahi)
+    for i in range(1000):
+        assert seen[f"title {i}"] == [f"tt{i}"]
+    assert all(seen[f"title {i}"] in ([], [f"tt{i}"]) for i in range(1000, 2000))
+    assert len(catalog) == 1000 and catalog._s.dead_movies == 0
+
+
+# --- TokenCorrector ---
+def freq(corrector, token):
+    tid = corrector._ids.get(token)
+    return None if tid is None else corrector._freq[tid]
+
+
+def test_corrector_ref_counts_shared_tokens():
+    corrector = TokenCorrector.build(["avengers endgame", "avengers infinity war"])
+    assert freq(corrector, "avengers") == 2
+    assert corrector.correct("avangers") == "avengers"
+
+    corrector.discard("avengers endgame")
+    assert freq(corrector, "avengers") == 1 and "avengers" in corrector
+    assert "endgame" not in corrector
+    assert corrector.correct("endgme") == "endgme"  # dead token suggest nahi hota
+
+    corrector.discard("avengers infinity war")
+    assert freq(corrector, "avengers") == 0
+    assert corrector.correct("avangers") == "avangers"
+
+
+def test_corrector_discard_unknown_and_readd():
+    corrector = TokenCorrector.build(["pathaan"])
+    corrector.discard("pathaan")
+    corrector.discard("pathaan")  # zero se neeche nahi jaata
+    corrector.discard("never added title")  # naye tokens nahi banate
+    assert freq(corrector, "pathaan") == 0
+    assert "never" not in corrector._ids
+
+    corrector.add("pathaan")
+    assert freq(corrector, "pathaan") == 1
+    assert corrector._tokens.count("pathaan") == 1
+    assert corrector.correct("pathan") == "pathaan"
+
+
+def test_corrector_incremental_add_matches_build():
+    titles = ["jawan", "dunki drop", "animal park", "tiger zinda hai"]
+    built = TokenCorrector.build(titles)
+    incremental = TokenCorrector.build(titles[:1])
+    for title in titles[1:]:
+        incremental.add(title)
+    for token in ["dunky", "animl", "zindaa", "tigre", "jawaan"]:
+        assert incremental.correct(token) == built.correct(token)
+    # Duplicate title add = count badhta hai, dictionary entry nahi
+    incremental.add("animal park")
+    assert freq(incremental, "animal") == 2 and incremental._tokens.count("animal") == 1
@@ -0,0 +1,151 @@
+# tfidf_index.py
+# Vector-space search engine: clean_title keys ke character trigrams ka sparse TF-IDF matrix (NumPy CSC arrays),
+# query = ek sparse matrix-vector product + top-k. scipy ki zaroorat nahi (keys sirf a-z0-9 space hain, vocab fixed hai).
+import os
+import logging
+from typing import Dict, Iterable, List, Tuple
+
+from batch_scorer import np, NUMPY_AVAILABLE
+
+logger = logging.getLogger("bot.tfidf_index")
+
+# FUZZY_SEARCH_ENGINE=tfidf: WRatio scan ki jagah TF-IDF engine (NumPy chahiye; default "v7")
+TFIDF_SEARCH_ENABLED = NUMPY_AVAILABLE and os.getenv("FUZZY_SEARCH_ENGINE", "v7").strip().lower() == "tfidf"
+# Top itne titles (cosine) V7 intent re-ranking tak jaate hain
+TFIDF_SHORTLIST_SIZE = int(os.getenv("TFIDF_SHORTLIST_SIZE", "200"))
+# Isse kam cosine wale titles drop (WRatio score_cutoff=35 jaisa kaam)
+TFIDF_MIN_SIMILARITY = float(os.getenv("TFIDF_MIN_SIMILARITY", "0.2"))
+# Itne fraction se zyada titles mein aane wale trigrams (' th', 'the') query mein skip, agar baaki grams hon
+# (unka IDF weight waise bhi ~0 hai, par posting list sabse lambi)
+TFIDF_MAX_DF_RATIO = float(os.getenv("TFIDF_MAX_DF_RATIO", "0.05"))
+
+# clean_text_for_search ke baad sirf ' ', a-z, 0-9: 37 symbols, trigram id = base-37 number (50,653 max)
+_ALPHABET = " abcdefghijklmnopqrstuvwxyz0123456789"
+_BASE = len(_ALPHABET)
+VOCAB_SIZE = _BASE ** 3
+_SEP = 255
+if NUMPY_AVAILABLE:
+    _CODE = np.zeros(256, dtype=np.int64)  # Alphabet ke bahar ka char space maana jaata hai
+    for _i, _ch in enumerate(_ALPHABET):
+        _CODE[ord(_ch)] = _i
+    _CODE[_SEP] = -1
+
+
+def _gram_codes(text: str):
+    """Space-padded trigram ids (make_trigrams jaisa, par int)."""
+    codes = _CODE[np.frombuffer(f" {text} ".encode("ascii", "replace"), dtype=np.uint8)]
+    if len(codes) < 3: return codes[:0]
+    return codes[:-2] * (_BASE * _BASE) + codes[1:-1] * _BASE + codes[2:]
+
+
+class NgramTfidfIndex:
+    """
+    Columns = trigram ids, rows = titles. CSC layout: gram g ke (row, weight) pairs indptr[g]:indptr[g+1] par,
+    rows L2-normalized (TF = 1 + log(count), IDF = log((N+1)/(df+1)) + 1). Build ke baad aaye titles `_extra` mein
+    (build time IDF ke saath), hatae gaye titles `_alive` mask se bahar; agli full rebuild par sab matrix mein.
+    """
+    def __init__(self):
+        self.titles: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self.indptr = np.zeros(VOCAB_SIZE + 1, dtype=np.int64)
+        self.row_ids = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.float32)
+        self.idf = np.ones(VOCAB_SIZE, dtype=np.float32)
+        self.df = np.zeros(VOCAB_SIZE, dtype=np.int64)
+        self._alive = np.zeros(0, dtype=bool)
+        self._dead = 0
+        self._extra: Dict[str, Tuple] = {}
+
+    @classmethod
+    def build(cls, titles: Iterable[str]) -> "NgramTfidfIndex":
+        """Poora matrix vectorized banata hai (CPU bound, executor mein chalayein)."""
+        index = cls()
+        titles = [t for t in titles if t]
+        n = len(titles)
+        index.titles = titles
+        index._rows = {t: i for i, t in enumerate(titles)}
+        index._alive = np.ones(n, dtype=bool)
+        if not n: return index
+
+        # Saare titles ek buffer mein: " t1 " SEP " t2 " SEP ... ; jis window mein SEP ho wo gram nahi
+        buf = (chr(_SEP).join(f" {t} " for t in titles)).encode("latin-1", "replace")
+        codes = _CODE[np.frombuffer(buf, dtype=np.uint8)]
+        is_sep = codes < 0
+        row_of_pos = np.cumsum(is_sep)
+        valid = ~(is_sep[:-2] | is_sep[1:-1] | is_sep[2:])
+        grams = (codes[:-2] * (_BASE * _BASE) + codes[1:-1] * _BASE + codes[2:])[valid]
+        rows = row_of_pos[:-2][valid]
+        del codes, is_sep, row_of_pos, valid
+
+        # (gram, row) unique + count = TF; gram-major order seedha CSC deta hai
+        keys, tf = np.unique(grams * n + rows, return_counts=True)
+        del grams, rows
+        col = keys // n
+        row = (keys % n).astype(np.int32)
+        del keys
+        df = np.bincount(col, minlength=VOCAB_SIZE)
+        idf = (np.log((n + 1) / (df + 1)) + 1).astype(np.float32)
+        weights = ((1 + np.log(tf)).astype(np.float32) * idf[col])
+        norms = np.sqrt(np.bincount(row, weights=weights.astype(np.float64) ** 2, minlength=n)).astype(np.float32)
+        weights /= norms[row]
+
+        index.indptr = np.concatenate(([0], np.cumsum(df))).astype(np.int64)
+        index.row_ids, index.weights, index.idf, index.df = row, weights, idf, df
+        logger.info(f"TF-IDF index built: {n:,} titles, {len(row):,} non-zeros ({(row.nbytes + weights.nbytes) / 1e6:.1f} MB).")
+        return index
+
+    def __len__(self) -> int:
+        return len(self.titles) - self._dead + len(self._extra)
+
+    def _vector(self, text: str):
+        """(gram ids, L2-normalized weights) build time IDF ke saath."""
+        grams, tf = np.unique(_gram_codes(text), return_counts=True)
+        weights = (1 + np.log(tf)).astype(np.float32) * self.idf[grams]
+        norm = np.sqrt(float(np.dot(weights, weights)))
+        return grams, (weights / norm if norm else weights)
+
+    def add(self, title: str):
+        if not title: return
+        row = self._rows.get(title)
+        if row is not None:
+            if not self._alive[row]:
+                self._alive[row] = True
+                self._dead -= 1
+            return
+        if title not in self._extra:
+            self._extra[title] = self._vector(title)
+
+    def discard(self, title: str):
+        if self._extra.pop(title, None) is not None: return
+        row = self._rows.get(title)
+        if row is not None and self._alive[row]:
+            self._alive[row] = False
+            self._dead += 1
+
+    def top_k(self, query: str, k: int = TFIDF_SHORTLIST_SIZE, min_score: float = TFIDF_MIN_SIMILARITY) -> List[Tuple[str, float]]:
+        """Cosine similarity ke hisaab se top k (title, score 0..1), min_score se upar. Koi match nahi = []."""
+        q_grams, q_weights = self._vector(query)
+        if not len(q_grams): return []
+        n = len(self.titles)
+        results: List[Tuple[str, float]] = []
+        # Matrix mein maujood grams; stop-grams skip (agar query mein aur grams bhi hain)
+        keep = self.df[q_grams] > 0
+        common = keep & (self.df[q_grams] > TFIDF_MAX_DF_RATIO * n)
+        if common.any() and (keep & ~common).any(): keep &= ~common
+        if keep.any():
+            # Sparse mat-vec: query grams ki columns (weight se scaled) jod kar ek bincount
+            spans = [(slice(self.indptr[g], self.indptr[g + 1]), w) for g, w in zip(q_grams[keep].tolist(), q_weights[keep].tolist())]
+            rows = np.concatenate([self.row_ids[sl] for sl, _ in spans])
+            contrib = np.concatenate([self.weights[sl] * w for sl, w in spans])
+            scores = np.bincount(rows, weights=contrib, minlength=n)
+            if self._dead: scores[~self._alive] = 0
+            top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+            top = top[scores[top] >= max(min_score, 1e-9)]
+            results = [(self.titles[i], float(scores[i])) for i in top.tolist()]
+        if self._extra:
+            q_map = dict(zip(q_grams.tolist(), q_weights.tolist()))
+            for title, (grams, weights) in self._extra.items():
+                score = sum(q_map.get(g, 0.0) * w for g, w in zip(grams.tolist(), weights.tolist()))
+                if score >= max(min_score, 1e-9): results.append((title, score))
+        results.sort(key=lambda item: item[1], reverse=True)
+        return results[:k]